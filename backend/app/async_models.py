@@ -0,0 +1,76 @@
+"""
+Async data access for the Expense Approval System.
+Mirrors UserModel, ExpenseModel, ApprovalModel and ApprovalRuleModel with awaitable
+methods that run on a small set of dedicated database threads, so async route
+handlers never block the event loop on sqlite3.
+"""
+
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from . import config
+from .models import UserModel, ExpenseModel, ApprovalModel, ApprovalRuleModel
+
+# One thread per pooled connection. Sync routes and the writer thread share the pool,
+# so a database thread can still wait for a connection (up to DB_POOL_TIMEOUT).
+# Created on first use and again after shutdown(), so the app can be started twice.
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=config.DB_POOL_SIZE, thread_name_prefix="db")
+    return _executor
+
+
+async def run_db(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking data access call on a database thread and await its result.
+    The call sees the caller's context variables (per-request statement tracing).
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), functools.partial(context.run, fn, *args, **kwargs))
+
+
+def _make_async(fn: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_db(fn, *args, **kwargs)
+    return wrapper
+
+
+def _async_mirror(model: type) -> type:
+    """
+    Build an async twin of a model class: every static method becomes a coroutine.
+    """
+    namespace = {"__doc__": f"Async version of {model.__name__}."}
+    for name, attr in vars(model).items():
+        if isinstance(attr, staticmethod):
+            namespace[name] = staticmethod(_make_async(attr.__func__))
+    return type(f"Async{model.__name__}", (), namespace)
+
+
+AsyncUserModel = _async_mirror(UserModel)
+AsyncExpenseModel = _async_mirror(ExpenseModel)
+AsyncApprovalModel = _async_mirror(ApprovalModel)
+AsyncApprovalRuleModel = _async_mirror(ApprovalRuleModel)
+
+
+def shutdown() -> None:
+    """
+    Stop the database threads (application shutdown). The next call starts new ones.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
@@ -0,0 +1,221 @@
+"""
+Conditional GET and a server-side response cache for the polled listings.
+
+Every writer bumps an in-process version counter for the tables it changed, right
+after committing. A cached route declares the tables its output depends on, and its
+ETag is derived from their current versions, so:
+  - If-None-Match with the current ETag gets a 304 without running the handler;
+  - otherwise the body cached under the same versions is replayed from a
+    size-bounded LRU, and a write to any of the tables makes it stale.
+Versions are captured before the handler runs, so a write that commits while a
+response is being built leaves that response stale rather than cached as current.
+Counters live in this process: writes made by another process (CLI scripts, other
+workers) are not seen, so the cache is meant for the single-process server.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.utils import formatdate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import config
+
+# Validators are only meaningful within one server run; the boot id keeps ETags from
+# before a restart (when every counter starts again at 0) from matching.
+_BOOT_ID = os.urandom(8).hex()
+
+
+class TableVersions:
+    """
+    Per-table write counters and last-write times.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._modified: Dict[str, float] = {}
+        self._started = time.time()
+
+    def bump(self, *tables: str) -> None:
+        """
+        Record a committed write to the given tables.
+        """
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._modified[table] = now
+
+    def current(self, tables: Sequence[str]) -> Tuple[Tuple[int, ...], float]:
+        """
+        Return (versions of the tables, time of the latest write to any of them).
+        """
+        with self._lock:
+            versions = tuple(self._versions.get(table, 0) for table in tables)
+            modified = max((self._modified.get(table, self._started) for table in tables), default=self._started)
+        return versions, modified
+
+
+table_versions = TableVersions()
+
+
+# ==================== LRU ====================
+
+@dataclass
+class CachedResponse:
+    versions: Tuple[int, ...]
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+
+class ResponseCache:
+    """
+    LRU of response bodies bounded by their total size in bytes.
+    Only touched from the event loop, so it needs no lock.
+    """
+
+    def __init__(self, max_bytes: int = config.RESPONSE_CACHE_MAX_BYTES,
+                 max_entry_bytes: int = config.RESPONSE_CACHE_MAX_ENTRY_BYTES):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._entries: "OrderedDict[tuple, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self.hits = self.misses = self.not_modified = self.evictions = 0
+
+    def get(self, key: tuple, versions: Tuple[int, ...]) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.versions != versions:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: tuple, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_entry_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old.body)
+        self._entries[key] = entry
+        self._size += len(entry.body)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted.body)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+        }
+
+
+response_cache = ResponseCache()
+
+
+# ==================== MIDDLEWARE ====================
+
+# Only If-None-Match is honoured: If-Modified-Since has one-second granularity, so a
+# second write within the second of the client's Last-Modified would still get a 304.
+def _not_modified(headers: Headers, etag: str) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+class ResponseCacheMiddleware:
+    """
+    Conditional GET and response caching for the paths in `routes`, a mapping of
+    path prefix -> tables the responses under it are built from. Only 200 responses
+    are cached; responses vary by query string and Authorization header.
+    """
+
+    def __init__(self, app: ASGIApp, routes: Dict[str, Iterable[str]], cache: ResponseCache = None,
+                 versions: TableVersions = None):
+        self.app = app
+        # Longest prefix first, so a more specific rule wins.
+        self.routes = sorted(((prefix, tuple(tables)) for prefix, tables in routes.items()),
+                             key=lambda rule: len(rule[0]), reverse=True)
+        self.cache = cache or response_cache
+        self.versions = versions or table_versions
+
+    def _tables_for(self, path: str) -> Optional[Tuple[str, ...]]:
+        for prefix, tables in self.routes:
+            if path.startswith(prefix):
+                return tables
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        tables = self._tables_for(scope["path"]) if scope["type"] == "http" and scope["method"] == "GET" else None
+        if tables is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        key = (scope["path"], scope["query_string"], request_headers.get("authorization"))
+        versions, modified = self.versions.current(tables)
+        etag = '"' + hashlib.blake2b(repr((_BOOT_ID, key, versions)).encode(), digest_size=12).hexdigest() + '"'
+        validators = [
+            (b"etag", etag.encode()),
+            (b"last-modified", formatdate(modified, usegmt=True).encode()),
+            (b"cache-control", b"no-cache"),
+            (b"vary", b"Authorization"),
+        ]
+
+        if _not_modified(request_headers, etag):
+            self.cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": validators})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        entry = self.cache.get(key, versions)
+        if entry is not None:
+            await send({"type": "http.response.start", "status": entry.status, "headers": entry.headers})
+            await send({"type": "http.response.body", "body": entry.body})
+            return
+
+        captured: Dict[str, object] = {"start": None, "chunks": [], "size": 0}
+
+        async def send_and_capture(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                if message["status"] == 200:
+                    replaced = {name for name, _ in validators}
+                    headers = [(k, v) for k, v in message.get("headers", []) if k.lower() not in replaced]
+                    message = {**message, "headers": headers + validators}
+                    captured["start"] = message
+            elif message["type"] == "http.response.body" and captured["start"] is not None:
+                body = message.get("body", b"")
+                captured["size"] += len(body)
+                if captured["size"] > self.cache.max_entry_bytes:
+                    # Too large to keep (e.g. an export); stop buffering, keep streaming.
+                    captured["start"] = None
+                    captured["chunks"] = []
+                else:
+                    captured["chunks"].append(body)
+                    if not message.get("more_body", False):
+                        start = captured["start"]
+                        self.cache.put(key, CachedResponse(versions, start["status"], start["headers"],
+                                                           b"".join(captured["chunks"])))
+            await send(message)
+
+        await self.app(scope, receive, send_and_capture)
@@ -4,12 +4,77 @@ import os
 # Base directory
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# SQLite database path
-DATABASE_PATH = os.path.join(BASE_DIR, "database.db")
+# SQLite database path (shared by every route and model)
+DATABASE_PATH = os.environ.get("DATABASE_PATH", os.path.join(BASE_DIR, "expenses.db"))
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 
+# Connection pool
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))            # max open connections
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))   # seconds to wait for a free connection
+DB_BUSY_TIMEOUT_MS = 5000                                          # wait this long on a locked database
+DB_CACHE_SIZE_KB = 20000                                           # page cache per connection
+DB_MMAP_SIZE = 256 * 1024 * 1024                                   # memory-mapped I/O window
+DB_STATEMENT_CACHE_SIZE = 256                                      # prepared statements kept per connection
+
 # Secret key for JWT
-SECRET_KEY = "your_secret_key"
+SECRET_KEY = os.environ.get("SECRET_KEY", "your_secret_key")
+JWT_ALGORITHM = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+TOKEN_CACHE_SIZE = 10000                                           # decoded tokens kept in memory
+
+# Password hashing runs in its own process pool so bcrypt never starves request threads
+AUTH_HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS", "2"))
+AUTH_HASH_MAX_QUEUE = int(os.environ.get("AUTH_HASH_MAX_QUEUE", "64"))   # pending hashes before 503
+
+# Currency conversion
+COMPANY_CURRENCY = os.environ.get("COMPANY_CURRENCY", "USD")       # reports convert into this
+EXCHANGE_RATE_PROVIDER = os.environ.get("EXCHANGE_RATE_PROVIDER", "exchangerate-api")  # or "file"
+EXCHANGE_RATE_API_URL = "https://api.exchangerate-api.com/v4/latest/{base}"
+EXCHANGE_RATE_FILE = os.environ.get("EXCHANGE_RATE_FILE", os.path.join(BASE_DIR, "data", "exchange_rates.json"))
+EXCHANGE_RATE_TTL_SECONDS = int(os.environ.get("EXCHANGE_RATE_TTL_SECONDS", "3600"))  # provider polled at most this often
+EXCHANGE_RATE_TIMEOUT = 5                                          # seconds per provider request
+
+# Receipts and OCR
+RECEIPT_DIR = os.environ.get("RECEIPT_DIR", os.path.join(BASE_DIR, "data", "receipts"))  # content-addressed files
+RECEIPT_MAX_BYTES = int(os.environ.get("RECEIPT_MAX_BYTES", str(10 * 1024 * 1024)))   # larger uploads get 413
+OCR_BACKEND = os.environ.get("OCR_BACKEND", "tesseract")           # "tesseract", "fake" or "module:function"
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", "2"))
+OCR_MAX_QUEUE = int(os.environ.get("OCR_MAX_QUEUE", "256"))        # pending jobs before 503
+OCR_MAX_DIMENSION = 1600                                           # images are downsized to this longest side
+
+# Spend analytics
+ANALYTICS_REFRESH_SECONDS = int(os.environ.get("ANALYTICS_REFRESH_SECONDS", "5"))  # snapshot re-syncs at most this often
+
+# Duplicate expense detection (see app/services/duplicates.py)
+DUPLICATE_WINDOW_DAYS = int(os.environ.get("DUPLICATE_WINDOW_DAYS", "3"))                # near duplicates: ± this many days
+DUPLICATE_AMOUNT_TOLERANCE = float(os.environ.get("DUPLICATE_AMOUNT_TOLERANCE", "0.02"))  # and amounts within this fraction
+
+# Archival of decided expenses into per-year files (see app/services/archive.py)
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", os.path.join(BASE_DIR, "data", "archive"))
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "365"))   # decided longer ago than this
+ARCHIVE_BATCH_SIZE = int(os.environ.get("ARCHIVE_BATCH_SIZE", "2000"))  # expenses moved per transaction
+ARCHIVE_INTERVAL_SECONDS = float(os.environ.get("ARCHIVE_INTERVAL_SECONDS", "86400"))  # server archives this often (0: off)
+ARCHIVE_MAX_ATTACHED = 8                                           # newest years attached (SQLite allows 10 by default)
+
+# Response cache for the polled listings
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_MAX_ENTRY_BYTES = 1024 * 1024                        # larger responses are never cached
+
+# Group commit for submissions and approval decisions (see app/writer.py)
+WRITER_MAX_BATCH = int(os.environ.get("WRITER_MAX_BATCH", "64"))          # writes per transaction
+WRITER_MAX_DELAY_MS = float(os.environ.get("WRITER_MAX_DELAY_MS", "0"))   # linger for more writes (0: batch what is queued)
+WRITER_MAX_QUEUE = int(os.environ.get("WRITER_MAX_QUEUE", "1024"))        # queued writes before 503
+
+# Change events pushed over Server-Sent Events
+EVENTS_REPLAY_SIZE = int(os.environ.get("EVENTS_REPLAY_SIZE", "1000"))      # recent events kept for Last-Event-ID
+EVENTS_CLIENT_BUFFER = int(os.environ.get("EVENTS_CLIENT_BUFFER", "100"))   # queued per client before it is dropped
+EVENTS_HEARTBEAT_SECONDS = 15                                      # idle comment line keeps proxies from closing
+EVENTS_RETRY_MS = 3000                                             # client reconnect delay
+
+# Request and SQL metrics (GET /metrics, see app/metrics.py)
+METRICS_SQL = os.environ.get("METRICS_SQL", "1") != "0"            # time every statement (adds a little per fetched row)
+METRICS_MAX_STATEMENTS = 500                                       # distinct statements tracked; the rest share one series
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))    # log slower requests with their SQL (0: off)
 
 # Debug mode
 DEBUG = True
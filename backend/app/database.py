@@ -0,0 +1,352 @@
+"""
+Shared SQLite access layer for the Expense Approval System.
+Every route and model borrows connections from one bounded, tuned pool
+instead of opening a fresh sqlite3 connection per call.
+Archived expenses (app/services/archive.py) live in per-year files in ARCHIVE_DIR,
+ATTACHed to every connection as archive_<year>; a pooled connection picks up new
+archive files at its next checkout.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import config
+from .metrics import InstrumentedConnection
+
+
+class PoolTimeout(sqlite3.OperationalError):
+    """
+    Raised when no pooled connection becomes free within the checkout timeout.
+    """
+
+
+def _connection_class() -> type:
+    return InstrumentedConnection if config.METRICS_SQL else sqlite3.Connection
+
+
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    """
+    Tune a freshly opened connection.
+    WAL lets readers run alongside the single writer; NORMAL sync is safe under WAL.
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA cache_size = -{int(config.DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+
+# ==================== ARCHIVES ====================
+
+ARCHIVE_FILE = re.compile(r"expenses-(\d{4})\.db")
+_archive_listing: Tuple[Optional[int], Tuple[Tuple[str, str], ...]] = (None, ())
+
+
+def archive_files() -> Tuple[Tuple[str, str], ...]:
+    """
+    (schema name, path) of the archive files to attach, newest year first, at most
+    ARCHIVE_MAX_ATTACHED. The directory is re-listed only when its mtime changes.
+    """
+    global _archive_listing
+    try:
+        mtime = os.stat(config.ARCHIVE_DIR).st_mtime_ns
+    except FileNotFoundError:
+        return ()
+    if _archive_listing[0] != mtime:
+        years = sorted((int(match.group(1)) for match in map(ARCHIVE_FILE.fullmatch, os.listdir(config.ARCHIVE_DIR))
+                        if match), reverse=True)
+        _archive_listing = (mtime, tuple(
+            (f"archive_{year}", os.path.join(config.ARCHIVE_DIR, f"expenses-{year}.db"))
+            for year in years[:config.ARCHIVE_MAX_ATTACHED]
+        ))
+    return _archive_listing[1]
+
+
+def attached_archives(conn: sqlite3.Connection) -> List[str]:
+    """
+    Schema names of the archives attached to a connection, newest year first.
+    """
+    names = [row[1] for row in conn.execute("PRAGMA database_list") if row[1].startswith("archive_")]
+    return sorted(names, reverse=True)
+
+
+def sync_archives(conn: sqlite3.Connection, files: Tuple[Tuple[str, str], ...]) -> None:
+    """
+    Attach the given archive files and detach any others. Must run outside a transaction.
+    """
+    wanted = dict(files)
+    attached = set(attached_archives(conn))
+    for name in attached - wanted.keys():
+        conn.execute(f"DETACH DATABASE {name}")
+    for name in wanted.keys() - attached:
+        conn.execute(f"ATTACH DATABASE ? AS {name}", (wanted[name],))
+
+
+# ==================== CONNECTION POOL ====================
+
+class ConnectionPool:
+    """
+    Bounded pool of long-lived SQLite connections.
+    Connections are created lazily up to max_size and reused most-recently-released
+    first, so their page cache and prepared-statement cache stay warm.
+    A thread that already holds a connection gets the same one back on nested
+    checkouts, which keeps helpers composable inside a single transaction.
+    """
+
+    def __init__(self, database: str, max_size: int = config.DB_POOL_SIZE,
+                 timeout: float = config.DB_POOL_TIMEOUT):
+        self.database = database
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle: deque = deque()
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._closed = False
+        self._archives: Dict[int, tuple] = {}   # id(conn) -> archive_files() it has attached
+
+        # Stats
+        self._created = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.database,
+            timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=config.DB_STATEMENT_CACHE_SIZE,
+            factory=_connection_class(),
+        )
+        conn.row_factory = sqlite3.Row
+        _apply_pragmas(conn)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Check out a connection, waiting up to the pool timeout for one to free up.
+        Raises PoolTimeout if the pool stays exhausted.
+        """
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is not None:
+            local.depth += 1
+            return conn
+
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._created < self.max_size:
+                    self._created += 1
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {self.timeout:.1f}s "
+                        f"(pool size {self.max_size})"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+
+        files = archive_files()
+        if self._archives.get(id(conn)) != files:
+            try:
+                sync_archives(conn, files)
+                self._archives[id(conn)] = files
+            except sqlite3.Error:
+                # An archive being replaced or unreadable: serve the hot data, retry next time.
+                self._archives.pop(id(conn), None)
+
+        waited = time.perf_counter() - start
+        with self._cond:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        local.conn = conn
+        local.depth = 1
+        return conn
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """
+        Return a connection to the pool.
+        Any transaction the caller left open is rolled back first.
+        """
+        local = self._local
+        if getattr(local, "conn", None) is conn:
+            local.depth -= 1
+            if local.depth > 0:
+                return
+            local.conn = None
+
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            if healthy and not self._closed:
+                self._idle.append(conn)
+            else:
+                self._created -= 1
+                self._archives.pop(id(conn), None)
+                conn.close()
+            self._cond.notify()
+
+    def close(self) -> None:
+        """
+        Close every idle connection and refuse further checkouts.
+        Connections still in use are closed when they are released.
+        """
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn = self._idle.pop()
+                self._archives.pop(id(conn), None)
+                conn.close()
+                self._created -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of pool usage for sizing decisions.
+        """
+        with self._cond:
+            return {
+                "max_size": self.max_size,
+                "open": self._created,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_time_total_ms": round(self._wait_total * 1000, 3),
+                "wait_time_avg_ms": round(self._wait_total * 1000 / self._checkouts, 3) if self._checkouts else 0.0,
+                "wait_time_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Return the process-wide pool, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(config.DATABASE_PATH)
+    return _pool
+
+
+def configure(database_path: Optional[str] = None, max_size: Optional[int] = None) -> ConnectionPool:
+    """
+    Point the shared pool at a different database file (scripts, benchmarks).
+    Closes the previous pool.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        if database_path is not None:
+            config.DATABASE_PATH = database_path
+        _pool = ConnectionPool(config.DATABASE_PATH, max_size=max_size or config.DB_POOL_SIZE)
+    return _pool
+
+
+def close_pool() -> None:
+    """
+    Close the shared pool (application shutdown).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+@contextmanager
+def get_db_connection():
+    """
+    Context manager that borrows a pooled connection.
+    Rows come back as sqlite3.Row; uncommitted work is rolled back on release.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+
+def open_connection() -> sqlite3.Connection:
+    """
+    Open a dedicated connection outside the pool, tuned like pooled ones and with the
+    archives attached. For maintenance jobs that manage their own transactions and
+    attachments. The caller must close it.
+    """
+    conn = sqlite3.connect(
+        config.DATABASE_PATH,
+        timeout=config.DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+        factory=_connection_class(),
+    )
+    conn.row_factory = sqlite3.Row
+    _apply_pragmas(conn)
+    sync_archives(conn, archive_files())
+    return conn
+
+
+def open_read_connection() -> sqlite3.Connection:
+    """
+    Open a dedicated query-only connection outside the pool.
+    Meant for long-running reads such as exports: under WAL they see a consistent
+    snapshot without blocking writers or tying up a pooled connection.
+    The caller must close it.
+    """
+    conn = open_connection()
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Stats for the shared pool.
+    """
+    return get_pool().stats()
@@ -0,0 +1,267 @@
+"""
+Change events pushed to clients over Server-Sent Events, so the approval queue and
+dashboard update when something changes instead of re-fetching whole lists.
+
+Write paths publish compact events (expense.created, approval.decided,
+expense.status_changed) after committing. Each event lists the users it concerns;
+a subscriber sees the events addressed to it (admins see everything).
+  - Events are numbered per server run and the last EVENTS_REPLAY_SIZE are kept,
+    so a client reconnecting with Last-Event-ID gets what it missed. If its id is
+    from another run or has already left the buffer, it gets a "reset" event and
+    should reload its lists.
+  - Each subscriber has a queue of EVENTS_CLIENT_BUFFER events. Publishers never
+    wait for clients: a subscriber whose queue fills up is sent what it already
+    holds and then disconnected, and resumes through Last-Event-ID.
+Like the response cache, the bus lives in this process and only sees its writes.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+_BOOT_ID = os.urandom(4).hex()
+
+FINAL_STATUSES = ("Approved", "Rejected")
+
+
+@dataclass(frozen=True)
+class Event:
+    seq: int
+    type: str
+    data: Dict[str, Any]
+    users: FrozenSet[int]
+
+    @property
+    def id(self) -> str:
+        return f"{_BOOT_ID}-{self.seq}"
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    """
+    Sequence number of an event id from this server run, or None (missing, malformed
+    or from an earlier run).
+    """
+    boot, _, seq = (value or "").partition("-")
+    if boot != _BOOT_ID or not seq.isdigit():
+        return None
+    return int(seq)
+
+
+class Subscription:
+    """
+    One connected client: its filter, its bounded queue and the last event it was
+    offered. Only touched from the event loop.
+    """
+
+    def __init__(self, user_id: Optional[int], sees_all: bool, buffer: int):
+        self.user_id = user_id
+        self.sees_all = sees_all
+        self.queue: "asyncio.Queue[Event]" = asyncio.Queue(maxsize=buffer)
+        self.last_seq = 0
+        self.overflowed = False
+
+    def wants(self, event: Event) -> bool:
+        return self.sees_all or self.user_id in event.users
+
+    def offer(self, event: Event) -> None:
+        self.last_seq = event.seq
+        if self.overflowed or not self.wants(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class EventBus:
+    """
+    Publish from any thread; deliver to subscribers on the event loop it is attached to.
+    """
+
+    def __init__(self, replay_size: int = config.EVENTS_REPLAY_SIZE,
+                 client_buffer: int = config.EVENTS_CLIENT_BUFFER):
+        self.client_buffer = client_buffer
+        self._lock = threading.Lock()
+        self._events: "deque[Event]" = deque(maxlen=replay_size)
+        self._seq = itertools.count(1)
+        self._subscribers: Set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._scheduled = False
+        self.published = self.disconnected = 0
+
+    def attach(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+
+    def detach(self) -> None:
+        self._loop = None
+
+    @property
+    def attached(self) -> bool:
+        """
+        Whether a server is running to deliver events; scripts and CLI tools skip publishing.
+        """
+        return self._loop is not None
+
+    def publish(self, events: Iterable[Tuple[str, Dict[str, Any], Iterable[int]]]) -> None:
+        """
+        Record (type, data, users) events and schedule their delivery. Call after the
+        write they describe has committed.
+        """
+        with self._lock:
+            for type_, data, users in events:
+                self._events.append(Event(next(self._seq), type_, data, frozenset(users)))
+                self.published += 1
+            if self._scheduled or not self._subscribers or self._loop is None:
+                return
+            self._scheduled = True
+            loop = self._loop
+        try:
+            loop.call_soon_threadsafe(self._deliver)
+        except RuntimeError:  # loop closed during shutdown
+            self._scheduled = False
+
+    def _deliver(self) -> None:
+        # One pass delivers everything published since the last one, in sequence order
+        # whatever order the publishing threads got here in.
+        with self._lock:
+            self._scheduled = False
+            events = list(self._events)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if sub.overflowed:
+                continue
+            pending = [event for event in events if event.seq > sub.last_seq]
+            if pending and pending[0].seq > sub.last_seq + 1:
+                # The buffer wrapped before this subscriber was served.
+                sub.overflowed = True
+            else:
+                for event in pending:
+                    sub.offer(event)
+            if sub.overflowed:
+                self.disconnected += 1
+
+    def subscribe(self, user_id: Optional[int], sees_all: bool,
+                  last_event_id: Optional[str] = None) -> Tuple[Subscription, Optional[List[Event]]]:
+        """
+        Register a subscriber. Returns it with the events to replay after
+        last_event_id, or None if they are no longer available (send a reset).
+        Without last_event_id there is nothing to replay.
+        """
+        sub = Subscription(user_id, sees_all, self.client_buffer)
+        after = parse_event_id(last_event_id)
+        with self._lock:
+            events = list(self._events)
+            sub.last_seq = events[-1].seq if events else 0
+            self._subscribers.add(sub)
+        if last_event_id is None:
+            return sub, []
+        oldest = events[0].seq if events else sub.last_seq + 1
+        if after is None or after > sub.last_seq or after < oldest - 1:
+            return sub, None
+        return sub, [event for event in events if event.seq > after and sub.wants(event)]
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "buffered": len(self._events),
+                "published": self.published,
+                "disconnected": self.disconnected,
+            }
+
+
+event_bus = EventBus()
+
+
+# ==================== PUBLISHERS ====================
+
+def _audience(row: Dict[str, Any], *extra: Optional[int]) -> Set[int]:
+    users = {row["employee_id"], *row["approver_ids"]}
+    users.update(user for user in extra if user is not None)
+    return users
+
+
+def _summary(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: row[key] for key in ("id", "employee_id", "amount", "currency", "category",
+                                      "status", "current_level")}
+
+
+def expenses_created(expense_ids: List[int]) -> None:
+    """
+    Publish expense.created for newly submitted expenses (to the employee and the
+    first-level approvers).
+    """
+    if not expense_ids or not event_bus.attached:
+        return
+    from .models import ExpenseModel
+
+    event_bus.publish(("expense.created", _summary(row), _audience(row))
+                      for row in ExpenseModel.get_event_details(expense_ids))
+
+
+def approvals_decided(approver_id: Optional[int], approved: bool, results: List[Dict[str, Any]]) -> None:
+    """
+    Publish approval.decided for each applied decision (to the employee, the decider
+    and whoever is now pending), plus expense.status_changed when it settled the expense.
+    results are decide()/decide_many() results; entries without an applied outcome
+    are skipped.
+    """
+    decided = [r for r in results if r.get("outcome", "applied") == "applied"]
+    if not decided or not event_bus.attached:
+        return
+    from .models import ExpenseModel
+
+    events = []
+    for row in ExpenseModel.get_event_details(r["id"] for r in decided):
+        users = _audience(row, approver_id)
+        events.append(("approval.decided", {**_summary(row), "approver_id": approver_id,
+                                            "decision": "approve" if approved else "reject"}, users))
+        if row["status"] in FINAL_STATUSES:
+            events.append(("expense.status_changed", _summary(row), users))
+    event_bus.publish(events)
+
+
+# ==================== STREAM ====================
+
+async def stream(sub: Subscription, replay: Optional[List[Event]]):
+    """
+    SSE body for one subscriber: the retry hint, the replay (or a reset), then live
+    events with a comment line every EVENTS_HEARTBEAT_SECONDS to keep proxies from
+    closing an idle connection. Ends when the subscriber falls too far behind.
+    """
+    try:
+        yield f"retry: {config.EVENTS_RETRY_MS}\n\n"
+        if replay is None:
+            yield "event: reset\ndata: {}\n\n"
+        else:
+            for event in replay:
+                yield event.encode()
+        while True:
+            if sub.overflowed and sub.queue.empty():
+                logger.info("Disconnecting lagging event subscriber %s", sub.user_id)
+                return
+            try:
+                event = await asyncio.wait_for(sub.queue.get(), timeout=config.EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield event.encode()
+    finally:
+        event_bus.unsubscribe(sub)
@@ -3,90 +3,66 @@ Main FastAPI application for Expense Reimbursement System.
 Includes routers for authentication, users, expenses, and approvals.
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-import sqlite3
 from contextlib import asynccontextmanager
-import os
-
-# ---------------- CONFIG ----------------
-DATABASE_PATH = "expense_system.db"
+import asyncio
+
+from app.cache import ResponseCacheMiddleware, response_cache
+from app.events import event_bus
+from app.metrics import MetricsMiddleware, metrics
+from app.database import get_db_connection, close_pool, pool_stats
+from app.migrations import migrate
+from app import async_models
+from app.security import password_hasher
+from app.services import archive
+from app.services.ocr import ocr_queue
+from app.writer import WriterBusy, writer
 
 # ---------------- DATABASE INIT ----------------
 def init_database():
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-
-    # Users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            hashed_password TEXT NOT NULL,
-            full_name TEXT NOT NULL,
-            role TEXT NOT NULL CHECK(role IN ('Admin','Manager','Employee')),
-            manager_id INTEGER,
-            department TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            is_active BOOLEAN DEFAULT 1,
-            FOREIGN KEY (manager_id) REFERENCES users(id)
-        )
-    """)
-
-    # Expenses table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS expenses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            employee_id INTEGER NOT NULL,
-            amount REAL NOT NULL,
-            currency TEXT NOT NULL DEFAULT 'USD',
-            category TEXT NOT NULL,
-            description TEXT,
-            expense_date DATE NOT NULL,
-            receipt_url TEXT,
-            status TEXT NOT NULL DEFAULT 'Pending' CHECK(status IN ('Pending','Approved','Rejected','In Review')),
-            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (employee_id) REFERENCES users(id)
-        )
-    """)
-
-    # Approvals table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS approvals (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            expense_id INTEGER NOT NULL,
-            approver_id INTEGER NOT NULL,
-            approval_level INTEGER NOT NULL,
-            status TEXT NOT NULL DEFAULT 'Pending' CHECK(status IN ('Pending','Approved','Rejected')),
-            comments TEXT,
-            approved_at TIMESTAMP,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (expense_id) REFERENCES expenses(id),
-            FOREIGN KEY (approver_id) REFERENCES users(id)
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    """Create or upgrade the schema to the latest migration, archives included."""
+    version = migrate()
+    archive.sync_schemas()
+    return version
 
-# ---------------- FASTAPI LIFESPAN ----------------
 
-# Initialize database at app startup
-if not os.path.exists(DATABASE_PATH):
+# ---------------- FASTAPI LIFESPAN ----------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     init_database()
-    print("✓ Database initialized with tables")
-
+    ocr_queue.recover()
+    event_bus.attach(asyncio.get_running_loop())
+    archive.start()
+    yield
+    archive.stop()
+    event_bus.detach()
+    async_models.shutdown()
+    writer.shutdown()
+    password_hasher.shutdown()
+    ocr_queue.shutdown()
+    close_pool()
 
 
 # ---------------- FASTAPI APP ----------------
 app = FastAPI(
     title="Expense Approval System",
     version="1.0.0",
-    description="Multi-level expense approval system"
+    description="Multi-level expense approval system",
+    lifespan=lifespan
 )
 
 
+# Conditional GET + response cache for the listings the pages poll: path prefix ->
+# tables the responses are built from. Added before CORS so CORS wraps cached replies.
+app.add_middleware(ResponseCacheMiddleware, routes={
+    "/api/users": ("users",),
+    "/api/expenses": ("expenses", "users", "exchange_rates"),
+    "/approvals": ("approvals", "expenses", "users"),
+    "/api/dashboard": ("expenses", "users"),
+})
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -96,6 +72,16 @@ app.add_middleware(
     allow_credentials=True
 )
 
+# Per-route latency, status codes and SQL timings for /metrics; outermost, so it
+# times cached replies and CORS preflights too.
+app.add_middleware(MetricsMiddleware)
+
+# Too many writes queued for the group-commit writer: shed load instead of queueing more
+@app.exception_handler(WriterBusy)
+async def writer_busy(request: Request, exc: WriterBusy):
+    return JSONResponse(status_code=503, content={"detail": "Too many writes in progress, retry shortly"},
+                        headers={"Retry-After": "1"})
+
 # Root endpoint
 @app.get("/")
 def root():
@@ -105,23 +91,44 @@ def root():
 @app.get("/health")
 def health_check():
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM users")
-        user_count = cursor.fetchone()[0]
-        conn.close()
-        return {"status": "healthy", "database": "connected", "users_count": user_count}
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM users")
+            user_count = cursor.fetchone()[0]
+        return {"status": "healthy", "database": "connected", "users_count": user_count, "pool": pool_stats(),
+                "response_cache": response_cache.stats(), "events": event_bus.stats(),
+                "writer": writer.stats()}
     except Exception as e:
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    pool = pool_stats()
+    gauges = {
+        "sqlite_pool_connections_open": ("Pooled connections open.", pool["open"]),
+        "sqlite_pool_connections_in_use": ("Pooled connections checked out.", pool["in_use"]),
+        "sqlite_pool_waiting": ("Threads waiting for a pooled connection.", pool["waiting"]),
+        "sqlite_pool_timeouts": ("Checkouts that timed out since start.", pool["timeouts"]),
+        "sqlite_pool_wait_seconds": ("Time spent waiting for pooled connections since start.",
+                                     pool["wait_time_total_ms"] / 1000),
+    }
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 
 # ---------------- IMPORT ROUTERS ----------------
-from app.routes import auth, users, expenses, approvals
+from app.routes import auth, users, expenses, approvals, currency, ocr, receipts, dashboard, reports, events
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(expenses.router)
 app.include_router(approvals.router)
+app.include_router(currency.router)
+app.include_router(ocr.router)
+app.include_router(receipts.router)
+app.include_router(dashboard.router)
+app.include_router(reports.router)
+app.include_router(events.router)
 
 
 # ---------------- RUN ----------------
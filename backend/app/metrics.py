@@ -0,0 +1,383 @@
+"""
+Request and SQL instrumentation, exposed in Prometheus text format on /metrics.
+
+  - MetricsMiddleware records a latency histogram and response counts by status per
+    route template and method, and the number of requests in flight.
+  - Connections from app.database are opened as InstrumentedConnection, whose cursors
+    count and time every statement by its normalized text (literals and placeholder
+    lists folded) and count the rows fetched from it. Time spent stepping through
+    rows is added to the statement when the cursor is exhausted, re-used or dropped.
+  - Lock waits: write transactions here start with BEGIN IMMEDIATE, which does nothing
+    but take the write lock, so its duration is time spent waiting on another writer.
+    Statements that give up with "database is locked" add the time they waited too.
+  - With SLOW_REQUEST_MS set, a request slower than that is logged with the statements
+    it ran, on its own threads and the database threads it awaited. Statements run
+    for it by the group-commit writer are not attributed to it.
+"""
+
+import contextvars
+import logging
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OTHER_STATEMENTS = "<other>"        # label once METRICS_MAX_STATEMENTS distinct statements are tracked
+SLOW_REQUEST_MAX_STATEMENTS = 200   # statements kept per request for the slow-request log
+
+
+# ==================== REGISTRY ====================
+
+class Histogram:
+    """
+    Observation counts per bucket (upper bounds inclusive, last bucket +Inf).
+    Not locked itself; Metrics updates it under its lock.
+    """
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Metrics:
+    """
+    Request and statement counters for one process.
+    """
+
+    def __init__(self, max_statements: int = config.METRICS_MAX_STATEMENTS):
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self.in_flight = 0          # only touched from the event loop
+        self._latency: Dict[Tuple[str, str], Histogram] = {}
+        self._responses: Dict[Tuple[str, str, int], int] = {}
+        # normalized statement -> [executions, seconds, rows, errors]
+        self._statements: Dict[str, List[float]] = {}
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self.locked_errors = 0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        with self._lock:
+            histogram = self._latency.get((method, route))
+            if histogram is None:
+                histogram = self._latency[(method, route)] = Histogram()
+            histogram.observe(seconds)
+            key = (method, route, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def observe_statement(self, sql: str, seconds: float, rows: int = 0, failed: bool = False) -> None:
+        key = normalize(sql)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                if len(self._statements) >= self.max_statements:
+                    key = OTHER_STATEMENTS
+                stats = self._statements.setdefault(key, [0, 0.0, 0, 0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] += rows
+            stats[3] += failed
+
+    def observe_lock_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.lock_waits += 1
+            self.lock_wait_seconds += seconds
+            self.locked_errors += timed_out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._latency.clear()
+            self._responses.clear()
+            self._statements.clear()
+            self.lock_waits = self.locked_errors = 0
+            self.lock_wait_seconds = 0.0
+
+    def render(self, gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+        """
+        Everything in Prometheus text exposition format, plus `gauges`
+        (name -> (help, value)) supplied by the caller.
+        """
+        lines: List[str] = []
+
+        def header(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self._lock:
+            header("http_requests_in_flight", "gauge", "Requests being handled.")
+            lines.append(f"http_requests_in_flight {self.in_flight}")
+
+            header("http_request_duration_seconds", "histogram", "Request latency by route.")
+            for (method, route), histogram in sorted(self._latency.items()):
+                labels = f'method="{method}",route="{_escape(route)}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"http_request_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                lines.append(f"http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+            header("http_responses_total", "counter", "Responses by route and status code.")
+            for (method, route, status), count in sorted(self._responses.items()):
+                lines.append(f'http_responses_total{{method="{method}",route="{_escape(route)}",'
+                             f'status="{status}"}} {count}')
+
+            statements = sorted(self._statements.items())
+            for index, (name, help_text) in enumerate((
+                    ("sqlite_statements_total", "Statement executions by normalized SQL."),
+                    ("sqlite_statement_seconds_total", "Time spent executing statements and fetching their rows."),
+                    ("sqlite_statement_rows_total", "Rows fetched from statements."),
+                    ("sqlite_statement_errors_total", "Statements that raised."))):
+                header(name, "counter", help_text)
+                for sql, stats in statements:
+                    value = f"{stats[index]:.6f}" if index == 1 else str(int(stats[index]))
+                    lines.append(f'{name}{{statement="{_escape(sql)}"}} {value}')
+
+            header("sqlite_lock_waits_total", "counter", "Write-lock acquisitions and lock timeouts.")
+            lines.append(f"sqlite_lock_waits_total {self.lock_waits}")
+            header("sqlite_lock_wait_seconds_total", "counter", 'Time spent waiting for the write lock.')
+            lines.append(f"sqlite_lock_wait_seconds_total {self.lock_wait_seconds:.6f}")
+            header("sqlite_locked_errors_total", "counter", 'Statements that failed with "database is locked".')
+            lines.append(f"sqlite_locked_errors_total {self.locked_errors}")
+
+        for name, (help_text, value) in sorted((gauges or {}).items()):
+            header(name, "gauge", help_text)
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_SPACE = re.compile(r"\s+")
+_LITERAL = re.compile(r"'(?:[^']|'')*'|(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+
+
+@lru_cache(maxsize=4096)
+def normalize(sql: str) -> str:
+    """
+    Statement text with whitespace collapsed, literals replaced by ? and placeholder
+    lists folded, so IN (?, ?, ?) and multi-row VALUES built per call share one key.
+    """
+    sql = _LITERAL.sub("?", _SPACE.sub(" ", sql).strip())
+    return _ROWS.sub("(?...), ...", _PLACEHOLDERS.sub("(?...)", sql))
+
+
+# ==================== SQL HOOK ====================
+
+# Statements run on behalf of the current request: [sql, seconds, rows] entries,
+# or None when the slow-request log is off.
+_request_statements: contextvars.ContextVar[Optional[List[list]]] = contextvars.ContextVar(
+    "request_statements", default=None)
+
+
+def _is_lock_acquisition(sql: str) -> bool:
+    head = sql.lstrip()[:16].upper()
+    return head.startswith("BEGIN IMMEDIATE") or head.startswith("BEGIN EXCLUSIVE")
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that reports each statement it runs, and the rows fetched from it, to `metrics`.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        super().__init__(connection)
+        self._sql: Optional[str] = None
+        self._seconds = 0.0
+        self._rows = 0
+        self._trace: Optional[list] = None
+
+    def _run(self, method, sql: str, parameters) -> "InstrumentedCursor":
+        self._finish()
+        start = time.perf_counter()
+        try:
+            method(sql, parameters)
+        except sqlite3.Error as e:
+            seconds = time.perf_counter() - start
+            metrics.observe_statement(sql, seconds, failed=True)
+            if "database is locked" in str(e):
+                metrics.observe_lock_wait(seconds, timed_out=True)
+            self._trace_statement(sql, seconds)
+            raise
+        seconds = time.perf_counter() - start
+        if _is_lock_acquisition(sql):
+            metrics.observe_lock_wait(seconds)
+        self._sql, self._seconds, self._rows = sql, seconds, 0
+        self._trace = self._trace_statement(sql, seconds)
+        if self.description is None:
+            # Nothing to fetch: the statement is complete.
+            self._finish()
+        return self
+
+    @staticmethod
+    def _trace_statement(sql: str, seconds: float) -> Optional[list]:
+        trace = _request_statements.get()
+        if trace is None or len(trace) >= SLOW_REQUEST_MAX_STATEMENTS:
+            return None
+        entry = [sql, seconds, 0]
+        trace.append(entry)
+        return entry
+
+    def _finish(self) -> None:
+        if self._sql is None:
+            return
+        metrics.observe_statement(self._sql, self._seconds, self._rows)
+        if self._trace is not None:
+            self._trace[1], self._trace[2] = self._seconds, self._rows
+        self._sql = self._trace = None
+
+    def execute(self, sql: str, parameters=()) -> "InstrumentedCursor":
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters) -> "InstrumentedCursor":
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._seconds += time.perf_counter() - start
+            self._finish()
+            raise
+        self._seconds += time.perf_counter() - start
+        self._rows += 1
+        return row
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._seconds += time.perf_counter() - start
+        if row is None:
+            self._finish()
+        else:
+            self._rows += 1
+        return row
+
+    def fetchmany(self, size: Optional[int] = None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._seconds += time.perf_counter() - start
+        self._rows += len(rows)
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._seconds += time.perf_counter() - start
+        self._rows += len(rows)
+        self._finish()
+        return rows
+
+    def close(self) -> None:
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Most cursors are dropped after a fetchone(), not closed.
+        if getattr(self, "_sql", None) is not None:
+            self._finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    sqlite3 connection whose cursors, including those behind conn.execute(), are
+    InstrumentedCursors. Pass as sqlite3.connect(..., factory=InstrumentedConnection).
+    """
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # The C shortcuts build a plain cursor without going through cursor().
+    def execute(self, sql: str, parameters=()) -> InstrumentedCursor:
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters) -> InstrumentedCursor:
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+# ==================== MIDDLEWARE ====================
+
+def _route_name(scope: Scope) -> str:
+    # The matched route's path template, so /api/expenses/{expense_id} is one series.
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """
+    Per-route latency, status codes and in-flight requests; logs requests slower
+    than slow_request_ms (0: off) with the statements they ran.
+    Add it last, so it is outermost and times everything below it.
+    """
+
+    def __init__(self, app: ASGIApp, registry: Metrics = None,
+                 slow_request_ms: float = config.SLOW_REQUEST_MS):
+        self.app = app
+        self.metrics = registry or metrics
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_and_record(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        statements = [] if self.slow_request_ms > 0 else None
+        token = _request_statements.set(statements) if statements is not None else None
+        self.metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            seconds = time.perf_counter() - start
+            self.metrics.in_flight -= 1
+            self.metrics.observe_request(scope["method"], _route_name(scope), status, seconds)
+            if token is not None:
+                _request_statements.reset(token)
+                if seconds * 1000 >= self.slow_request_ms:
+                    self._log_slow(scope, status, seconds, statements)
+
+    @staticmethod
+    def _log_slow(scope: Scope, status: int, seconds: float, statements: List[list]) -> None:
+        lines = [f"  {sql_seconds * 1000:9.2f} ms {rows:>7} rows  {_SPACE.sub(' ', sql).strip()}"
+                 for sql, sql_seconds, rows in statements]
+        query = scope.get("query_string", b"").decode("latin-1")
+        logger.warning("Slow request %s %s%s -> %d: %.1f ms, %d statements (%.1f ms in SQL)\n%s",
+                       scope["method"], scope["path"], f"?{query}" if query else "", status,
+                       seconds * 1000, len(statements), sum(s[1] for s in statements) * 1000,
+                       "\n".join(lines))
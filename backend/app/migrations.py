@@ -0,0 +1,628 @@
+"""
+Versioned schema migrations for the Expense Approval System.
+The schema version lives in PRAGMA user_version; each migration runs in its own
+transaction and bumps it, so existing databases are upgraded in place.
+
+Usage (from backend/):
+    python -m app.migrations            # upgrade the configured database
+    python -m app.migrations --check    # fail if a hot query falls back to a table scan
+"""
+
+import sqlite3
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from .database import get_db_connection
+
+
+def _totals_upsert(row: str, sign: str) -> str:
+    """
+    Trigger statement adding (sign="+") or removing (sign="-") one expense row
+    (NEW or OLD) from every expense_totals dimension.
+    """
+    amount = f"{sign}{row}.amount"
+    count = f"{sign}1"
+    keys = [
+        ("'all'", "''"),
+        ("'employee'", f"CAST({row}.employee_id AS TEXT)"),
+        ("'department'", f"COALESCE((SELECT department FROM users WHERE id = {row}.employee_id), '')"),
+        ("'status'", f"{row}.status"),
+        ("'category'", f"{row}.category"),
+        ("'month'", f"substr({row}.expense_date, 1, 7)"),
+    ]
+    values = ", ".join(f"({dimension}, {key}, {count}, {amount})" for dimension, key in keys)
+    return f"""
+        INSERT INTO expense_totals (dimension, key, count, amount) VALUES {values}
+        ON CONFLICT (dimension, key) DO UPDATE
+        SET count = count + excluded.count, amount = amount + excluded.amount;"""
+
+
+# (version, description, statements). Append only; never edit an applied migration.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "baseline schema", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            hashed_password TEXT NOT NULL,
+            full_name TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('Admin','Manager','Employee')),
+            manager_id INTEGER,
+            department TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            is_active BOOLEAN DEFAULT 1,
+            FOREIGN KEY (manager_id) REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS expenses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            currency TEXT NOT NULL DEFAULT 'USD',
+            category TEXT NOT NULL,
+            description TEXT,
+            expense_date DATE NOT NULL,
+            receipt_url TEXT,
+            status TEXT NOT NULL DEFAULT 'Pending' CHECK(status IN ('Pending','Approved','Rejected','In Review')),
+            submitted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS approvals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            expense_id INTEGER NOT NULL,
+            approver_id INTEGER NOT NULL,
+            approval_level INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Pending' CHECK(status IN ('Pending','Approved','Rejected')),
+            comments TEXT,
+            approved_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (expense_id) REFERENCES expenses(id),
+            FOREIGN KEY (approver_id) REFERENCES users(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS approval_rules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rule_name TEXT NOT NULL,
+            rule_type TEXT NOT NULL CHECK(rule_type IN ('amount_threshold', 'percentage_approval', 'specific_approver', 'department_rule')),
+            condition_value REAL,
+            approver_role TEXT,
+            approver_id INTEGER,
+            approval_level INTEGER NOT NULL,
+            department TEXT,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (approver_id) REFERENCES users(id)
+        )
+        """,
+    ]),
+    (2, "indexes for hot queries", [
+        # UserModel.get_all_users / get_users_by_role
+        "CREATE INDEX IF NOT EXISTS idx_users_role_active ON users(role, is_active)",
+        # Manager-chain lookups and department filters
+        "CREATE INDEX IF NOT EXISTS idx_users_manager ON users(manager_id)",
+        "CREATE INDEX IF NOT EXISTS idx_users_department ON users(department)",
+        # ExpenseModel.get_all_expenses / list_expenses (keyset on submitted_at, id)
+        "CREATE INDEX IF NOT EXISTS idx_expenses_submitted ON expenses(submitted_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_status_submitted ON expenses(status, submitted_at, id)",
+        # ExpenseModel.get_expenses_by_employee, with and without status
+        "CREATE INDEX IF NOT EXISTS idx_expenses_employee_submitted ON expenses(employee_id, submitted_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_expenses_employee_status_submitted ON expenses(employee_id, status, submitted_at, id)",
+        # ApprovalModel.get_approvals_by_approver (covers the join key)
+        "CREATE INDEX IF NOT EXISTS idx_approvals_approver_status ON approvals(approver_id, status, created_at, expense_id)",
+        "CREATE INDEX IF NOT EXISTS idx_approvals_approver_created ON approvals(approver_id, created_at, expense_id)",
+        # ApprovalModel.get_approvals_by_expense / get_pending_approval_for_expense
+        "CREATE INDEX IF NOT EXISTS idx_approvals_expense_level ON approvals(expense_id, approval_level, created_at)",
+        # ApprovalRuleModel.get_active_rules / get_rules_for_amount
+        "CREATE INDEX IF NOT EXISTS idx_rules_active_level ON approval_rules(is_active, approval_level)",
+        "CREATE INDEX IF NOT EXISTS idx_rules_type_active_level ON approval_rules(rule_type, is_active, approval_level)",
+    ]),
+    (3, "approval state machine", [
+        # current_level: the level awaiting decisions; version: optimistic-concurrency counter
+        "ALTER TABLE expenses ADD COLUMN current_level INTEGER",
+        "ALTER TABLE expenses ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+        # Per-expense, per-level quorum counters, updated in the same transaction as each decision
+        """
+        CREATE TABLE IF NOT EXISTS approval_progress (
+            expense_id INTEGER NOT NULL,
+            approval_level INTEGER NOT NULL,
+            approver_ids TEXT NOT NULL,
+            required INTEGER NOT NULL,
+            approved INTEGER NOT NULL DEFAULT 0,
+            rejected INTEGER NOT NULL DEFAULT 0,
+            override_approver_id INTEGER,
+            status TEXT NOT NULL DEFAULT 'Waiting' CHECK(status IN ('Waiting','Active','Approved','Rejected')),
+            PRIMARY KEY (expense_id, approval_level),
+            FOREIGN KEY (expense_id) REFERENCES expenses(id)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (4, "org hierarchy closure table", [
+        # One row per (manager, report) pair at any distance, plus (user, user) at depth 0
+        """
+        CREATE TABLE IF NOT EXISTS org_closure (
+            ancestor_id INTEGER NOT NULL,
+            descendant_id INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id),
+            FOREIGN KEY (ancestor_id) REFERENCES users(id),
+            FOREIGN KEY (descendant_id) REFERENCES users(id)
+        ) WITHOUT ROWID
+        """,
+        # Ancestor-at-level and full-chain lookups
+        "CREATE INDEX IF NOT EXISTS idx_org_closure_descendant ON org_closure(descendant_id, depth, ancestor_id)",
+        # Backfill from users.manager_id; the depth bound stops at any pre-existing cycle
+        """
+        INSERT OR IGNORE INTO org_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE chain(ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM users
+            UNION ALL
+            SELECT u.manager_id, chain.descendant_id, chain.depth + 1
+            FROM chain JOIN users u ON u.id = chain.ancestor_id
+            WHERE u.manager_id IS NOT NULL AND chain.depth < 64
+        )
+        SELECT ancestor_id, descendant_id, MIN(depth) FROM chain GROUP BY ancestor_id, descendant_id
+        """,
+    ]),
+    (5, "exchange rate snapshots", [
+        # One provider snapshot per base currency and day: units of `currency` per 1 `base`
+        """
+        CREATE TABLE IF NOT EXISTS exchange_rates (
+            base TEXT NOT NULL,
+            rate_date DATE NOT NULL,
+            currency TEXT NOT NULL,
+            rate REAL NOT NULL,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (base, rate_date, currency)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (6, "receipt OCR jobs", [
+        # JSON of the fields read from the expense's latest scanned receipt
+        "ALTER TABLE expenses ADD COLUMN receipt_data TEXT",
+        """
+        CREATE TABLE IF NOT EXISTS ocr_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            expense_id INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            autofill BOOLEAN NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'Queued' CHECK(status IN ('Queued','Done','Failed')),
+            cached BOOLEAN NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (expense_id) REFERENCES expenses(id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ocr_jobs_status ON ocr_jobs(status, id)",
+        "CREATE INDEX IF NOT EXISTS idx_ocr_jobs_expense ON ocr_jobs(expense_id, id)",
+        # Extraction results by receipt content, so identical receipts are read once per backend
+        """
+        CREATE TABLE IF NOT EXISTS ocr_results (
+            content_hash TEXT NOT NULL,
+            backend TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (content_hash, backend)
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (7, "receipt storage", [
+        # One row per stored file; expenses.receipt_url points at /api/receipts/<content_hash>
+        """
+        CREATE TABLE IF NOT EXISTS receipts (
+            content_hash TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            content_type TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        """,
+    ]),
+    (8, "dashboard totals", [
+        # Expense count and amount per dimension value, kept current by the triggers below
+        """
+        CREATE TABLE IF NOT EXISTS expense_totals (
+            dimension TEXT NOT NULL CHECK(dimension IN ('all','employee','department','status','category','month')),
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_expense_totals_insert AFTER INSERT ON expenses
+        BEGIN {_totals_upsert("NEW", "+")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_expense_totals_delete AFTER DELETE ON expenses
+        BEGIN {_totals_upsert("OLD", "-")}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_expense_totals_update
+        AFTER UPDATE OF employee_id, amount, status, category, expense_date ON expenses
+        WHEN OLD.employee_id IS NOT NEW.employee_id OR OLD.amount IS NOT NEW.amount
+          OR OLD.status IS NOT NEW.status OR OLD.category IS NOT NEW.category
+          OR OLD.expense_date IS NOT NEW.expense_date
+        BEGIN {_totals_upsert("OLD", "-")} {_totals_upsert("NEW", "+")}
+        END
+        """,
+        # Moving an employee moves their expenses between department totals
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expense_totals_department
+        AFTER UPDATE OF department ON users
+        WHEN OLD.department IS NOT NEW.department
+        BEGIN
+            INSERT INTO expense_totals (dimension, key, count, amount)
+            SELECT 'department', COALESCE(OLD.department, ''), -count, -amount FROM expense_totals
+            WHERE dimension = 'employee' AND key = CAST(NEW.id AS TEXT)
+            ON CONFLICT (dimension, key) DO UPDATE
+            SET count = count + excluded.count, amount = amount + excluded.amount;
+            INSERT INTO expense_totals (dimension, key, count, amount)
+            SELECT 'department', COALESCE(NEW.department, ''), count, amount FROM expense_totals
+            WHERE dimension = 'employee' AND key = CAST(NEW.id AS TEXT)
+            ON CONFLICT (dimension, key) DO UPDATE
+            SET count = count + excluded.count, amount = amount + excluded.amount;
+        END
+        """,
+        # Backfill from the existing expenses
+        """
+        INSERT INTO expense_totals (dimension, key, count, amount)
+        SELECT 'all', '', COUNT(*), TOTAL(amount) FROM expenses
+        UNION ALL
+        SELECT 'employee', CAST(employee_id AS TEXT), COUNT(*), TOTAL(amount) FROM expenses GROUP BY employee_id
+        UNION ALL
+        SELECT 'department', COALESCE(u.department, ''), COUNT(*), TOTAL(e.amount)
+        FROM expenses e LEFT JOIN users u ON u.id = e.employee_id GROUP BY COALESCE(u.department, '')
+        UNION ALL
+        SELECT 'status', status, COUNT(*), TOTAL(amount) FROM expenses GROUP BY status
+        UNION ALL
+        SELECT 'category', category, COUNT(*), TOTAL(amount) FROM expenses GROUP BY category
+        UNION ALL
+        SELECT 'month', substr(expense_date, 1, 7), COUNT(*), TOTAL(amount) FROM expenses
+        GROUP BY substr(expense_date, 1, 7)
+        """,
+    ]),
+    (9, "analytics refresh index", [
+        # The spend analytics snapshot re-reads rows changed since its last refresh
+        "CREATE INDEX IF NOT EXISTS idx_expenses_updated_at ON expenses(updated_at)",
+    ]),
+    (10, "expense full-text search", [
+        # External-content FTS5 index over description and category: the text lives only
+        # in expenses, the index maps terms to expense ids. Prefix indexes make 2- and
+        # 3-character prefix queries (type-ahead) cheap.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS expenses_fts USING fts5(
+            description, category,
+            content='expenses', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_insert AFTER INSERT ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (rowid, description, category)
+            VALUES (NEW.id, NEW.description, NEW.category);
+        END
+        """,
+        # External content: deleting from the index needs the old column values
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_delete AFTER DELETE ON expenses
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, description, category)
+            VALUES ('delete', OLD.id, OLD.description, OLD.category);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_expenses_fts_update
+        AFTER UPDATE OF description, category ON expenses
+        WHEN OLD.description IS NOT NEW.description OR OLD.category IS NOT NEW.category
+        BEGIN
+            INSERT INTO expenses_fts (expenses_fts, rowid, description, category)
+            VALUES ('delete', OLD.id, OLD.description, OLD.category);
+            INSERT INTO expenses_fts (rowid, description, category)
+            VALUES (NEW.id, NEW.description, NEW.category);
+        END
+        """,
+        # Backfill from the existing expenses (python -m app.services.search rebuilds it later)
+        "INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')",
+    ]),
+    (11, "expense duplicate fingerprints", [
+        # One row per expense, written with its submission (app/services/duplicates.py).
+        # amount_cents is in the company currency, or in `currency` when it had no rate;
+        # digest hashes (employee, currency, cents, date, tokens) for exact matches.
+        """
+        CREATE TABLE IF NOT EXISTS expense_fingerprints (
+            expense_id INTEGER PRIMARY KEY,
+            employee_id INTEGER NOT NULL,
+            currency TEXT NOT NULL,
+            amount_cents INTEGER NOT NULL,
+            expense_date DATE NOT NULL,
+            tokens TEXT NOT NULL,
+            digest TEXT NOT NULL,
+            receipt_hash TEXT,
+            FOREIGN KEY (expense_id) REFERENCES expenses(id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_fingerprints_digest ON expense_fingerprints(digest)",
+        """
+        CREATE INDEX IF NOT EXISTS idx_fingerprints_receipt ON expense_fingerprints(receipt_hash)
+        WHERE receipt_hash IS NOT NULL
+        """,
+        # Near-duplicate window: one employee and currency, a date range, then amounts
+        """
+        CREATE INDEX IF NOT EXISTS idx_fingerprints_window
+        ON expense_fingerprints(employee_id, currency, expense_date, amount_cents)
+        """,
+        # Flagged pairs: expense_id is the later expense, duplicate_of the earlier one
+        """
+        CREATE TABLE IF NOT EXISTS expense_duplicates (
+            expense_id INTEGER NOT NULL,
+            duplicate_of INTEGER NOT NULL,
+            kind TEXT NOT NULL CHECK(kind IN ('exact','receipt','near')),
+            similarity REAL NOT NULL,
+            detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (expense_id, duplicate_of)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_expense_duplicates_of ON expense_duplicates(duplicate_of)",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fingerprints_delete AFTER DELETE ON expenses
+        BEGIN
+            DELETE FROM expense_fingerprints WHERE expense_id = OLD.id;
+            DELETE FROM expense_duplicates WHERE expense_id = OLD.id OR duplicate_of = OLD.id;
+        END
+        """,
+        # An edit to a fingerprinted field makes the fingerprint and its flags stale;
+        # python -m app.services.duplicates --rescan fingerprints the expense again.
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fingerprints_update
+        AFTER UPDATE OF employee_id, amount, currency, expense_date, description ON expenses
+        WHEN OLD.employee_id IS NOT NEW.employee_id OR OLD.amount IS NOT NEW.amount
+          OR OLD.currency IS NOT NEW.currency OR OLD.expense_date IS NOT NEW.expense_date
+          OR OLD.description IS NOT NEW.description
+        BEGIN
+            DELETE FROM expense_fingerprints WHERE expense_id = NEW.id;
+            DELETE FROM expense_duplicates WHERE expense_id = NEW.id OR duplicate_of = NEW.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_fingerprints_receipt
+        AFTER UPDATE OF receipt_url ON expenses
+        WHEN OLD.receipt_url IS NOT NEW.receipt_url
+        BEGIN
+            UPDATE expense_fingerprints
+            SET receipt_hash = CASE WHEN NEW.receipt_url LIKE '/api/receipts/%'
+                                    THEN substr(NEW.receipt_url, 15) END
+            WHERE expense_id = NEW.id;
+        END
+        """,
+    ]),
+    (12, "archived expense totals", [
+        # Totals of the expenses moved to the per-year archives (app/services/archive.py),
+        # added by the archival job in the transaction that deletes them from expenses.
+        """
+        CREATE TABLE IF NOT EXISTS archived_totals (
+            dimension TEXT NOT NULL CHECK(dimension IN ('all','employee','department','status','category','month')),
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_archived_totals_department
+        AFTER UPDATE OF department ON users
+        WHEN OLD.department IS NOT NEW.department
+        BEGIN
+            INSERT INTO archived_totals (dimension, key, count, amount)
+            SELECT 'department', COALESCE(OLD.department, ''), -count, -amount FROM archived_totals
+            WHERE dimension = 'employee' AND key = CAST(NEW.id AS TEXT)
+            ON CONFLICT (dimension, key) DO UPDATE
+            SET count = count + excluded.count, amount = amount + excluded.amount;
+            INSERT INTO archived_totals (dimension, key, count, amount)
+            SELECT 'department', COALESCE(NEW.department, ''), count, amount FROM archived_totals
+            WHERE dimension = 'employee' AND key = CAST(NEW.id AS TEXT)
+            ON CONFLICT (dimension, key) DO UPDATE
+            SET count = count + excluded.count, amount = amount + excluded.amount;
+        END
+        """,
+        # What the dashboard reads: hot and archived totals together
+        """
+        CREATE VIEW IF NOT EXISTS dashboard_totals AS
+        SELECT dimension, key, SUM(count) AS count, SUM(amount) AS amount
+        FROM (SELECT * FROM expense_totals UNION ALL SELECT * FROM archived_totals)
+        GROUP BY dimension, key
+        """,
+        ]),
+    (13, "open expenses by submission time", [
+        # The approver inbox (approval_workflow._awaiting) walks the open expenses oldest
+        # first; status IN (two values) cannot take that order from the status index.
+        """
+        CREATE INDEX IF NOT EXISTS idx_expenses_open_submitted ON expenses(submitted_at, id)
+        WHERE status IN ('Pending', 'In Review')
+        """,
+]),
+]
+
+# Representative hot queries from app/models.py and the services, with placeholder parameters.
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("UserModel.get_all_users(role)",
+     "SELECT * FROM users WHERE role = ? AND is_active = 1", ("Manager",)),
+    ("direct reports by manager_id",
+     "SELECT id FROM users WHERE manager_id = ?", (1,)),
+    ("ExpenseModel.get_expenses_by_employee",
+     """SELECT e.*, u.full_name FROM expenses e JOIN users u ON e.employee_id = u.id
+        WHERE e.employee_id = ? ORDER BY e.submitted_at DESC""", (1,)),
+    ("ExpenseModel.get_expenses_by_employee(status)",
+     """SELECT e.*, u.full_name FROM expenses e JOIN users u ON e.employee_id = u.id
+        WHERE e.employee_id = ? AND e.status = ? ORDER BY e.submitted_at DESC""", (1, "Pending")),
+    ("ExpenseModel.get_all_expenses",
+     """SELECT e.*, u.full_name FROM expenses e JOIN users u ON e.employee_id = u.id
+        ORDER BY e.submitted_at DESC LIMIT ?""", (100,)),
+    ("ExpenseModel.get_all_expenses(status)",
+     """SELECT e.*, u.full_name FROM expenses e JOIN users u ON e.employee_id = u.id
+        WHERE e.status = ? ORDER BY e.submitted_at DESC LIMIT ?""", ("Pending", 100)),
+    ("ExpenseModel.list_expenses(status, cursor)",
+     """SELECT e.*, u.full_name FROM expenses e JOIN users u ON e.employee_id = u.id
+        WHERE e.status = ? AND (e.submitted_at, e.id) < (?, ?)
+        ORDER BY e.submitted_at DESC, e.id DESC LIMIT ?""", ("Pending", "2024-01-01", 10, 51)),
+    ("ApprovalModel.get_approvals_by_expense",
+     """SELECT a.*, u.full_name FROM approvals a JOIN users u ON a.approver_id = u.id
+        WHERE a.expense_id = ? ORDER BY a.approval_level, a.created_at""", (1,)),
+    ("ApprovalModel.get_approvals_by_approver(status)",
+     """SELECT a.*, e.amount FROM approvals a JOIN expenses e ON a.expense_id = e.id
+        JOIN users u ON e.employee_id = u.id
+        WHERE a.approver_id = ? AND a.status = ? ORDER BY a.created_at DESC""", (1, "Pending")),
+    ("ApprovalModel.get_pending_approval_for_expense",
+     """SELECT * FROM approvals WHERE expense_id = ? AND approver_id = ? AND status = 'Pending'""", (1, 1)),
+    ("org_hierarchy.ancestor_at",
+     "SELECT ancestor_id FROM org_closure WHERE descendant_id = ? AND depth = ?", (1, 2)),
+    ("org_hierarchy.is_in_subtree",
+     "SELECT 1 FROM org_closure WHERE ancestor_id = ? AND descendant_id = ?", (1, 2)),
+    ("ExpenseModel.list_expenses(org_manager_id)",
+     """SELECT e.*, u.full_name FROM expenses e JOIN users u ON e.employee_id = u.id
+        WHERE EXISTS (SELECT 1 FROM org_closure o WHERE o.ancestor_id = ?
+                      AND o.descendant_id = e.employee_id AND o.depth > 0)
+        ORDER BY e.submitted_at DESC, e.id DESC LIMIT ?""", (1, 51)),
+    ("analytics snapshot refresh",
+     "SELECT id, amount, status FROM expenses WHERE updated_at >= datetime(?, '-60 seconds')",
+     ("2024-01-01 00:00:00",)),
+    ("ApprovalRuleModel.get_active_rules",
+     "SELECT * FROM approval_rules WHERE is_active = 1 ORDER BY approval_level", ()),
+    ("ApprovalRuleModel.get_rules_for_amount",
+     """SELECT * FROM approval_rules WHERE is_active = 1 AND rule_type = 'amount_threshold'
+        AND (condition_value IS NULL OR ? <= condition_value) ORDER BY approval_level""", (10.0,)),
+    ("duplicates.find_matches(exact)",
+     "SELECT expense_id FROM expense_fingerprints WHERE digest = ? AND expense_id != ? LIMIT ?", ("d", 1, 20)),
+    ("duplicates.find_matches(near)",
+     """SELECT expense_id, tokens FROM expense_fingerprints
+        WHERE employee_id = ? AND currency = ? AND expense_date BETWEEN ? AND ?
+          AND amount_cents BETWEEN ? AND ? AND expense_id != ? LIMIT ?""",
+     (1, "USD", "2024-01-01", "2024-01-07", 980, 1020, 1, 20)),
+    ("approval_workflow._awaiting",
+     """SELECT e.id FROM expenses e INDEXED BY idx_expenses_open_submitted JOIN users u ON e.employee_id = u.id
+        WHERE e.status IN ('Pending', 'In Review') AND (
+            EXISTS (SELECT 1 FROM approvals a WHERE a.approver_id = ? AND a.status = 'Pending'
+                    AND a.expense_id = e.id AND a.approval_level = e.current_level)
+            OR (e.current_level IS NULL AND u.manager_id = ?))
+        ORDER BY e.submitted_at, e.id LIMIT ?""", (1, 1, 100)),
+    ("search.is_broad",
+     "SELECT COUNT(*) FROM (SELECT 1 FROM expenses_fts WHERE expenses_fts MATCH ? LIMIT ?)", ('"taxi"', 1001)),
+    ("search.window_floor",
+     """SELECT s.rowid FROM expenses_fts s JOIN expenses e ON e.id = s.rowid JOIN users u ON e.employee_id = u.id
+        WHERE expenses_fts MATCH ? AND e.status = ?
+        ORDER BY s.rowid DESC LIMIT 1 OFFSET ?""", ('"taxi"', "Pending", 999)),
+    ("ExpenseModel.search_expenses(relevance, broad)",
+     """SELECT e.*, u.full_name, s.rank AS score FROM expenses_fts s JOIN expenses e ON e.id = s.rowid
+        JOIN users u ON e.employee_id = u.id
+        WHERE expenses_fts MATCH ? AND s.rowid >= ? ORDER BY s.rank, e.id LIMIT ?""", ('"taxi"', 1, 51)),
+    ("ExpenseModel.search_expenses(newest)",
+     """SELECT e.*, u.full_name, NULL AS score FROM expenses e JOIN users u ON e.employee_id = u.id
+        WHERE e.id IN (SELECT rowid FROM expenses_fts WHERE expenses_fts MATCH ?)
+        ORDER BY e.submitted_at DESC, e.id DESC LIMIT ?""", ('"taxi"', 51)),
+    ("ExpenseModel.search_expenses(newest, broad)",
+     """SELECT e.*, u.full_name, NULL AS score FROM expenses e JOIN users u ON e.employee_id = u.id
+        WHERE +e.id IN (SELECT rowid FROM expenses_fts WHERE expenses_fts MATCH ?)
+        ORDER BY e.submitted_at DESC, e.id DESC LIMIT ?""", ('"taxi"', 51)),
+]
+
+# Hot queries whose order no index can give, and what bounds the rows they sort.
+BOUNDED_SORTS: Dict[str, str] = {
+    "ExpenseModel.search_expenses(relevance, broad)": "bm25 rank; at most search.RANK_WINDOW rows",
+    "ExpenseModel.search_expenses(newest)": "only run when at most search.BROAD_MATCHES rows match",
+}
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """
+    Return the schema version recorded in the database.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Apply every pending migration in order, one transaction per migration.
+    Returns the resulting schema version.
+    """
+    if conn is None:
+        with get_db_connection() as pooled:
+            return migrate(pooled)
+
+    version = current_version(conn)
+    for target, description, statements in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {int(target)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = target
+        print(f"✓ Applied migration {target}: {description}")
+    return version
+
+
+def explain(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> List[str]:
+    """
+    Return the EXPLAIN QUERY PLAN detail lines for a query.
+    """
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def _scans_table(line: str) -> bool:
+    """
+    Whether a plan line reads a whole table. Reading a subquery's rows back and an
+    FTS5 lookup with a constraint (e.g. "VIRTUAL TABLE INDEX 0:M2") do not count.
+    """
+    if not line.startswith("SCAN ") or " USING " in line or line.startswith("SCAN (subquery-"):
+        return False
+    if " VIRTUAL TABLE INDEX " in line:
+        return line.endswith(":")
+    return True
+
+
+def check_query_plans(conn: Optional[sqlite3.Connection] = None) -> List[Tuple[str, List[str]]]:
+    """
+    Run EXPLAIN QUERY PLAN over HOT_QUERIES against a migrated schema.
+    Returns (query name, plan) for every query that scans a whole table or sorts
+    in a temp b-tree instead of walking an index (except BOUNDED_SORTS). An empty
+    list means all good.
+    """
+    if conn is None:
+        conn = sqlite3.connect(":memory:")
+        migrate(conn)
+
+    failures = []
+    for name, sql, params in HOT_QUERIES:
+        plan = explain(conn, sql, params)
+        bad = [
+            line for line in plan
+            if _scans_table(line) or ("TEMP B-TREE" in line and name not in BOUNDED_SORTS)
+        ]
+        if bad:
+            failures.append((name, plan))
+    return failures
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv[1:]:
+        failures = check_query_plans()
+        for name, plan in failures:
+            print(f"✗ {name}: " + " | ".join(plan))
+        if failures:
+            sys.exit(1)
+        print(f"✓ All {len(HOT_QUERIES)} hot queries use an index")
+    else:
+        print(f"Schema version: {migrate()}")
@@ -1,39 +1,126 @@
 """
 Database models and helper functions for the Expense Approval System.
-This file contains database connection utilities and data access functions.
+This file contains data access functions built on the shared pool in database.py.
 """
 
+import heapq
+import json
 import sqlite3
-from typing import Optional, List, Dict, Any
-from datetime import datetime
-from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Sequence, Set, Tuple
 
-DATABASE_PATH = "expenses.db"
+from .database import attached_archives, get_db_connection, open_read_connection
+from .pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor, make_page
+from .responses import encode_rows
+from .services import org_hierarchy, search
+from .services.rule_engine import rule_engine
+from .writer import writer
 
 
-@contextmanager
-def get_db_connection():
+def dict_from_row(row: sqlite3.Row) -> Dict[str, Any]:
     """
-    Context manager for database connections.
-    Automatically handles connection closing and provides row factory for dict-like access.
+    Convert sqlite3.Row object to a dictionary.
     """
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    try:
-        yield conn
-    finally:
-        conn.close()
+    return dict(zip(row.keys(), row))
 
 
-def dict_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+def fetch_dicts(conn: sqlite3.Connection, sql: str, params: Iterable[Any] = ()) -> List[Dict[str, Any]]:
     """
-    Convert sqlite3.Row object to a dictionary.
+    Run a query and return its rows as dictionaries, resolving the column names once
+    per query instead of building a sqlite3.Row and calling keys() for every row.
     """
-    return dict(zip(row.keys(), row))
+    cursor = conn.cursor()
+    cursor.row_factory = None
+    cursor.execute(sql, tuple(params))
+    keys = [column[0] for column in cursor.description]
+    return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+
+def _expense_filters(status, employee_id, department, category, currency,
+                     date_from, date_to, org_manager_id=None, small_org=False) -> Tuple[List[str], List[Any]]:
+    """
+    Build WHERE clauses for the expense listings (expenses e JOIN users u).
+    Filters are combined with AND; date_from/date_to bound expense_date (inclusive).
+    org_manager_id keeps expenses from anyone in that manager's org, at any depth;
+    small_org (see org_hierarchy.is_small_org) picks the plan for that filter.
+    """
+    clauses, params = [], []
+    for column, value in (("e.status", status), ("e.employee_id", employee_id),
+                          ("u.department", department), ("e.category", category),
+                          ("e.currency", currency)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if date_from is not None:
+        clauses.append("e.expense_date >= ?")
+        params.append(str(date_from))
+    if date_to is not None:
+        clauses.append("e.expense_date <= ?")
+        params.append(str(date_to))
+    if org_manager_id is not None and small_org:
+        # Few members: read each one's expenses through the employee index.
+        clauses.append("e.employee_id IN (SELECT descendant_id FROM org_closure WHERE ancestor_id = ? AND depth > 0)")
+        params.append(org_manager_id)
+    elif org_manager_id is not None:
+        # A primary-key probe per row, so the listing can still walk the submitted_at index.
+        clauses.append("""EXISTS (SELECT 1 FROM org_closure o WHERE o.ancestor_id = ?
+                                  AND o.descendant_id = e.employee_id AND o.depth > 0)""")
+        params.append(org_manager_id)
+    return clauses, params
+
+
+def _expense_schemas(conn: sqlite3.Connection, include_archived: bool) -> List[str]:
+    """
+    Schemas holding expenses to read: main, then (include_archived) the attached
+    archives, newest year first.
+    """
+    return ["main"] + (attached_archives(conn) if include_archived else [])
+
+
+def _archive_year(schema: str) -> str:
+    return schema.rsplit("_", 1)[-1]
+
+
+# An expense is in an archive and, between the archival job's copy and its delete, in
+# main too; reads of an archive skip the ids main still has.
+_NOT_HOT = "NOT EXISTS (SELECT 1 FROM main.expenses h WHERE h.id = e.id)"
+
+
+def _listing_key(row) -> Tuple[str, int]:
+    return (row["submitted_at"] or "", row["id"])
 
 
 # ==================== USER MODEL ====================
 
+# Columns get_all_users_json may select (names are interpolated into the SQL).
+USER_COLUMNS = frozenset({
+    "id", "email", "hashed_password", "full_name", "role", "manager_id", "department",
+    "created_at", "is_active",
+})
+
+
+def _insert_user(conn: sqlite3.Connection, email: str, hashed_password: str, full_name: str,
+                 role: str, manager_id: Optional[int], department: Optional[str]) -> int:
+    user_id = conn.execute("""
+        INSERT INTO users (email, hashed_password, full_name, role, manager_id, department)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (email, hashed_password, full_name, role, manager_id, department)).lastrowid
+    org_hierarchy.add_user(conn, user_id, manager_id)
+    return user_id
+
+
+def _update_user(conn: sqlite3.Connection, user_id: int, fields: Dict[str, Any]) -> bool:
+    set_clause = ", ".join(f"{key} = ?" for key in fields)
+    updated = conn.execute(f"UPDATE users SET {set_clause} WHERE id = ?", [*fields.values(), user_id]).rowcount
+    if updated and "manager_id" in fields:
+        # Raises inside the job, so a rejected move leaves users untouched.
+        org_hierarchy.move_user(conn, user_id, fields["manager_id"])
+    return updated > 0
+
+
+def _deactivate_user(conn: sqlite3.Connection, user_id: int) -> bool:
+    return conn.execute("UPDATE users SET is_active = 0 WHERE id = ?", (user_id,)).rowcount > 0
+
+
 class UserModel:
     """
     User model for database operations.
@@ -45,17 +132,12 @@ class UserModel:
                    role: str, manager_id: Optional[int] = None, 
                    department: Optional[str] = None) -> int:
         """
-        Create a new user in the database.
+        Create a new user in the database and index them in the org hierarchy
+        (through the group-commit writer).
         Returns the created user's ID.
         """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO users (email, hashed_password, full_name, role, manager_id, department)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (email, hashed_password, full_name, role, manager_id, department))
-            conn.commit()
-            return cursor.lastrowid
+        return writer.run(_insert_user, email, hashed_password, full_name, role, manager_id, department,
+                          tables=("users",))
     
     @staticmethod
     def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
@@ -95,38 +177,62 @@ class UserModel:
                 cursor.execute("SELECT * FROM users WHERE is_active = 1")
             rows = cursor.fetchall()
             return [dict_from_row(row) for row in rows]
+
+    @staticmethod
+    def get_all_users_json(columns: Sequence[str], role: Optional[str] = None) -> bytes:
+        """
+        Active users (optionally of one role) as a JSON array of objects holding only
+        `columns`, encoded straight from the cursor for the listing endpoint.
+        """
+        unknown = set(columns) - USER_COLUMNS
+        if unknown:
+            raise ValueError(f"Unknown user columns: {', '.join(sorted(unknown))}")
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            where = "WHERE is_active = 1" + (" AND role = ?" if role else "")
+            cursor.execute(f"SELECT {', '.join(columns)} FROM users {where}", (role,) if role else ())
+            return encode_rows(cursor)
     
     @staticmethod
     def update_user(user_id: int, **kwargs) -> bool:
         """
         Update user fields dynamically.
+        Changing manager_id moves the user's whole subtree in the org hierarchy.
         Returns True if successful, False otherwise.
+        Raises org_hierarchy.OrgCycleError if the new manager reports to the user.
         """
         if not kwargs:
             return False
-        
-        # Build dynamic UPDATE query
-        set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
-        values = list(kwargs.values()) + [user_id]
-        
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(f"UPDATE users SET {set_clause} WHERE id = ?", values)
-            conn.commit()
-            return cursor.rowcount > 0
+        return writer.run(_update_user, user_id, kwargs, tables=("users",))
     
     @staticmethod
     def delete_user(user_id: int) -> bool:
         """
         Soft delete a user by setting is_active to 0.
+        The user stays in the org hierarchy, since their reports still point at them.
         Returns True if successful, False otherwise.
         """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE users SET is_active = 0 WHERE id = ?", (user_id,))
-            conn.commit()
-            return cursor.rowcount > 0
+        return writer.run(_deactivate_user, user_id, tables=("users",))
     
+    @staticmethod
+    def get_existing_ids(user_ids: Iterable[int]) -> Set[int]:
+        """
+        Return which of the given user IDs exist and are active, in one query per 500 IDs.
+        Used to validate bulk submissions without a lookup per row.
+        """
+        ids = list(set(user_ids))
+        found: Set[int] = set()
+        with get_db_connection() as conn:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT id FROM users WHERE id IN ({placeholders}) AND is_active = 1", chunk
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
     @staticmethod
     def get_users_by_role(role: str) -> List[Dict[str, Any]]:
         """
@@ -138,6 +244,48 @@ class UserModel:
 
 # ==================== EXPENSE MODEL ====================
 
+def insert_expense(conn: sqlite3.Connection, employee_id: int, amount: float, currency: str,
+                   category: str, description: str, expense_date: Any,
+                   receipt_url: Optional[str] = None) -> int:
+    """
+    Insert a Pending expense on the caller's transaction (a group-commit job).
+    Returns its ID.
+    """
+    cursor = conn.execute("""
+        INSERT INTO expenses (employee_id, amount, currency, category, description,
+                            expense_date, receipt_url, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'Pending')
+    """, (employee_id, amount, currency, category, description, str(expense_date), receipt_url))
+    return cursor.lastrowid
+
+
+def insert_expenses(conn: sqlite3.Connection, expenses: List[Dict[str, Any]]) -> List[int]:
+    """
+    Insert many Pending expenses (dicts of insert_expense arguments) with executemany
+    on the caller's transaction. Returns the new IDs in input order.
+    """
+    conn.executemany("""
+        INSERT INTO expenses (employee_id, amount, currency, category, description,
+                            expense_date, receipt_url, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'Pending')
+    """, [(e["employee_id"], e["amount"], e["currency"], e["category"], e["description"],
+           str(e["expense_date"]), e.get("receipt_url")) for e in expenses])
+    # AUTOINCREMENT IDs are consecutive within one write transaction.
+    last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last_id - len(expenses) + 1, last_id + 1))
+
+
+def _update_expense(conn: sqlite3.Connection, expense_id: int, fields: Dict[str, Any]) -> bool:
+    set_clause = ", ".join(f"{key} = ?" for key in fields)
+    # Same clock and format as every other writer; the analytics snapshot refreshes from it.
+    return conn.execute(f"UPDATE expenses SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                        [*fields.values(), expense_id]).rowcount > 0
+
+
+def _delete_pending_expense(conn: sqlite3.Connection, expense_id: int) -> bool:
+    return conn.execute("DELETE FROM expenses WHERE id = ? AND status = 'Pending'", (expense_id,)).rowcount > 0
+
+
 class ExpenseModel:
     """
     Expense model for database operations.
@@ -149,37 +297,62 @@ class ExpenseModel:
                       category: str, description: str, expense_date: str,
                       receipt_url: Optional[str] = None) -> int:
         """
-        Create a new expense in the database.
+        Create a new expense in the database (through the group-commit writer).
         Returns the created expense's ID.
         """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO expenses (employee_id, amount, currency, category, description, 
-                                    expense_date, receipt_url, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, 'Pending')
-            """, (employee_id, amount, currency, category, description, expense_date, receipt_url))
-            conn.commit()
-            return cursor.lastrowid
+        return writer.run(insert_expense, employee_id, amount, currency, category, description,
+                          expense_date, receipt_url, tables=("expenses",))
     
     @staticmethod
-    def get_expense_by_id(expense_id: int) -> Optional[Dict[str, Any]]:
+    def create_expenses_bulk(expenses: List[Dict[str, Any]]) -> List[int]:
+        """
+        Insert many expenses with executemany in a single group-commit job.
+        Each dict carries the create_expense arguments.
+        Returns the new IDs in input order.
+        """
+        if not expenses:
+            return []
+        return writer.run(insert_expenses, expenses, tables=("expenses",))
+
+    @staticmethod
+    def get_expense_by_id(expense_id: int, include_archived: bool = False) -> Optional[Dict[str, Any]]:
         """
         Retrieve an expense by ID with employee details.
         Returns expense data with joined user information.
+        include_archived also looks in the attached archives; leave it off where the
+        expense is about to be written, since archived expenses are read-only.
         """
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT e.*, u.full_name as employee_name, u.email as employee_email, 
-                       u.department as employee_department
+            for schema in _expense_schemas(conn, include_archived):
+                row = conn.execute(f"""
+                    SELECT e.*, u.full_name as employee_name, u.email as employee_email,
+                           u.department as employee_department
+                    FROM {schema}.expenses e
+                    JOIN users u ON e.employee_id = u.id
+                    WHERE e.id = ?
+                """, (expense_id,)).fetchone()
+                if row:
+                    return dict_from_row(row)
+            return None
+
+    @staticmethod
+    def get_event_details(expense_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """
+        Fields carried by change events, plus who should receive them: the employee and
+        the approvers with a pending approval on the expense. One query for all IDs.
+        """
+        with get_db_connection() as conn:
+            rows = fetch_dicts(conn, """
+                SELECT e.id, e.employee_id, e.amount, e.currency, e.category, e.status, e.current_level,
+                       (SELECT json_group_array(a.approver_id) FROM approvals a
+                        WHERE a.expense_id = e.id AND a.status = 'Pending') AS approver_ids
                 FROM expenses e
-                JOIN users u ON e.employee_id = u.id
-                WHERE e.id = ?
-            """, (expense_id,))
-            row = cursor.fetchone()
-            return dict_from_row(row) if row else None
-    
+                WHERE e.id IN (SELECT value FROM json_each(?))
+            """, (json.dumps(list(expense_ids)),))
+        for row in rows:
+            row["approver_ids"] = json.loads(row["approver_ids"])
+        return rows
+
     @staticmethod
     def get_expenses_by_employee(employee_id: int, status: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -236,22 +409,183 @@ class ExpenseModel:
                 """, (limit,))
             rows = cursor.fetchall()
             return [dict_from_row(row) for row in rows]
-    
+
+    @staticmethod
+    def list_expenses(status: Optional[str] = None, employee_id: Optional[int] = None,
+                      department: Optional[str] = None, category: Optional[str] = None,
+                      currency: Optional[str] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, org_manager_id: Optional[int] = None,
+                      cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                      order: str = "desc", include_archived: bool = False) -> Dict[str, Any]:
+        """
+        Retrieve one page of expenses with employee details, keyset-paginated on (submitted_at, id).
+        include_archived merges in the attached archives: each is read with the same
+        keyset query, skipping archives whose year cannot reach the page (they hold
+        one submitted_at year each).
+        Returns {"items": [...], "next_cursor": token or None}.
+        Raises ValueError for a malformed cursor.
+        """
+        descending = order.lower() != "asc"
+        with get_db_connection() as conn:
+            small_org = org_manager_id is not None and org_hierarchy.is_small_org(conn, org_manager_id)
+            clauses, params = _expense_filters(status, employee_id, department, category,
+                                               currency, date_from, date_to, org_manager_id, small_org)
+            if cursor:
+                clauses.append(f"(e.submitted_at, e.id) {'<' if descending else '>'} (?, ?)")
+                params.extend(decode_cursor(cursor))
+
+            direction = "DESC" if descending else "ASC"
+            schemas = _expense_schemas(conn, include_archived)
+            rows: List[Dict[str, Any]] = []
+            for schema in schemas[:1] + (schemas[1:] if descending else schemas[:0:-1]):
+                if schema != "main" and len(rows) > limit:
+                    # The page is full up to rows[limit]; an archive's rows all fall in its year.
+                    edge = (rows[limit]["submitted_at"] or "")[:4]
+                    if (edge > _archive_year(schema)) if descending else (edge < _archive_year(schema)):
+                        continue
+                source_clauses = clauses + ([_NOT_HOT] if schema != "main" else [])
+                where = f"WHERE {' AND '.join(source_clauses)}" if source_clauses else ""
+                rows.extend(fetch_dicts(conn, f"""
+                    SELECT e.*, u.full_name as employee_name, u.email as employee_email,
+                           u.department as employee_department
+                    FROM {schema}.expenses e
+                    JOIN users u ON e.employee_id = u.id
+                    {where}
+                    ORDER BY e.submitted_at {direction}, e.id {direction}
+                    LIMIT ?
+                """, params + [limit + 1]))
+                if schema != "main":
+                    rows.sort(key=_listing_key, reverse=descending)
+                    del rows[limit + 1:]
+        return make_page(rows, limit, ("submitted_at", "id"))
+
+    @staticmethod
+    def search_expenses(q: str, prefix: bool = True, sort: str = "relevance",
+                        status: Optional[str] = None, employee_id: Optional[int] = None,
+                        department: Optional[str] = None, category: Optional[str] = None,
+                        currency: Optional[str] = None, date_from: Optional[str] = None,
+                        date_to: Optional[str] = None, org_manager_id: Optional[int] = None,
+                        cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """
+        Full-text search over description and category (see services/search.py), with
+        the list_expenses filters.
+        sort="relevance" ranks by bm25, best first, and pages on (score, id). Broad
+        queries (see search.is_broad) are ranked over their search.RANK_WINDOW most
+        recent matches after filtering, since scoring every match of a common word
+        costs O(matches); the response's "ranked_from_id" is then the oldest id in
+        that window (None when every match was ranked).
+        sort="newest" pages on (submitted_at, id) like list_expenses; for broad queries
+        it walks the submitted_at index and stops after one page.
+        Returns {"items": [...], "next_cursor": token or None, ...}; items carry a
+        "score" (None when sorted by date).
+        Raises ValueError for a malformed cursor or query.
+        """
+        match = search.fts_query(q, prefix)
+        if not match:
+            return {"items": [], "next_cursor": None}
+        with get_db_connection() as conn:
+            small_org = org_manager_id is not None and org_hierarchy.is_small_org(conn, org_manager_id)
+            clauses, params = _expense_filters(status, employee_id, department, category,
+                                               currency, date_from, date_to, org_manager_id, small_org)
+            broad = search.is_broad(conn, match)
+            floor = None
+            if sort == "relevance":
+                # bm25 scores are negative: lower is a better match.
+                if broad and (employee_id is not None or small_org):
+                    # Few candidate rows: read them through the employee index and
+                    # score each one, rather than scoring every match of the text.
+                    source = "expenses e CROSS JOIN expenses_fts s ON s.rowid = e.id"
+                else:
+                    source = "expenses_fts s JOIN expenses e ON e.id = s.rowid"
+                score = "s.rank"
+                clauses.insert(0, "expenses_fts MATCH ?")
+                params.insert(0, match)
+                if cursor:
+                    last_score, last_id, floor = decode_cursor(cursor, 3)
+                elif broad and source.startswith("expenses_fts"):
+                    floor = search.window_floor(conn, clauses, params)
+                if floor is not None:
+                    clauses.append("s.rowid >= ?")
+                    params.append(floor)
+                key_columns, order_by = ("score", "id"), "s.rank, e.id"
+                if cursor:
+                    clauses.append("(s.rank, e.id) > (?, ?)")
+                    params.extend((last_score, last_id))
+            else:
+                # Few matches: look them up by id and sort them. Many: walk the date index
+                # and test membership (the unary + keeps the planner from the id lookup).
+                member = "+e.id" if broad else "e.id"
+                source, score = "expenses e", "NULL"
+                clauses.insert(0, f"{member} IN (SELECT rowid FROM expenses_fts WHERE expenses_fts MATCH ?)")
+                params.insert(0, match)
+                key_columns, order_by = ("submitted_at", "id"), "e.submitted_at DESC, e.id DESC"
+                if cursor:
+                    clauses.append("(e.submitted_at, e.id) < (?, ?)")
+                    params.extend(decode_cursor(cursor))
+            rows = fetch_dicts(conn, f"""
+                SELECT e.*, u.full_name as employee_name, u.email as employee_email,
+                       u.department as employee_department, {score} as score
+                FROM {source}
+                JOIN users u ON e.employee_id = u.id
+                WHERE {' AND '.join(clauses)}
+                ORDER BY {order_by}
+                LIMIT ?
+            """, params + [limit + 1])
+        page = make_page(rows, limit, key_columns)
+        if sort == "relevance":
+            if page["next_cursor"]:
+                last = page["items"][-1]
+                page["next_cursor"] = encode_cursor([last["score"], last["id"], floor])
+            page["ranked_from_id"] = floor
+        return page
+
+    @staticmethod
+    def iter_expenses(status: Optional[str] = None, employee_id: Optional[int] = None,
+                      department: Optional[str] = None, category: Optional[str] = None,
+                      currency: Optional[str] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, org_manager_id: Optional[int] = None,
+                      batch_size: int = 1000, include_archived: bool = False) -> Iterator[sqlite3.Row]:
+        """
+        Stream every matching expense with employee details, oldest first.
+        Rows are pulled from the cursor batch_size at a time on a dedicated read-only
+        connection, so memory stays flat and the pool and write lock are never held.
+        include_archived merges one such cursor per attached archive in.
+        """
+        def batches(cursor: sqlite3.Cursor) -> Iterator[sqlite3.Row]:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+
+        conn = open_read_connection()
+        try:
+            small_org = org_manager_id is not None and org_hierarchy.is_small_org(conn, org_manager_id)
+            clauses, params = _expense_filters(status, employee_id, department, category,
+                                               currency, date_from, date_to, org_manager_id, small_org)
+            streams = []
+            for schema in _expense_schemas(conn, include_archived):
+                source_clauses = clauses + ([_NOT_HOT] if schema != "main" else [])
+                where = f"WHERE {' AND '.join(source_clauses)}" if source_clauses else ""
+                streams.append(batches(conn.execute(f"""
+                    SELECT e.*, u.full_name as employee_name, u.email as employee_email,
+                           u.department as employee_department
+                    FROM {schema}.expenses e
+                    JOIN users u ON e.employee_id = u.id
+                    {where}
+                    ORDER BY e.submitted_at, e.id
+                """, params)))
+            yield from (streams[0] if len(streams) == 1 else heapq.merge(*streams, key=_listing_key))
+        finally:
+            conn.close()
+
     @staticmethod
     def update_expense_status(expense_id: int, status: str) -> bool:
         """
         Update the status of an expense.
         Also updates the updated_at timestamp.
         """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE expenses 
-                SET status = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (status, expense_id))
-            conn.commit()
-            return cursor.rowcount > 0
+        return writer.run(_update_expense, expense_id, {"status": status}, tables=("expenses",))
     
     @staticmethod
     def update_expense(expense_id: int, **kwargs) -> bool:
@@ -262,15 +596,10 @@ class ExpenseModel:
         if not kwargs:
             return False
         
-        kwargs['updated_at'] = datetime.now().isoformat()
-        set_clause = ", ".join([f"{key} = ?" for key in kwargs.keys()])
-        values = list(kwargs.values()) + [expense_id]
-        
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(f"UPDATE expenses SET {set_clause} WHERE id = ?", values)
-            conn.commit()
-            return cursor.rowcount > 0
+        kwargs.pop('updated_at', None)
+        if not kwargs:
+            return False
+        return writer.run(_update_expense, expense_id, kwargs, tables=("expenses",))
     
     @staticmethod
     def delete_expense(expense_id: int) -> bool:
@@ -278,15 +607,24 @@ class ExpenseModel:
         Delete an expense from the database.
         Only allowed if status is 'Pending'.
         """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM expenses WHERE id = ? AND status = 'Pending'", (expense_id,))
-            conn.commit()
-            return cursor.rowcount > 0
+        return writer.run(_delete_pending_expense, expense_id, tables=("expenses",))
 
 
 # ==================== APPROVAL MODEL ====================
 
+def _insert_approval(conn: sqlite3.Connection, expense_id: int, approver_id: int, approval_level: int) -> int:
+    return conn.execute("""
+        INSERT INTO approvals (expense_id, approver_id, approval_level, status)
+        VALUES (?, ?, ?, 'Pending')
+    """, (expense_id, approver_id, approval_level)).lastrowid
+
+
+def _update_approval(conn: sqlite3.Connection, approval_id: int, status: str, comments: Optional[str]) -> bool:
+    return conn.execute("""
+        UPDATE approvals SET status = ?, comments = ?, approved_at = CURRENT_TIMESTAMP WHERE id = ?
+    """, (status, comments, approval_id)).rowcount > 0
+
+
 class ApprovalModel:
     """
     Approval model for database operations.
@@ -296,65 +634,59 @@ class ApprovalModel:
     @staticmethod
     def create_approval(expense_id: int, approver_id: int, approval_level: int) -> int:
         """
-        Create a new approval record in the database.
+        Create a new approval record in the database (through the group-commit writer).
         Returns the created approval's ID.
         """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO approvals (expense_id, approver_id, approval_level, status)
-                VALUES (?, ?, ?, 'Pending')
-            """, (expense_id, approver_id, approval_level))
-            conn.commit()
-            return cursor.lastrowid
+        return writer.run(_insert_approval, expense_id, approver_id, approval_level, tables=("approvals",))
     
     @staticmethod
-    def get_approvals_by_expense(expense_id: int) -> List[Dict[str, Any]]:
+    def get_approvals_by_expense(expense_id: int, include_archived: bool = False) -> List[Dict[str, Any]]:
         """
         Get all approval records for a specific expense.
         Returns approvals with approver details.
+        include_archived looks in the attached archives when main has none (an
+        expense's approvals are archived with it).
         """
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT a.*, u.full_name as approver_name, u.email as approver_email, u.role as approver_role
-                FROM approvals a
-                JOIN users u ON a.approver_id = u.id
-                WHERE a.expense_id = ?
-                ORDER BY a.approval_level, a.created_at
-            """, (expense_id,))
-            rows = cursor.fetchall()
-            return [dict_from_row(row) for row in rows]
+            for schema in _expense_schemas(conn, include_archived):
+                rows = conn.execute(f"""
+                    SELECT a.*, u.full_name as approver_name, u.email as approver_email, u.role as approver_role
+                    FROM {schema}.approvals a
+                    JOIN users u ON a.approver_id = u.id
+                    WHERE a.expense_id = ?
+                    ORDER BY a.approval_level, a.created_at
+                """, (expense_id,)).fetchall()
+                if rows:
+                    return [dict_from_row(row) for row in rows]
+            return []
     
     @staticmethod
-    def get_approvals_by_approver(approver_id: int, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    def get_approvals_by_approver(approver_id: int, status: Optional[str] = None,
+                                  include_archived: bool = False) -> List[Dict[str, Any]]:
         """
         Get all approval requests for a specific approver.
         Optionally filter by approval status.
+        include_archived adds the approver's decisions on archived expenses.
         """
+        clauses, params = ["a.approver_id = ?"], [approver_id]
+        if status:
+            clauses.append("a.status = ?")
+            params.append(status)
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-            if status:
-                cursor.execute("""
-                    SELECT a.*, e.amount, e.currency, e.category, e.description, e.expense_date,
-                           u.full_name as employee_name, u.email as employee_email
-                    FROM approvals a
-                    JOIN expenses e ON a.expense_id = e.id
-                    JOIN users u ON e.employee_id = u.id
-                    WHERE a.approver_id = ? AND a.status = ?
-                    ORDER BY a.created_at DESC
-                """, (approver_id, status))
-            else:
-                cursor.execute("""
+            rows = []
+            for schema in _expense_schemas(conn, include_archived and status != "Pending"):
+                source_clauses = clauses + ([_NOT_HOT] if schema != "main" else [])
+                rows.extend(conn.execute(f"""
                     SELECT a.*, e.amount, e.currency, e.category, e.description, e.expense_date,
                            u.full_name as employee_name, u.email as employee_email
-                    FROM approvals a
-                    JOIN expenses e ON a.expense_id = e.id
+                    FROM {schema}.approvals a
+                    JOIN {schema}.expenses e ON a.expense_id = e.id
                     JOIN users u ON e.employee_id = u.id
-                    WHERE a.approver_id = ?
+                    WHERE {' AND '.join(source_clauses)}
                     ORDER BY a.created_at DESC
-                """, (approver_id,))
-            rows = cursor.fetchall()
+                """, params).fetchall())
+            if len(rows) > 1 and include_archived:
+                rows.sort(key=lambda row: row["created_at"] or "", reverse=True)
             return [dict_from_row(row) for row in rows]
     
     @staticmethod
@@ -363,15 +695,7 @@ class ApprovalModel:
         Update the status of an approval record.
         Sets the approved_at timestamp if status is Approved or Rejected.
         """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE approvals 
-                SET status = ?, comments = ?, approved_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            """, (status, comments, approval_id))
-            conn.commit()
-            return cursor.rowcount > 0
+        return writer.run(_update_approval, approval_id, status, comments, tables=("approvals",))
     
     @staticmethod
     def get_pending_approval_for_expense(expense_id: int, approver_id: int) -> Optional[Dict[str, Any]]:
@@ -391,6 +715,19 @@ class ApprovalModel:
 
 # ==================== APPROVAL RULES MODEL ====================
 
+def _insert_rule(conn: sqlite3.Connection, values: tuple) -> Dict[str, Any]:
+    rule_id = conn.execute("""
+        INSERT INTO approval_rules (rule_name, rule_type, condition_value, approver_role,
+                                    approver_id, approval_level, department, is_active)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+    """, values).lastrowid
+    return dict_from_row(conn.execute("SELECT * FROM approval_rules WHERE id = ?", (rule_id,)).fetchone())
+
+
+def _deactivate_rule(conn: sqlite3.Connection, rule_id: int) -> bool:
+    return conn.execute("UPDATE approval_rules SET is_active = 0 WHERE id = ?", (rule_id,)).rowcount > 0
+
+
 class ApprovalRuleModel:
     """
     Approval rules model for database operations.
@@ -405,15 +742,10 @@ class ApprovalRuleModel:
         Create a new approval rule.
         Returns the created rule's ID.
         """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO approval_rules (rule_name, rule_type, condition_value, approver_role, 
-                                          approver_id, approval_level, department, is_active)
-                VALUES (?, ?, ?, ?, ?, ?, ?, 1)
-            """, (rule_name, rule_type, condition_value, approver_role, approver_id, approval_level, department))
-            conn.commit()
-            return cursor.lastrowid
+        rule = writer.run(_insert_rule, (rule_name, rule_type, condition_value, approver_role, approver_id,
+                                         approval_level, department), tables=("approval_rules",))
+        rule_engine.add_rule(rule)
+        return rule["id"]
     
     @staticmethod
     def get_active_rules() -> List[Dict[str, Any]]:
@@ -450,8 +782,6 @@ class ApprovalRuleModel:
         """
         Deactivate an approval rule (soft delete).
         """
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("UPDATE approval_rules SET is_active = 0 WHERE id = ?", (rule_id,))
-            conn.commit()
-            return cursor.rowcount > 0
\ No newline at end of file
+        deactivated = writer.run(_deactivate_rule, rule_id, tables=("approval_rules",))
+        rule_engine.remove_rule(rule_id)
+        return deactivated
\ No newline at end of file
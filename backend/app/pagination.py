@@ -0,0 +1,53 @@
+"""
+Keyset (cursor) pagination helpers.
+A cursor is an opaque token holding the sort key of the last row on a page, so
+the next page is a single indexed range scan no matter how deep the client goes.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    """
+    Encode a sort key (e.g. (submitted_at, id)) as a URL-safe token.
+    """
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, size: int = 2) -> Tuple[Any, ...]:
+    """
+    Decode a token produced by encode_cursor.
+    Raises ValueError if the token is malformed or holds anything but strings,
+    numbers and nulls (which sqlite could not bind).
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(key, list) or len(key) != size:
+        raise ValueError("Invalid cursor")
+    if not all(value is None or (isinstance(value, (str, int, float)) and not isinstance(value, bool))
+               for value in key):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+def make_page(rows: List[Dict[str, Any]], limit: int, key_columns: Sequence[str]) -> Dict[str, Any]:
+    """
+    Build a page from up to limit + 1 fetched rows.
+    The extra row only signals that another page exists; it is not returned.
+    """
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    next_cursor: Optional[str] = None
+    if has_more and items:
+        last = items[-1]
+        next_cursor = encode_cursor([last[col] for col in key_columns])
+    return {"items": items, "next_cursor": next_cursor}
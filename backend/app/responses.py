@@ -0,0 +1,121 @@
+"""
+Response classes shared by the routes.
+"""
+
+import json
+import os
+import re
+import sqlite3
+from typing import Any, List, Optional, Tuple
+
+import anyio
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same JSON, only slower
+    orjson = None
+
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)")
+
+
+# ==================== JSON ====================
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode plain JSON data (dicts, lists, str, int, float, bool, None) to UTF-8 bytes,
+    in the same compact form as Starlette's JSONResponse.
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_rows(cursor: sqlite3.Cursor) -> bytes:
+    """
+    Encode a cursor's remaining rows as a JSON array of objects. Keys come from
+    cursor.description once per query; the cursor must yield plain tuples
+    (row_factory None), so no sqlite3.Row or model is built per row.
+    """
+    keys = [column[0] for column in cursor.description]
+    return dumps([dict(zip(keys, row)) for row in cursor])
+
+
+class JSONBytesResponse(Response):
+    """
+    A response whose body is already encoded JSON (see dumps / encode_rows).
+    Returning it skips FastAPI's jsonable_encoder walk and response_model validation;
+    the route's response_model still documents the schema in OpenAPI.
+    """
+    media_type = "application/json"
+
+
+# ==================== FILES ====================
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a Range header into inclusive (start, end) byte ranges clipped to the file.
+    Returns None when there is no usable bytes= header (serve the whole file) and []
+    when every range lies outside the file (416).
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    ranges = []
+    for spec in header[len("bytes="):].split(","):
+        match = _RANGE.fullmatch("bytes=" + spec.strip())
+        if not match or match.groups() == ("", ""):
+            return None
+        first, last = match.groups()
+        if first == "":
+            # Suffix range: the last N bytes.
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        if start <= end and start < size:
+            ranges.append((start, end))
+    return ranges
+
+
+class RangeFileResponse(FileResponse):
+    """
+    FileResponse that can send a single byte range (206) of the file.
+    The body is read in chunk_size pieces, or handed to the server with the ASGI
+    zero-copy send extension (sendfile) when the server offers it.
+    """
+
+    def __init__(self, path: str, byte_range: Optional[Tuple[int, int]] = None, **kwargs):
+        super().__init__(path, **kwargs)
+        self.byte_range = byte_range
+        if byte_range is not None:
+            start, end = byte_range
+            size = self.stat_result.st_size if self.stat_result else os.stat(path).st_size
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+            self.headers["content-length"] = str(end - start + 1)
+        self.headers.setdefault("accept-ranges", "bytes")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        if (self.byte_range is None and not zerocopy) or scope["method"].upper() == "HEAD":
+            await super().__call__(scope, receive, send)
+            return
+
+        start, end = self.byte_range or (0, self.stat_result.st_size - 1)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            if zerocopy:
+                await send({"type": "http.response.zerocopysend", "file": file.wrapped.fileno(),
+                            "offset": start, "count": end - start + 1, "more_body": False})
+            else:
+                await file.seek(start)
+                remaining = end - start + 1
+                while remaining:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": bool(remaining and chunk)})
+                    if not chunk:
+                        break
+        if self.background is not None:
+            await self.background()
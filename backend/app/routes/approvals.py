@@ -1,53 +1,82 @@
-from fastapi import APIRouter, HTTPException
-import sqlite3
-from ..config import DATABASE_PATH
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Optional
+from collections import Counter
+from ..events import approvals_decided
+from ..security import get_optional_claims
+from ..services.approval_workflow import (
+    MAX_BATCH_DECISIONS, AlreadyDecided, ExpenseNotFound, NotAnApprover, VersionConflict,
+    decide, decide_many
+)
+from ..responses import JSONBytesResponse, dumps
+from .expenses import expense_filters, page_params, list_expense_page
 
 router = APIRouter(prefix="/approvals", tags=["Approvals"])
 
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 @router.get("/pending")
-def get_pending_requests():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM expenses WHERE status = 'Pending'")
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+def get_pending_requests(filters: Dict[str, Any] = Depends(expense_filters),
+                         page: Dict[str, Any] = Depends(page_params)):
+    return JSONBytesResponse(dumps(list_expense_page({**filters, "status": "Pending"}, page)))
 
-@router.put("/{expense_id}/approve")
-def approve_request(expense_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,))
-    expense = cursor.fetchone()
-    if expense is None:
-        conn.close()
+# Optional decision body; the approver comes from the bearer token when one is sent
+class Decision(BaseModel):
+    approver_id: Optional[int] = None
+    comments: Optional[str] = None
+    expected_version: Optional[int] = None  # version read by the client, for optimistic concurrency
+
+def apply_decision(expense_id: int, approve: bool, decision: Optional[Decision],
+                   claims: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    decision = decision or Decision()
+    approver_id = int(claims["sub"]) if claims else decision.approver_id
+    try:
+        result = decide(expense_id, approver_id, approve, decision.comments, decision.expected_version)
+    except ExpenseNotFound:
         raise HTTPException(status_code=404, detail="Expense not found")
-    cursor.execute(
-        "UPDATE expenses SET status = 'Approved', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-        (expense_id,)
-    )
-    conn.commit()
-    conn.close()
-    return {"message": f"Expense {expense_id} approved successfully."}
+    except NotAnApprover as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except (AlreadyDecided, VersionConflict) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    approvals_decided(approver_id, approve, [result])
+    return result
+
+def decision_message(expense_id: int, verb: str, result: Dict[str, Any]) -> str:
+    if result["status"] in ("Approved", "Rejected"):
+        return f"Expense {expense_id} {result['status'].lower()} successfully."
+    return f"Expense {expense_id} {verb} at level {result['current_level']}; now {result['status']}."
+
+@router.put("/{expense_id}/approve")
+def approve_request(expense_id: int, decision: Optional[Decision] = None,
+                    claims: Optional[Dict[str, Any]] = Depends(get_optional_claims)):
+    result = apply_decision(expense_id, True, decision, claims)
+    return {"message": decision_message(expense_id, "approved", result), **result}
 
 @router.put("/{expense_id}/reject")
-def reject_request(expense_id: int):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM expenses WHERE id = ?", (expense_id,))
-    expense = cursor.fetchone()
-    if expense is None:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Expense not found")
-    cursor.execute(
-        "UPDATE expenses SET status = 'Rejected', updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-        (expense_id,)
-    )
-    conn.commit()
-    conn.close()
-    return {"message": f"Expense {expense_id} rejected successfully."}
+def reject_request(expense_id: int, decision: Optional[Decision] = None,
+                   claims: Optional[Dict[str, Any]] = Depends(get_optional_claims)):
+    result = apply_decision(expense_id, False, decision, claims)
+    return {"message": decision_message(expense_id, "rejected", result), **result}
+
+# Batch decision body: explicit expense_ids, or a filter over the approver's inbox
+class BatchDecision(BaseModel):
+    decision: Literal["approve", "reject"]
+    expense_ids: Optional[List[int]] = None
+    max_amount: Optional[float] = None     # filter: only expenses up to this amount
+    reports_only: bool = False             # filter: only expenses from the approver's direct reports
+    approver_id: Optional[int] = None
+    comments: Optional[str] = None
+
+@router.post("/batch")
+def decide_batch(batch: BatchDecision, claims: Optional[Dict[str, Any]] = Depends(get_optional_claims)):
+    approver_id = int(claims["sub"]) if claims else batch.approver_id
+    if batch.expense_ids is None and approver_id is None:
+        raise HTTPException(status_code=400, detail="An approver is required to decide by filter")
+    if batch.expense_ids is not None and len(batch.expense_ids) > MAX_BATCH_DECISIONS:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {MAX_BATCH_DECISIONS} expenses per batch; split the request")
+    results = decide_many(approver_id, batch.decision == "approve", batch.expense_ids, batch.comments,
+                          batch.max_amount, batch.reports_only)
+    approvals_decided(approver_id, batch.decision == "approve", results)
+    counts = Counter(r["outcome"] for r in results)
+    return {"applied": counts["applied"], "not_found": counts["not_found"],
+            "already_decided": counts["already_decided"], "not_an_approver": counts["not_an_approver"],
+            "results": results}
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 import sqlite3
-from passlib.context import CryptContext
-from ..config import DATABASE_PATH
+from ..async_models import run_db
+from ..database import get_db_connection
+from ..models import UserModel
+from ..security import (
+    HashQueueFull, create_access_token, get_current_claims, password_hasher
+)
+from .. import config
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Request body schemas
 class UserLogin(BaseModel):
@@ -20,46 +24,65 @@ class UserRegister(BaseModel):
     manager_id: int | None = None
     department: str | None = None
 
-# Helper to verify password
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Helper to verify password (runs in the hashing process pool)
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except HashQueueFull:
+        raise HTTPException(status_code=503, detail="Too many login attempts in progress, retry shortly")
 
-# Helper to hash password
-def hash_password(password):
-    return pwd_context.hash(password)
+# Helper to hash password (runs in the hashing process pool)
+async def hash_password(password):
+    try:
+        return await password_hasher.hash(password)
+    except HashQueueFull:
+        raise HTTPException(status_code=503, detail="Too many registrations in progress, retry shortly")
+
+def _find_user(email):
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, email, hashed_password, role FROM users WHERE email = ?", (email,))
+        return cursor.fetchone()
+
+def _insert_user(user: UserRegister, hashed_pwd: str) -> int:
+    return UserModel.create_user(user.email, hashed_pwd, user.full_name, user.role,
+                                 user.manager_id, user.department)
 
 # ---------------- Register endpoint ----------------
 @router.post("/register")
-def register(user: UserRegister):
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE email = ?", (user.email,))
-    if cursor.fetchone():
-        conn.close()
+async def register(user: UserRegister):
+    if await run_db(_find_user, user.email):
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    hashed_pwd = await hash_password(user.password)
+    try:
+        new_id = await run_db(_insert_user, user, hashed_pwd)
+    except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_pwd = hash_password(user.password)
-    cursor.execute(
-        """INSERT INTO users (email, hashed_password, full_name, role, manager_id, department)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (user.email, hashed_pwd, user.full_name, user.role, user.manager_id, user.department)
-    )
-    conn.commit()
-    new_id = cursor.lastrowid
-    conn.close()
     return {"id": new_id, "email": user.email, "full_name": user.full_name, "role": user.role}
 
 # ---------------- Login endpoint ----------------
 @router.post("/login")
-def login(credentials: UserLogin):
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, email, hashed_password FROM users WHERE email = ?", (credentials.email,))
-    user = cursor.fetchone()
-    conn.close()
+async def login(credentials: UserLogin):
+    user = await run_db(_find_user, credentials.email)
 
-    if not user or not verify_password(credentials.password, user[2]):
+    if not user or not await verify_password(credentials.password, user["hashed_password"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
-    
-    # For simplicity, returning a dummy token. You can replace with JWT.
-    return {"message": f"User {user[1]} logged in successfully", "token": "dummy-token"}
+
+    token = create_access_token(user["id"], user["email"], user["role"])
+    return {
+        "message": f"User {user['email']} logged in successfully",
+        "token": token,
+        "token_type": "bearer",
+        "expires_in": config.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+# ---------------- Current user (from the token, no database hit) ----------------
+@router.get("/me")
+def me(claims: dict = Depends(get_current_claims)):
+    return {"id": int(claims["sub"]), "email": claims["email"], "role": claims["role"]}
+
+# ---------------- Hashing pool metrics ----------------
+@router.get("/metrics")
+def auth_metrics():
+    return password_hasher.stats()
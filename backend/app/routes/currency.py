@@ -0,0 +1,41 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import date
+from ..services.currency import RatesUnavailable, rate_service
+
+router = APIRouter(prefix="/api/currency", tags=["Currency"])
+
+MAX_CONVERT_ITEMS = 10000
+
+class ConvertItem(BaseModel):
+    amount: float
+    currency: str
+    expense_date: Optional[date] = None  # rate of this day; latest if omitted
+
+class ConvertRequest(BaseModel):
+    items: List[ConvertItem] = Field(..., max_length=MAX_CONVERT_ITEMS)
+    target: Optional[str] = None  # defaults to the company currency
+
+# Rates used for a day (latest if omitted), in the company currency
+@router.get("/rates")
+def get_rates(day: Optional[date] = None):
+    try:
+        return rate_service.rates(day)
+    except RatesUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+# Convert many amounts in one call; items without a known rate get converted_amount null
+@router.post("/convert")
+def convert(request: ConvertRequest):
+    rows = [{"amount": item.amount, "currency": item.currency.upper(), "expense_date": item.expense_date}
+            for item in request.items]
+    try:
+        rate_service.convert_rows(rows, request.target.upper() if request.target else None)
+    except RatesUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "target": request.target.upper() if request.target else rate_service.base,
+        "items": [{"amount": r["amount"], "currency": r["currency"], "expense_date": r["expense_date"],
+                   "converted_amount": r["converted_amount"]} for r in rows],
+    }
@@ -0,0 +1,13 @@
+from fastapi import APIRouter, Query
+from typing import Optional
+from ..async_models import run_db
+from ..services import dashboard
+
+router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
+
+# Expense counts and amounts by status, category, department and month, read from the
+# trigger-maintained totals rather than aggregated over the expenses table
+@router.get("")
+async def get_dashboard(employee_id: Optional[int] = None,
+                        months: int = Query(dashboard.DEFAULT_MONTHS, ge=1, le=120)):
+    return await run_db(dashboard.summary, employee_id, months)
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from ..events import event_bus, stream
+from ..security import InvalidToken, decode_token
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+
+# Server-Sent Events feed of expense and approval changes for the token's user (all of
+# them for admins). EventSource cannot set headers, so the token may come as ?token=.
+# Reconnects send Last-Event-ID (or ?last_event_id=) to replay what was missed.
+@router.get("")
+async def subscribe(token: Optional[str] = None,
+                    last_event_id: Optional[str] = Query(None),
+                    authorization: Optional[str] = Header(None),
+                    last_event_id_header: Optional[str] = Header(None, alias="last-event-id")):
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    if not token:
+        raise HTTPException(status_code=401, detail="A bearer token or ?token= is required",
+                            headers={"WWW-Authenticate": "Bearer"})
+    try:
+        claims = decode_token(token)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+    user_id, role = int(claims["sub"]), claims["role"]
+
+    sub, replay = event_bus.subscribe(user_id, role == "Admin", last_event_id_header or last_event_id)
+    return StreamingResponse(
+        stream(sub, replay),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,62 +1,147 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-import sqlite3
-from ..config import DATABASE_PATH
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Literal, Optional
+import csv
+import io
+import json
+import tempfile
+from ..async_models import run_db
+from ..events import expenses_created
+from ..models import ExpenseModel
+from ..pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..responses import JSONBytesResponse, dumps
+from ..schemas import ExpenseCreate
+from ..services.approval_workflow import submit_expense
+from ..services.currency import RatesUnavailable, rate_service
+from ..services.duplicates import flagged
+from ..services.expense_import import (
+    MAX_BATCH_SIZE, aiter_chunks, aiter_records, import_chunk, import_items, summarize
+)
 from datetime import date
 
 router = APIRouter(prefix="/api/expenses", tags=["Expenses"])
 
-# Request body schema
-class ExpenseCreate(BaseModel):
-    employee_id: int
-    amount: float
-    description: str
-    category: str = "General"   # default category
-    currency: str = "USD"       # default currency
-    expense_date: date = date.today()  # default today
+# Query-string filters shared by the expense listings
+def expense_filters(
+    status: Optional[str] = Query(None, description="Pending, Approved, Rejected or In Review"),
+    employee_id: Optional[int] = None,
+    department: Optional[str] = None,
+    category: Optional[str] = None,
+    currency: Optional[str] = None,
+    date_from: Optional[date] = Query(None, description="Earliest expense_date (inclusive)"),
+    date_to: Optional[date] = Query(None, description="Latest expense_date (inclusive)"),
+    org_manager_id: Optional[int] = Query(None, description="Only expenses from this manager's org, at any depth"),
+) -> Dict[str, Any]:
+    return {
+        "status": status,
+        "employee_id": employee_id,
+        "department": department,
+        "category": category,
+        "currency": currency,
+        "date_from": date_from,
+        "date_to": date_to,
+        "org_manager_id": org_manager_id,
+    }
+
+# Keyset pagination parameters
+def page_params(
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    order: Literal["desc", "asc"] = Query("desc", description="Sort by submitted_at"),
+) -> Dict[str, Any]:
+    return {"cursor": cursor, "limit": limit, "order": order}
+
+# One page of expenses; a malformed cursor is a client error. The page holds plain
+# dicts, so routes return it pre-encoded with dumps() instead of via jsonable_encoder.
+def list_expense_page(filters: Dict[str, Any], page: Dict[str, Any],
+                      include_archived: bool = False) -> Dict[str, Any]:
+    try:
+        return ExpenseModel.list_expenses(**filters, **page, include_archived=include_archived)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-# Get all expenses
+# Get expenses, one page at a time; convert_to adds converted_amount at each expense_date's rate
 @router.get("/")
-def get_expenses():
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, employee_id, amount, description, status FROM expenses")
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [
-        {
-            "id": row[0],
-            "employee_id": row[1],
-            "amount": row[2],
-            "description": row[3],
-            "status": row[4]
-        }
-        for row in rows
-    ]
+def get_expenses(filters: Dict[str, Any] = Depends(expense_filters),
+                 page: Dict[str, Any] = Depends(page_params),
+                 convert_to: Optional[str] = Query(None, description="Currency code, e.g. the company currency"),
+                 include_archived: bool = Query(False, description="Also list expenses moved to the yearly archives")):
+    result = list_expense_page(filters, page, include_archived)
+    if convert_to:
+        try:
+            rate_service.convert_rows(result["items"], convert_to.upper())
+        except RatesUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    return JSONBytesResponse(dumps(result))
+
+# Full-text search over description and category, ranked (or newest first), with the
+# listing filters and keyset pagination; the last word also matches as a prefix
+@router.get("/search")
+def search_expenses(q: str = Query(..., min_length=1, description='Words to match, e.g. "uber airport"; air* for a prefix'),
+                    prefix: bool = Query(True, description="Treat the last word as a prefix"),
+                    sort: Literal["relevance", "newest"] = "relevance",
+                    filters: Dict[str, Any] = Depends(expense_filters),
+                    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+                    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    try:
+        result = ExpenseModel.search_expenses(q, prefix, sort, **filters, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return JSONBytesResponse(dumps(result))
+
+# Duplicate flags on an expense (from its submission or a rescan), with either side of the pair
+@router.get("/{expense_id}/duplicates")
+def get_expense_duplicates(expense_id: int):
+    return {"expense_id": expense_id, "duplicates": flagged(expense_id)}
+
+# Columns written by the export endpoint, in order
+EXPORT_COLUMNS = [
+    "id", "employee_id", "employee_name", "employee_email", "employee_department",
+    "amount", "currency", "category", "description", "expense_date", "status",
+    "receipt_url", "submitted_at", "updated_at",
+]
+
+# Encode streamed rows a batch at a time so each yield is a reasonably sized chunk
+def export_chunks(rows, format: str, batch_size: int = 500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if format == "csv" else None
+    if writer:
+        writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        if writer:
+            writer.writerow([row[col] for col in EXPORT_COLUMNS])
+        else:
+            buffer.write(json.dumps({col: row[col] for col in EXPORT_COLUMNS}))
+            buffer.write("\n")
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+# Export every matching expense as CSV or NDJSON, streamed straight from the cursor
+@router.get("/export")
+def export_expenses(format: Literal["csv", "ndjson"] = "csv",
+                    filters: Dict[str, Any] = Depends(expense_filters),
+                    include_archived: bool = Query(False, description="Also export archived expenses")):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_chunks(ExpenseModel.iter_expenses(**filters, include_archived=include_archived), format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="expenses.{format}"'},
+    )
 
 # Add a new expense
 @router.post("/")
 def create_expense(expense: ExpenseCreate):
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        """INSERT INTO expenses 
-           (employee_id, amount, description, category, currency, expense_date, status) 
-           VALUES (?, ?, ?, ?, ?, ?, ?)""",
-        (
-            expense.employee_id,
-            expense.amount,
-            expense.description,
-            expense.category,
-            expense.currency,
-            expense.expense_date,
-            "Pending"
-        )
-    )
-    conn.commit()
-    new_id = cursor.lastrowid
-    conn.close()
+    # The insert and the expense's approval levels commit together, batched with
+    # other submissions and decisions by the group-commit writer
+    submitted = submit_expense(**expense.model_dump())
+    new_id = submitted["id"]
+    expenses_created([new_id])
 
     return {
         "id": new_id,
@@ -66,5 +151,47 @@ def create_expense(expense: ExpenseCreate):
         "category": expense.category,
         "currency": expense.currency,
         "expense_date": str(expense.expense_date),
-        "status": "Pending"
+        "status": "Pending",
+        # Earlier expenses this one matches (exact, same receipt, or near), strongest first
+        "duplicates": submitted["duplicates"],
     }
+
+# Submit many expenses at once; each item is validated on its own
+@router.post("/batch")
+def create_expenses_batch(items: List[Dict[str, Any]] = Body(...)):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_SIZE} expenses per batch")
+    results = import_items(items)
+    expenses_created([r["id"] for r in results if "id" in r])
+    return summarize(results)
+
+# Stream a CSV (with header row) or NDJSON upload; results come back as NDJSON, one line per row
+@router.post("/import")
+async def import_expenses(request: Request, format: Optional[Literal["csv", "ndjson"]] = None):
+    fmt = format or ("ndjson" if "json" in request.headers.get("content-type", "") else "csv")
+    results = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    created = failed = 0
+    async for chunk in aiter_chunks(aiter_records(request.stream(), fmt)):
+        chunk_results = await run_db(import_chunk, chunk)
+        ids = [result["id"] for result in chunk_results if "id" in result]
+        created += len(ids)
+        failed += len(chunk_results) - len(ids)
+        for result in chunk_results:
+            results.write(json.dumps(result).encode() + b"\n")
+        if ids:
+            await run_db(expenses_created, ids)
+    results.seek(0)
+
+    def stream_results():
+        with results:
+            while True:
+                block = results.read(64 * 1024)
+                if not block:
+                    break
+                yield block
+
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        headers={"X-Import-Created": str(created), "X-Import-Failed": str(failed)},
+    )
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+from ..async_models import AsyncExpenseModel, run_db
+from ..services import receipt_store
+from ..services.ocr import OcrQueueFull, ocr_queue
+
+router = APIRouter(prefix="/api/ocr", tags=["OCR"])
+
+# Upload a receipt image as the raw request body and queue it for scanning.
+# Returns 202 right away; poll the job's status_url for the result.
+@router.post("/jobs", status_code=202)
+async def create_ocr_job(expense_id: int, request: Request, autofill: bool = False):
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith(("image/", "application/octet-stream")):
+        raise HTTPException(status_code=415, detail="Send the receipt image as the request body")
+    if not await AsyncExpenseModel.get_expense_by_id(expense_id):
+        raise HTTPException(status_code=404, detail="Expense not found")
+    try:
+        content_hash, _, _ = await receipt_store.save_stream(request.stream())
+    except receipt_store.ReceiptTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        job = await run_db(ocr_queue.enqueue, expense_id, content_hash, autofill)
+    except OcrQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    status_url = f"/api/ocr/jobs/{job['id']}"
+    return JSONResponse({**job, "status_url": status_url}, status_code=202, headers={"Location": status_url})
+
+# Poll a job: Queued, Running, Done (with result) or Failed (with error)
+@router.get("/jobs/{job_id}")
+async def get_ocr_job(job_id: int):
+    job = await run_db(ocr_queue.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="OCR job not found")
+    return job
+
+# Every scan of an expense's receipts, newest first
+@router.get("/expenses/{expense_id}/jobs")
+async def get_expense_ocr_jobs(expense_id: int):
+    return await run_db(ocr_queue.jobs_for_expense, expense_id)
+
+@router.get("/metrics")
+def ocr_metrics():
+    return ocr_queue.stats()
@@ -0,0 +1,100 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from fastapi.responses import Response
+from typing import Optional
+import os
+from .. import config
+from ..async_models import AsyncExpenseModel, run_db
+from ..database import get_db_connection
+from ..responses import RangeFileResponse, parse_range
+from ..services import receipt_store
+from ..services.ocr import OcrQueueFull, ocr_queue
+from ..writer import writer
+
+router = APIRouter(prefix="/api/receipts", tags=["Receipts"])
+
+# Stored receipts never change, so clients may cache them for good
+CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+def _attach_job(conn, expense_id: int, stored: dict) -> None:
+    conn.execute("""
+        INSERT OR IGNORE INTO receipts (content_hash, size, content_type) VALUES (?, ?, ?)
+    """, (stored["content_hash"], stored["size"], stored["content_type"]))
+    conn.execute("UPDATE expenses SET receipt_url = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                 (f"/api/receipts/{stored['content_hash']}", expense_id))
+
+def _attach(expense_id: int, stored: dict) -> None:
+    writer.run(_attach_job, expense_id, stored, tables=("expenses",))
+
+def _lookup(content_hash: str) -> Optional[dict]:
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT * FROM receipts WHERE content_hash = ?", (content_hash,)).fetchone()
+    return dict(row) if row else None
+
+# Upload an expense's receipt as multipart/form-data (field "file"). The body is
+# streamed to disk while hashing; the thumbnail and optional OCR scan run afterwards.
+@router.post("/", status_code=201)
+async def upload_receipt(expense_id: int, request: Request, background_tasks: BackgroundTasks,
+                         scan: bool = False, autofill: bool = False):
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > config.RECEIPT_MAX_BYTES + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"Receipt exceeds {config.RECEIPT_MAX_BYTES} bytes")
+    if not await AsyncExpenseModel.get_expense_by_id(expense_id):
+        raise HTTPException(status_code=404, detail="Expense not found")
+    try:
+        stored = await receipt_store.save_multipart(request.headers.get("content-type", ""), request.stream())
+    except receipt_store.ReceiptTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except receipt_store.UnsupportedReceipt as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    await run_db(_attach, expense_id, stored)
+
+    if stored["content_type"].startswith("image/"):
+        background_tasks.add_task(receipt_store.make_thumbnail, stored["content_hash"])
+    job = None
+    if scan:
+        try:
+            job = await run_db(ocr_queue.enqueue, expense_id, stored["content_hash"], autofill)
+        except OcrQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "content_hash": stored["content_hash"],
+        "size": stored["size"],
+        "content_type": stored["content_type"],
+        "receipt_url": f"/api/receipts/{stored['content_hash']}",
+        "ocr_job": job,
+    }
+
+# Serve a stored file with a strong ETag (its hash), conditional GET and byte ranges
+def _file_response(request: Request, path: str, etag: str, media_type: str):
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers={"etag": etag, "cache-control": CACHE_CONTROL})
+    stat_result = os.stat(path)
+    headers = {"etag": etag, "cache-control": CACHE_CONTROL}
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range == etag:
+        ranges = parse_range(request.headers.get("range"), stat_result.st_size)
+        if ranges == []:
+            return Response(status_code=416, headers={"content-range": f"bytes */{stat_result.st_size}"})
+        if ranges and len(ranges) == 1:
+            # Multiple ranges are answered with the whole file, which HTTP allows.
+            byte_range = ranges[0]
+    return RangeFileResponse(path, byte_range=byte_range, stat_result=stat_result,
+                             media_type=media_type, headers=headers)
+
+@router.get("/{content_hash}")
+@router.head("/{content_hash}", include_in_schema=False)
+async def download_receipt(content_hash: str, request: Request):
+    receipt = await run_db(_lookup, content_hash) if receipt_store.is_hash(content_hash) else None
+    if not receipt or not receipt_store.exists(content_hash):
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    return _file_response(request, receipt_store.path_for(content_hash), f'"{content_hash}"',
+                          receipt["content_type"])
+
+@router.get("/{content_hash}/thumbnail")
+@router.head("/{content_hash}/thumbnail", include_in_schema=False)
+async def download_thumbnail(content_hash: str, request: Request):
+    path = receipt_store.thumbnail_path(content_hash) if receipt_store.is_hash(content_hash) else None
+    if not path or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Thumbnail not found (PDF receipt, or not generated yet)")
+    return _file_response(request, path, f'"{content_hash}-thumb"', "image/jpeg")
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Any, Dict, Literal, Optional
+from datetime import date
+from ..async_models import run_db
+from ..services.analytics import analytics
+from ..services.currency import RatesUnavailable
+
+router = APIRouter(prefix="/api/reports", tags=["Reports"])
+
+# Filters shared by the spend reports
+def report_filters(
+    status: Optional[str] = Query(None, description="Only this status; default: everything not rejected"),
+    department: Optional[str] = None,
+    category: Optional[str] = None,
+    date_from: Optional[date] = Query(None, description="Earliest expense_date (inclusive)"),
+    date_to: Optional[date] = Query(None, description="Latest expense_date (inclusive)"),
+) -> Dict[str, Any]:
+    return {
+        "status": status,
+        "department": department,
+        "category": category,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+
+# Run a report on a database thread; amounts are in `currency` (default: company currency)
+async def run_report(report, currency: Optional[str], **kwargs) -> Dict[str, Any]:
+    try:
+        return await run_db(report, currency, **kwargs)
+    except RatesUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+# Spend per department with percentiles
+@router.get("/departments")
+async def department_spend(currency: Optional[str] = None,
+                           filters: Dict[str, Any] = Depends(report_filters)):
+    return await run_report(analytics.departments, currency, **filters)
+
+# Monthly spend with month-over-month change
+@router.get("/trends")
+async def monthly_trends(currency: Optional[str] = None,
+                         filters: Dict[str, Any] = Depends(report_filters)):
+    return await run_report(analytics.trends, currency, **filters)
+
+# Expenses far above the median of their category, department or employee
+@router.get("/outliers")
+async def outliers(currency: Optional[str] = None,
+                   by: Literal["category", "department", "employee"] = "category",
+                   threshold: float = Query(3.5, gt=0, description="Robust z-score above which an expense is flagged"),
+                   limit: int = Query(50, ge=1, le=1000),
+                   filters: Dict[str, Any] = Depends(report_filters)):
+    return await run_report(analytics.outliers, currency, by=by, threshold=threshold, limit=limit, **filters)
+
+# Size and freshness of the columnar snapshot
+@router.get("/snapshot")
+def snapshot_stats():
+    return analytics.stats()
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
 from pydantic import BaseModel
-import sqlite3
-from ..config import DATABASE_PATH
+from ..async_models import AsyncUserModel, run_db
+from ..responses import JSONBytesResponse
+from ..services import org_hierarchy
 
 router = APIRouter(prefix="/api/users", tags=["Users"])
 
@@ -14,20 +15,29 @@ class User(BaseModel):
     manager_id: int | None = None
     department: str | None = None
 
+# Only the User fields are selected, and rows go straight from the cursor to JSON bytes
+USER_COLUMNS = list(User.model_fields)
+
 @router.get("/", response_model=List[User])
 async def get_users():
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, email, full_name, role, manager_id, department FROM users")
-        users = cursor.fetchall()
-    return [User(id=u[0], email=u[1], full_name=u[2], role=u[3], manager_id=u[4], department=u[5]) for u in users]
+    return JSONBytesResponse(await AsyncUserModel.get_all_users_json(USER_COLUMNS))
 
 @router.get("/{user_id}", response_model=User)
 async def get_user(user_id: int):
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, email, full_name, role, manager_id, department FROM users WHERE id=?", (user_id,))
-        user = cursor.fetchone()
+    user = await AsyncUserModel.get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return User(id=user[0], email=user[1], full_name=user[2], role=user[3], manager_id=user[4], department=user[5])
+    return user
+
+class OrgMember(User):
+    depth: int  # management levels between this user and the one queried
+
+# Managers above a user, nearest first
+@router.get("/{user_id}/chain", response_model=List[OrgMember])
+async def get_management_chain(user_id: int):
+    return await run_db(org_hierarchy.management_chain, user_id)
+
+# Everyone in a manager's org, optionally only max_depth levels down
+@router.get("/{user_id}/org", response_model=List[OrgMember])
+async def get_org(user_id: int, max_depth: Optional[int] = Query(None, ge=1)):
+    return await run_db(org_hierarchy.subtree, user_id, max_depth)
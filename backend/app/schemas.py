@@ -0,0 +1,15 @@
+"""
+Pydantic schemas shared by routes and services.
+"""
+
+from datetime import date
+from pydantic import BaseModel, Field
+
+
+class ExpenseCreate(BaseModel):
+    employee_id: int
+    amount: float
+    description: str
+    category: str = "General"   # default category
+    currency: str = "USD"       # default currency
+    expense_date: date = Field(default_factory=date.today)  # default today
@@ -0,0 +1,201 @@
+"""
+Password hashing and access tokens for the Expense Approval System.
+bcrypt runs in a dedicated, bounded process pool so a burst of logins cannot starve
+the request threadpool, and signed JWTs let requests be authorized without SQLite.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+from passlib.context import CryptContext
+
+from . import config
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class HashQueueFull(RuntimeError):
+    """
+    Raised when more password hashes are pending than AUTH_HASH_MAX_QUEUE allows.
+    """
+
+
+class InvalidToken(ValueError):
+    """
+    Raised for a token that is malformed, badly signed or expired.
+    """
+
+
+# ==================== PASSWORD HASHING ====================
+
+# These run inside the worker processes and report their own CPU time.
+def _hash_worker(password: str) -> Tuple[str, float]:
+    start = time.perf_counter()
+    return pwd_context.hash(password), time.perf_counter() - start
+
+
+def _verify_worker(password: str, hashed: str) -> Tuple[bool, float]:
+    start = time.perf_counter()
+    return pwd_context.verify(password, hashed), time.perf_counter() - start
+
+
+class PasswordHasher:
+    """
+    Bounded process pool for bcrypt with queueing metrics.
+    At most max_queue operations may be pending; beyond that callers get HashQueueFull
+    (mapped to 503) instead of piling up behind a login storm.
+    """
+
+    def __init__(self, workers: int = config.AUTH_HASH_WORKERS,
+                 max_queue: int = config.AUTH_HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_wait_total = 0.0
+        self._hash_time_total = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: never fork a process that already runs request threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._rejected += 1
+                raise HashQueueFull(f"{self._pending} password operations already queued")
+            self._pending += 1
+        start = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, worker_time = await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._completed += 1
+            self._hash_time_total += worker_time
+            self._queue_wait_total += max(elapsed - worker_time, 0.0)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash_worker, password)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(_verify_worker, password, hashed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self._completed or 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_wait_avg_ms": round(self._queue_wait_total * 1000 / done, 3),
+                "hash_time_avg_ms": round(self._hash_time_total * 1000 / done, 3),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+password_hasher = PasswordHasher()
+
+
+# ==================== ACCESS TOKENS ====================
+
+def create_access_token(user_id: int, email: str, role: str,
+                        expires_minutes: int = config.ACCESS_TOKEN_EXPIRE_MINUTES) -> str:
+    """
+    Issue a signed, expiring JWT carrying the claims routes need to authorize a request.
+    """
+    now = datetime.now(timezone.utc)
+    claims = {
+        "sub": str(user_id),
+        "email": email,
+        "role": role,
+        "iat": int(now.timestamp()),
+        "exp": int((now + timedelta(minutes=expires_minutes)).timestamp()),
+    }
+    return jwt.encode(claims, config.SECRET_KEY, algorithm=config.JWT_ALGORITHM)
+
+
+_claims_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_claims_lock = threading.Lock()
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """
+    Validate a token and return its claims.
+    Verified claims are kept in a bounded LRU so repeat requests skip the signature
+    check; expiry is still enforced on every hit.
+    Raises InvalidToken.
+    """
+    with _claims_lock:
+        claims = _claims_cache.get(token)
+        if claims is not None:
+            _claims_cache.move_to_end(token)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, config.SECRET_KEY, algorithms=[config.JWT_ALGORITHM])
+        except JWTError as e:
+            raise InvalidToken(str(e)) from e
+        with _claims_lock:
+            _claims_cache[token] = claims
+            while len(_claims_cache) > config.TOKEN_CACHE_SIZE:
+                _claims_cache.popitem(last=False)
+    if claims.get("exp", 0) <= time.time():
+        with _claims_lock:
+            _claims_cache.pop(token, None)
+        raise InvalidToken("Token has expired")
+    return claims
+
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def get_optional_claims(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer),
+) -> Optional[Dict[str, Any]]:
+    """
+    Dependency: token claims if a valid bearer token was sent, else None.
+    """
+    if credentials is None:
+        return None
+    try:
+        return decode_token(credentials.credentials)
+    except InvalidToken as e:
+        raise HTTPException(status_code=401, detail=str(e), headers={"WWW-Authenticate": "Bearer"})
+
+
+def get_current_claims(claims: Optional[Dict[str, Any]] = Depends(get_optional_claims)) -> Dict[str, Any]:
+    """
+    Dependency: token claims, or 401 when no token was sent.
+    """
+    if claims is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return claims
@@ -0,0 +1,439 @@
+"""
+Spend analytics over a columnar snapshot of expenses.
+The columns reports need (id, employee, amount, currency, category, status, day) are
+held as NumPy arrays, with strings dictionary-encoded to small integer codes. The
+snapshot is loaded once and then kept in sync by re-reading only the rows whose
+updated_at moved since the last refresh (idx_expenses_updated_at), so group-bys,
+quantiles, trends and outlier scores are a few vectorized passes over arrays instead
+of building a dict per row.
+Expenses in the attached archives (app/services/archive.py) are loaded too; they are
+read-only, so refreshes only re-read the main database.
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .. import config
+from ..database import attached_archives, get_db_connection
+from .currency import rate_service
+
+LOAD_CHUNK_ROWS = 100_000
+# Rows committed a little after a later timestamp was already seen are still picked up.
+REFRESH_OVERLAP_SECONDS = 60
+DEFAULT_STATUSES = ("Pending", "In Review", "Approved")   # spend = everything not rejected
+QUANTILES = (0.5, 0.9, 0.99)
+FEW_GROUPS = 64           # group_quantiles partitions per group up to this many groups
+MAD_TO_SIGMA = 1.4826     # scales a median absolute deviation to a normal standard deviation
+
+_NAT = np.iinfo(np.int64).min
+_SELECT = """
+    SELECT id, employee_id, amount, currency, category, status,
+           CAST(julianday(expense_date) - 2440587.5 AS INTEGER), updated_at
+    FROM {schema}.expenses
+"""
+COLUMNS = ("id", "employee_id", "amount", "currency", "category", "status", "day")
+
+
+class _Codes:
+    """
+    Dictionary encoding of a string column: labels[code] is the string for a code.
+    """
+
+    def __init__(self):
+        self.labels: List[Any] = []
+        self.index: Dict[Any, int] = {}
+
+    def encode(self, values: Sequence[Any]) -> np.ndarray:
+        for value in set(values) - self.index.keys():
+            self.index[value] = len(self.labels)
+            self.labels.append(value)
+        return np.fromiter(map(self.index.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def lookup(self, values: Iterable[Any]) -> List[int]:
+        """
+        Codes of the values seen so far (unknown values are skipped).
+        """
+        return [self.index[value] for value in values if value in self.index]
+
+
+def group_quantiles(groups: np.ndarray, values: np.ndarray, n_groups: int,
+                    qs: Sequence[float]) -> np.ndarray:
+    """
+    Quantiles of values within each group, interpolated linearly like np.quantile.
+    Returns an n_groups x len(qs) array with NaN rows for empty groups.
+    """
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    result = np.full((n_groups, len(qs)), np.nan)
+    present = np.flatnonzero(counts)
+    # A stable sort by group code makes each group a contiguous run; NumPy radix-sorts
+    # 16-bit keys, which is several times faster than sorting the int32 codes.
+    keys = groups.astype(np.int16) if n_groups <= np.iinfo(np.int16).max else groups
+    if len(present) <= FEW_GROUPS:
+        # Few groups: partition each run instead of sorting all values.
+        ordered = values[np.argsort(keys, kind="stable")]
+        for group in present:
+            result[group] = np.quantile(ordered[starts[group]:starts[group] + counts[group]], qs)
+        return result
+    # Many groups: sort by value, then stably by group, so each run is sorted.
+    order = np.argsort(values)
+    order = order[np.argsort(keys[order], kind="stable")]
+    ordered = values[order]
+    if len(present):
+        last = (counts[present] - 1)[:, None]
+        positions = last * np.asarray(qs, dtype=float)
+        lower = np.floor(positions).astype(np.int64)
+        upper = np.minimum(lower + 1, last)
+        fraction = positions - lower
+        base = starts[present][:, None]
+        result[present] = ordered[base + lower] * (1 - fraction) + ordered[base + upper] * fraction
+    return result
+
+
+# ==================== SNAPSHOT ====================
+
+class ColumnarSnapshot:
+    """
+    The analytics columns of every expense, as parallel arrays sorted by id.
+    currency / category / status are codes into the matching _Codes; departments
+    are looked up through employee_department (users.id -> department code), so
+    moving an employee between departments needs no expense rewrite.
+    """
+
+    def __init__(self):
+        self.id = np.empty(0, np.int64)
+        self.employee_id = np.empty(0, np.int64)
+        self.amount = np.empty(0, np.float64)
+        self.currency = np.empty(0, np.int32)
+        self.category = np.empty(0, np.int32)
+        self.status = np.empty(0, np.int32)
+        self.day = np.empty(0, "datetime64[D]")
+        self.currencies, self.categories, self.statuses, self.departments = _Codes(), _Codes(), _Codes(), _Codes()
+        self.employee_department = np.empty(0, np.int32)
+        self.watermark: Optional[str] = None    # newest updated_at seen
+        self.archived = 0                       # rows loaded from the archives
+        self.version = 0                        # bumped whenever rows change
+        self._converted: Dict[str, Tuple[int, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+    def _decode(self, rows: List[tuple]) -> Tuple[Dict[str, np.ndarray], str]:
+        ids, employees, amounts, currencies, categories, statuses, days, updated = zip(*rows)
+        day_numbers = np.array(days, dtype=float)    # NULL (unparseable date) -> NaN
+        day = np.full(len(rows), _NAT, np.int64)
+        known = ~np.isnan(day_numbers)
+        day[known] = day_numbers[known]
+        columns = {
+            "id": np.array(ids, np.int64),
+            "employee_id": np.array(employees, np.int64),
+            "amount": np.array(amounts, np.float64),
+            "currency": self.currencies.encode(currencies),
+            "category": self.categories.encode(categories),
+            "status": self.statuses.encode(statuses),
+            "day": day.view("datetime64[D]"),
+        }
+        return columns, max(value for value in updated if value is not None) if any(updated) else None
+
+    def load(self, conn: sqlite3.Connection) -> int:
+        """
+        Replace the snapshot with every expense, main's and the attached archives',
+        read LOAD_CHUNK_ROWS at a time.
+        """
+        parts: List[Dict[str, np.ndarray]] = []
+        watermark = None
+        hot = 0
+        for schema in ["main"] + attached_archives(conn):
+            cursor = conn.cursor()
+            cursor.row_factory = None    # plain tuples; sqlite3.Row costs more than the decode
+            cursor.execute(_SELECT.format(schema=schema) + " ORDER BY id")
+            while True:
+                rows = cursor.fetchmany(LOAD_CHUNK_ROWS)
+                if not rows:
+                    break
+                columns, newest = self._decode(rows)
+                parts.append(columns)
+                if schema == "main":
+                    hot += len(rows)
+                if newest is not None and (watermark is None or newest > watermark):
+                    watermark = newest
+        for name in COLUMNS:
+            setattr(self, name, np.concatenate([part[name] for part in parts]) if parts
+                    else getattr(ColumnarSnapshot(), name))
+        if len(parts) > 1:
+            # Sort by id; np.unique keeps the first (main's) copy of an expense that is
+            # also in an archive mid-move.
+            _, order = np.unique(self.id, return_index=True)
+            for name in COLUMNS:
+                setattr(self, name, getattr(self, name)[order])
+        self.archived = len(self) - hot
+        self.watermark = watermark
+        self.version += 1
+        return len(self)
+
+    def _apply(self, columns: Dict[str, np.ndarray]) -> bool:
+        """
+        Upsert re-read rows by id. Returns False if they were all already current
+        (rows inside the refresh overlap are re-read every time).
+        """
+        ids = columns["id"]
+        positions = np.searchsorted(self.id, ids)
+        found = positions < len(self.id)
+        found[found] = self.id[positions[found]] == ids[found]
+        changed = False
+        for name in COLUMNS[1:]:
+            column, update = getattr(self, name), columns[name][found]
+            if not np.array_equal(column[positions[found]], update, equal_nan=name in ("amount", "day")):
+                column[positions[found]] = update
+                changed = True
+        new = ~found
+        if new.any():
+            old_size = len(self.id)
+            for name in COLUMNS:
+                setattr(self, name, np.concatenate([getattr(self, name), columns[name][new]]))
+            # New ids are normally above every existing one; re-sort only if not.
+            if np.any(np.diff(self.id[max(old_size - 1, 0):]) <= 0):
+                order = np.argsort(self.id, kind="stable")
+                for name in COLUMNS:
+                    setattr(self, name, getattr(self, name)[order])
+        return changed or bool(new.any())
+
+    def refresh(self, conn: sqlite3.Connection) -> int:
+        """
+        Bring the snapshot up to date: re-read rows changed since the watermark, and
+        reload everything if rows were deleted. Returns the number of rows read.
+        """
+        if self.watermark is None:
+            read = self.load(conn)
+        else:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            rows = cursor.execute(_SELECT.format(schema="main") + " WHERE updated_at >= datetime(?, ?)",
+                                  (self.watermark, f"-{REFRESH_OVERLAP_SECONDS} seconds")).fetchall()
+            read = len(rows)
+            if rows:
+                columns, newest = self._decode(rows)
+                if self._apply(columns):
+                    self.version += 1
+                if newest is not None and newest > self.watermark:
+                    self.watermark = newest
+            # expense_totals keeps main's row count; a mismatch means deletes (hard deletes
+            # and archival leave no updated_at behind).
+            total = conn.execute(
+                "SELECT count FROM expense_totals WHERE dimension = 'all' AND key = ''"
+            ).fetchone()
+            if (total[0] if total else 0) != len(self) - self.archived:
+                read = self.load(conn)
+        self._load_departments(conn)
+        return read
+
+    def _load_departments(self, conn: sqlite3.Connection) -> None:
+        rows = conn.execute("SELECT id, department FROM users").fetchall()
+        user_ids = np.array([row[0] for row in rows], np.int64)
+        codes = self.departments.encode([row[1] for row in rows])
+        size = int(max(user_ids.max(initial=0), self.employee_id.max(initial=0))) + 1
+        self.employee_department = np.full(size, self.departments.encode([None])[0], np.int32)
+        self.employee_department[user_ids] = codes
+
+    # ---------- derived columns ----------
+
+    def department(self) -> np.ndarray:
+        return self.employee_department[self.employee_id]
+
+    def amounts(self, currency: str) -> np.ndarray:
+        """
+        Every amount in `currency`, converted at its expense_date's rate (NaN where no
+        rate is known). Skips the rate table entirely if every row is already in it.
+        """
+        cached = self._converted.get(currency)
+        if cached and cached[0] == self.version:
+            return cached[1]
+        used = np.flatnonzero(np.bincount(self.currency, minlength=len(self.currencies.labels)))
+        if all(self.currencies.labels[code] == currency for code in used):
+            values = self.amount
+        else:
+            table = rate_service.table()
+            columns = np.array([table.currencies.get(label, -1) for label in self.currencies.labels])[self.currency]
+            rows = table.rows_for(self.day, len(self))
+            source = np.where(columns >= 0, table.rates[rows, np.clip(columns, 0, None)], np.nan)
+            values = self.amount / source
+            if currency != table.base:
+                target = table.currencies.get(currency)
+                values = values * table.rates[rows, target] if target is not None else np.full(len(self), np.nan)
+        self._converted = {code: entry for code, entry in self._converted.items() if entry[0] == self.version}
+        self._converted[currency] = (self.version, values)
+        return values
+
+
+# ==================== REPORTS ====================
+
+def _select(snapshot: ColumnarSnapshot, date_from: Optional[date] = None, date_to: Optional[date] = None,
+            status: Optional[str] = None, department: Optional[str] = None,
+            category: Optional[str] = None) -> np.ndarray:
+    """
+    Boolean mask of the rows matching the report filters.
+    """
+    mask = np.isin(snapshot.status, snapshot.statuses.lookup([status] if status else DEFAULT_STATUSES))
+    if date_from:
+        mask &= snapshot.day >= np.datetime64(date_from, "D")
+    if date_to:
+        mask &= snapshot.day <= np.datetime64(date_to, "D")
+    if department is not None:
+        mask &= np.isin(snapshot.department(), snapshot.departments.lookup([department]))
+    if category:
+        mask &= np.isin(snapshot.category, snapshot.categories.lookup([category]))
+    return mask
+
+
+def _values(snapshot: ColumnarSnapshot, currency: str, filters: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    (row positions, amounts in currency) of the selected rows that could be
+    converted, and the number that could not.
+    """
+    rows = np.flatnonzero(_select(snapshot, **filters))
+    values = snapshot.amounts(currency)[rows]
+    converted = ~np.isnan(values)
+    return rows[converted], values[converted], int(len(rows) - converted.sum())
+
+
+def _money(value: float) -> Optional[float]:
+    return None if value != value else round(float(value), 2)
+
+
+def department_report(snapshot: ColumnarSnapshot, currency: str, **filters) -> Dict[str, Any]:
+    """
+    Count, total, mean, p50 / p90 / p99 and max spend per department, largest total first.
+    """
+    rows, values, unconverted = _values(snapshot, currency, filters)
+    groups = snapshot.department()[rows]
+    n = len(snapshot.departments.labels)
+    counts = np.bincount(groups, minlength=n)
+    totals = np.bincount(groups, weights=values, minlength=n)
+    stats = group_quantiles(groups, values, n, QUANTILES + (1.0,))
+    departments = [{
+        "department": snapshot.departments.labels[code],
+        "count": int(counts[code]),
+        "total": _money(totals[code]),
+        "mean": _money(totals[code] / counts[code]),
+        **{f"p{round(q * 100)}": _money(stats[code, i]) for i, q in enumerate(QUANTILES)},
+        "max": _money(stats[code, -1]),
+    } for code in np.flatnonzero(counts)]
+    departments.sort(key=lambda d: d["total"], reverse=True)
+    return {"currency": currency, "departments": departments, "unconverted": unconverted}
+
+
+def trend_report(snapshot: ColumnarSnapshot, currency: str, **filters) -> Dict[str, Any]:
+    """
+    Monthly count and total with the month-over-month change, every month from the
+    first to the last with spend (empty months included).
+    """
+    rows, values, unconverted = _values(snapshot, currency, filters)
+    months = snapshot.day[rows].astype("datetime64[M]")
+    dated = ~np.isnat(months)
+    months, values = months[dated].astype(np.int64), values[dated]
+    series = []
+    if len(months):
+        first = months.min()
+        counts = np.bincount(months - first)
+        totals = np.bincount(months - first, weights=values)
+        previous = np.concatenate(([np.nan], totals[:-1]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.where(previous > 0, (totals - previous) / previous * 100, np.nan)
+        series = [{
+            "month": str(np.datetime64(int(first + i), "M")),
+            "count": int(counts[i]),
+            "total": _money(totals[i]),
+            "change_pct": None if np.isnan(change[i]) else round(float(change[i]), 1),
+        } for i in range(len(counts))]
+    return {"currency": currency, "months": series, "unconverted": unconverted}
+
+
+def outlier_report(snapshot: ColumnarSnapshot, currency: str, by: str = "category", threshold: float = 3.5,
+                   limit: int = 50, **filters) -> Dict[str, Any]:
+    """
+    Expenses far above what is usual for their category, department or employee:
+    robust z-score (amount - group median) / (MAD * 1.4826) above threshold, highest
+    first. Groups whose amounts are mostly identical (MAD of 0) flag nothing.
+    """
+    rows, values, unconverted = _values(snapshot, currency, filters)
+    if by == "category":
+        groups, labels = snapshot.category[rows], snapshot.categories.labels
+    elif by == "department":
+        groups, labels = snapshot.department()[rows], snapshot.departments.labels
+    elif by == "employee":
+        labels, groups = np.unique(snapshot.employee_id[rows], return_inverse=True)
+        labels = labels.tolist()
+    else:
+        raise ValueError(f"Unknown outlier grouping {by!r}")
+    n = len(labels)
+    medians = group_quantiles(groups, values, n, (0.5,))[:, 0]
+    deviation = values - medians[groups]
+    scale = group_quantiles(groups, np.abs(deviation), n, (0.5,))[:, 0][groups] * MAD_TO_SIGMA
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(scale > 0, deviation / scale, 0.0)
+    flagged = np.flatnonzero(scores > threshold)
+    top = flagged[np.argsort(-scores[flagged], kind="stable")[:limit]]
+    departments = snapshot.department()
+    outliers = [{
+        "id": int(snapshot.id[rows[i]]),
+        "employee_id": int(snapshot.employee_id[rows[i]]),
+        "department": snapshot.departments.labels[departments[rows[i]]],
+        "category": snapshot.categories.labels[snapshot.category[rows[i]]],
+        "expense_date": None if np.isnat(snapshot.day[rows[i]]) else str(snapshot.day[rows[i]]),
+        "amount": _money(values[i]),
+        "group": labels[groups[i]],
+        "group_median": _money(medians[groups[i]]),
+        "score": round(float(scores[i]), 2),
+    } for i in top]
+    return {"currency": currency, "by": by, "threshold": threshold, "flagged": len(flagged),
+            "outliers": outliers, "unconverted": unconverted}
+
+
+# ==================== SERVICE ====================
+
+class AnalyticsService:
+    """
+    Owns the process-wide snapshot. Each report first refreshes it (at most once per
+    ANALYTICS_REFRESH_SECONDS); refreshes and reports are serialized so a report
+    never sees a half-applied refresh.
+    """
+
+    def __init__(self, refresh_seconds: float = config.ANALYTICS_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self.snapshot = ColumnarSnapshot()
+        self._lock = threading.Lock()
+        self._next_refresh = 0.0
+
+    def _run(self, report: Callable[..., Dict[str, Any]], currency: Optional[str], **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            if time.monotonic() >= self._next_refresh:
+                with get_db_connection() as conn:
+                    self.snapshot.refresh(conn)
+                self._next_refresh = time.monotonic() + self.refresh_seconds
+            return report(self.snapshot, (currency or rate_service.base).upper(), **kwargs)
+
+    def departments(self, currency: Optional[str] = None, **filters) -> Dict[str, Any]:
+        return self._run(department_report, currency, **filters)
+
+    def trends(self, currency: Optional[str] = None, **filters) -> Dict[str, Any]:
+        return self._run(trend_report, currency, **filters)
+
+    def outliers(self, currency: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        return self._run(outlier_report, currency, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        return {
+            "rows": len(snapshot),
+            "watermark": snapshot.watermark,
+            "version": snapshot.version,
+            "bytes": sum(getattr(snapshot, name).nbytes for name in COLUMNS),
+        }
+
+
+analytics = AnalyticsService()
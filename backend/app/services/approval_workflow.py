@@ -0,0 +1,487 @@
+"""
+Sequential multi-level approval workflow (Manager → Finance → Director).
+
+Each expense gets one approval_progress row per level holding its approvers and
+approved / rejected / required counters. A decision updates the approver's
+approvals row, the level counters and the expense in a single write transaction,
+so resolving a level is O(1) instead of re-counting approvals rows. The expense's
+version column guards against decisions made on stale state. Submissions and
+decisions go through the group-commit writer (app/writer.py); a submission is checked
+for duplicates (app/services/duplicates.py) in the same write.
+"""
+
+import json
+import math
+import sqlite3
+from typing import Any, Dict, Iterable, List, Optional
+
+from ..models import insert_expense, insert_expenses
+from ..writer import writer
+from .duplicates import Fingerprint, fingerprint, fingerprints, record, record_many
+from .rule_engine import resolve_workflow
+
+MAX_BATCH_DECISIONS = 5000   # expenses decided per batch request
+
+
+class WorkflowError(Exception):
+    """
+    Base class for decisions that cannot be applied.
+    """
+
+
+class ExpenseNotFound(WorkflowError):
+    pass
+
+
+class AlreadyDecided(WorkflowError):
+    pass
+
+
+class NotAnApprover(WorkflowError):
+    pass
+
+
+class VersionConflict(WorkflowError):
+    pass
+
+
+# ==================== STARTING A WORKFLOW ====================
+
+def _level_approvers(conn: sqlite3.Connection, expense: sqlite3.Row, step) -> List[int]:
+    """
+    Who can decide a level: the rule's named approver, else the employee's manager for
+    Manager steps, else every active user with the rule's role. Never the submitter.
+    """
+    if step.approver_id:
+        candidates = [step.approver_id]
+    elif step.approver_role == "Manager" and expense["manager_id"]:
+        candidates = [expense["manager_id"]]
+    elif step.approver_role:
+        rows = conn.execute("SELECT id FROM users WHERE role = ? AND is_active = 1",
+                            (step.approver_role,)).fetchall()
+        candidates = [row[0] for row in rows]
+    else:
+        candidates = []
+    return [c for c in candidates if c != expense["employee_id"]]
+
+
+def _plan(conn: sqlite3.Connection, expense: sqlite3.Row) -> List[Dict[str, Any]]:
+    """
+    Turn the rule engine's chain into concrete levels.
+    Without any rules the expense goes to the employee's manager.
+    """
+    steps = resolve_workflow(dict(expense))
+    levels = []
+    for step in steps:
+        approvers = _level_approvers(conn, expense, step)
+        if not approvers:
+            continue
+        pct = step.required_percentage
+        required = max(1, math.ceil(len(approvers) * pct / 100)) if pct else 1
+        levels.append({"level": step.level, "approvers": approvers, "required": required,
+                       "override": step.override_approver_id})
+    if not steps and expense["manager_id"] and expense["manager_id"] != expense["employee_id"]:
+        levels.append({"level": 1, "approvers": [expense["manager_id"]], "required": 1, "override": None})
+    return levels
+
+
+def _activate_level(conn: sqlite3.Connection, expense_id: int, level: int, approver_ids: List[int]) -> None:
+    conn.execute("""
+        UPDATE approval_progress SET status = 'Active' WHERE expense_id = ? AND approval_level = ?
+    """, (expense_id, level))
+    conn.executemany("""
+        INSERT INTO approvals (expense_id, approver_id, approval_level, status)
+        VALUES (?, ?, ?, 'Pending')
+    """, [(expense_id, approver_id, level) for approver_id in approver_ids])
+
+
+def _start_workflows(conn: sqlite3.Connection, expense_ids: Iterable[int]) -> None:
+    for expense_id in expense_ids:
+        expense = conn.execute("""
+            SELECT e.id, e.amount, e.employee_id, u.department, u.manager_id
+            FROM expenses e JOIN users u ON e.employee_id = u.id
+            WHERE e.id = ? AND e.status = 'Pending'
+        """, (expense_id,)).fetchone()
+        if expense is None:
+            continue
+        levels = _plan(conn, expense)
+        if not levels:
+            continue
+        conn.executemany("""
+            INSERT INTO approval_progress (expense_id, approval_level, approver_ids, required,
+                                           override_approver_id)
+            VALUES (?, ?, ?, ?, ?)
+        """, [(expense_id, lv["level"], json.dumps(lv["approvers"]), lv["required"], lv["override"])
+              for lv in levels])
+        first = levels[0]
+        _activate_level(conn, expense_id, first["level"], first["approvers"])
+        conn.execute("UPDATE expenses SET current_level = ? WHERE id = ?", (first["level"], expense_id))
+
+
+def has_decisions(conn: sqlite3.Connection, expense_id: int) -> bool:
+    """
+    Whether any approver has approved or rejected the expense yet.
+    """
+    return conn.execute("SELECT 1 FROM approvals WHERE expense_id = ? AND status != 'Pending' LIMIT 1",
+                        (expense_id,)).fetchone() is not None
+
+
+def replan(conn: sqlite3.Connection, expense_id: int) -> None:
+    """
+    Plan an undecided expense's levels again, e.g. after its amount changed: its
+    pending approvals and levels are dropped and the workflow starts over. Callers
+    check has_decisions first; decided levels are never re-planned.
+    """
+    conn.execute("DELETE FROM approvals WHERE expense_id = ?", (expense_id,))
+    conn.execute("DELETE FROM approval_progress WHERE expense_id = ?", (expense_id,))
+    conn.execute("UPDATE expenses SET current_level = NULL WHERE id = ?", (expense_id,))
+    _start_workflows(conn, [expense_id])
+
+
+def start_workflows(expense_ids: Iterable[int]) -> None:
+    """
+    Create the approval levels for newly submitted expenses and open the first one.
+    Expenses without approvers keep the plain flow; ones no longer Pending are skipped.
+    """
+    writer.run(_start_workflows, list(expense_ids), tables=("approvals", "expenses"))
+
+
+def start_workflow(expense_id: int) -> None:
+    start_workflows([expense_id])
+
+
+def _submit_expense(conn: sqlite3.Connection, fields: Dict[str, Any], fp: Fingerprint) -> Dict[str, Any]:
+    expense_id = insert_expense(conn, **fields)
+    _start_workflows(conn, [expense_id])
+    return {"id": expense_id, "duplicates": record(conn, expense_id, fp)}
+
+
+def submit_expense(**fields) -> Dict[str, Any]:
+    """
+    Insert a Pending expense (create_expense arguments), start its workflow and check
+    it for duplicates in the same write. Returns {"id", "duplicates"}.
+    """
+    return writer.run(_submit_expense, fields, fingerprint(fields), tables=("approvals", "expenses"))
+
+
+def _submit_expenses(conn: sqlite3.Connection, expenses: List[Dict[str, Any]],
+                     fps: List[Fingerprint]) -> List[Dict[str, Any]]:
+    expense_ids = insert_expenses(conn, expenses)
+    _start_workflows(conn, expense_ids)
+    return [{"id": expense_id, "duplicates": duplicates}
+            for expense_id, duplicates in zip(expense_ids, record_many(conn, expense_ids, fps))]
+
+
+def submit_expenses(expenses: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    submit_expense() for many expenses in one write: they are inserted, their
+    workflows started and duplicates checked together, so none is ever visible
+    without its workflow. Returns one {"id", "duplicates"} per expense, in order.
+    """
+    if not expenses:
+        return []
+    return writer.run(_submit_expenses, expenses, fingerprints(expenses), tables=("approvals", "expenses"))
+
+
+# ==================== DECISIONS ====================
+
+def decide(expense_id: int, approver_id: Optional[int], approve: bool,
+           comments: Optional[str] = None, expected_version: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Record one approver's decision and advance the expense in a single transaction.
+    expected_version (from a previous read) makes the decision fail with VersionConflict
+    if anything changed in between.
+    Returns the expense's new status, current_level and version.
+    """
+    return writer.run(_decide, expense_id, approver_id, approve, comments, expected_version,
+                      tables=("approvals", "expenses"))
+
+
+def _decide(conn: sqlite3.Connection, expense_id: int, approver_id: Optional[int], approve: bool,
+            comments: Optional[str], expected_version: Optional[int]) -> Dict[str, Any]:
+    decision = "Approved" if approve else "Rejected"
+    expense = conn.execute(
+        "SELECT id, status, current_level, version FROM expenses WHERE id = ?", (expense_id,)
+    ).fetchone()
+    if expense is None:
+        raise ExpenseNotFound(f"Expense {expense_id} not found")
+    if expected_version is not None and expense["version"] != expected_version:
+        raise VersionConflict(
+            f"Expense {expense_id} is at version {expense['version']}, not {expected_version}")
+    if expense["status"] in ("Approved", "Rejected"):
+        raise AlreadyDecided(f"Expense {expense_id} is already {expense['status'].lower()}")
+
+    level = expense["current_level"]
+    if level is None:
+        # No workflow (no approvers configured): the decision is final.
+        new_status, new_level = decision, None
+    else:
+        new_status, new_level = _apply_decision(conn, expense_id, level, approver_id, approve, comments)
+        new_status = new_status or expense["status"]
+
+    updated = conn.execute("""
+        UPDATE expenses
+        SET status = ?, current_level = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND version = ?
+    """, (new_status, new_level, expense_id, expense["version"]))
+    if updated.rowcount == 0:
+        raise VersionConflict(f"Expense {expense_id} was modified concurrently")
+    return {"id": expense_id, "status": new_status, "current_level": new_level,
+            "version": expense["version"] + 1}
+
+
+def _apply_decision(conn: sqlite3.Connection, expense_id: int, level: int, approver_id: Optional[int],
+                    approve: bool, comments: Optional[str]):
+    """
+    Record the decision on the current level and update its counters.
+    Returns (new status or None if unchanged, current_level).
+    """
+    progress = conn.execute("""
+        SELECT approver_ids, required, override_approver_id FROM approval_progress
+        WHERE expense_id = ? AND approval_level = ?
+    """, (expense_id, level)).fetchone()
+    is_override = approver_id is not None and approver_id == progress["override_approver_id"]
+    decision = "Approved" if approve else "Rejected"
+
+    marked = conn.execute("""
+        UPDATE approvals SET status = ?, comments = ?, approved_at = CURRENT_TIMESTAMP
+        WHERE expense_id = ? AND approval_level = ? AND approver_id = ? AND status = 'Pending'
+    """, (decision, comments, expense_id, level, approver_id)).rowcount
+    if not marked:
+        if not is_override:
+            raise NotAnApprover(f"User {approver_id} has no pending approval on expense {expense_id}")
+        conn.execute("""
+            INSERT INTO approvals (expense_id, approver_id, approval_level, status, comments, approved_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (expense_id, approver_id, level, decision, comments))
+
+    counters = conn.execute(f"""
+        UPDATE approval_progress
+        SET {'approved = approved + 1' if approve else 'rejected = rejected + 1'}
+        WHERE expense_id = ? AND approval_level = ?
+        RETURNING approved, rejected, required
+    """, (expense_id, level)).fetchall()[0]
+    total = len(json.loads(progress["approver_ids"]))
+
+    if approve and (is_override or counters["approved"] >= counters["required"]):
+        return _close_level(conn, expense_id, level, "Approved")
+    if not approve and (is_override or total - counters["rejected"] < counters["required"]):
+        # Quorum can no longer be reached on this level.
+        return _close_level(conn, expense_id, level, "Rejected")
+    return None, level
+
+
+def _close_level(conn: sqlite3.Connection, expense_id: int, level: int, outcome: str):
+    """
+    Finish a level, drop its outstanding requests and open the next one.
+    Returns the expense's new (status, current_level).
+    """
+    conn.execute("""
+        UPDATE approval_progress SET status = ? WHERE expense_id = ? AND approval_level = ?
+    """, (outcome, expense_id, level))
+    conn.execute("""
+        DELETE FROM approvals WHERE expense_id = ? AND approval_level = ? AND status = 'Pending'
+    """, (expense_id, level))
+    if outcome == "Rejected":
+        return "Rejected", level
+    upcoming = conn.execute("""
+        SELECT approval_level, approver_ids FROM approval_progress
+        WHERE expense_id = ? AND approval_level > ?
+        ORDER BY approval_level LIMIT 1
+    """, (expense_id, level)).fetchone()
+    if upcoming is None:
+        return "Approved", level
+    _activate_level(conn, expense_id, upcoming["approval_level"], json.loads(upcoming["approver_ids"]))
+    return "In Review", upcoming["approval_level"]
+
+
+# ==================== BATCH DECISIONS ====================
+# Sets of expense ids are bound as one JSON array and expanded with json_each, so a
+# batch is a handful of set-based statements whatever its size.
+
+_IN_IDS = "IN (SELECT value FROM json_each(?))"
+_AT_CURRENT_LEVEL = "approval_level = (SELECT current_level FROM expenses WHERE id = {table}.expense_id)"
+
+
+def _awaiting(conn: sqlite3.Connection, approver_id: int, max_amount: Optional[float],
+              reports_only: bool, limit: int) -> List[int]:
+    """
+    Ids of open expenses the approver can decide: a pending request on the current
+    level, or (for expenses without a workflow) the approver manages the submitter.
+    """
+    clauses = ["e.status IN ('Pending', 'In Review')", """(
+        EXISTS (SELECT 1 FROM approvals a WHERE a.approver_id = ? AND a.status = 'Pending'
+                AND a.expense_id = e.id AND a.approval_level = e.current_level)
+        OR (e.current_level IS NULL AND u.manager_id = ?))"""]
+    params: List[Any] = [approver_id, approver_id]
+    if max_amount is not None:
+        clauses.append("e.amount <= ?")
+        params.append(max_amount)
+    if reports_only:
+        clauses.append("u.manager_id = ?")
+        params.append(approver_id)
+    # The open-expense index walks them oldest first and stops at the limit; left to
+    # itself the planner reads every open expense through the status index and sorts.
+    rows = conn.execute(f"""
+        SELECT e.id FROM expenses e INDEXED BY idx_expenses_open_submitted JOIN users u ON e.employee_id = u.id
+        WHERE {' AND '.join(clauses)}
+        ORDER BY e.submitted_at, e.id LIMIT ?
+    """, (*params, limit)).fetchall()
+    return [row[0] for row in rows]
+
+
+def decide_many(approver_id: Optional[int], approve: bool, expense_ids: Optional[Iterable[int]] = None,
+                comments: Optional[str] = None, max_amount: Optional[float] = None,
+                reports_only: bool = False, limit: int = MAX_BATCH_DECISIONS) -> List[Dict[str, Any]]:
+    """
+    Apply one approver's decision to many expenses in a single write transaction.
+    Without expense_ids, decides up to `limit` of the expenses awaiting the approver,
+    optionally only those up to max_amount and/or submitted by their direct reports.
+    Returns one result per expense, in order, with an outcome of "applied" (plus the
+    new status, current_level and version), "not_found", "already_decided" or "not_an_approver".
+    """
+    if expense_ids is not None:
+        expense_ids = list(expense_ids)
+    return writer.run(_decide_many, approver_id, approve, expense_ids, comments, max_amount,
+                      reports_only, limit, tables=("approvals", "expenses"))
+
+
+def _decide_many(conn: sqlite3.Connection, approver_id: Optional[int], approve: bool,
+                 expense_ids: Optional[List[int]], comments: Optional[str], max_amount: Optional[float],
+                 reports_only: bool, limit: int) -> List[Dict[str, Any]]:
+    decision = "Approved" if approve else "Rejected"
+    if expense_ids is None:
+        ids = _awaiting(conn, approver_id, max_amount, reports_only, limit)
+    else:
+        ids = list(dict.fromkeys(int(i) for i in expense_ids))
+    rows = conn.execute(
+        f"SELECT id, status, current_level, version FROM expenses WHERE id {_IN_IDS}", (json.dumps(ids),)
+    ).fetchall()
+    state = {row["id"]: row for row in rows}
+
+    results: Dict[int, Dict[str, Any]] = {}
+    changes: Dict[int, tuple] = {}
+    staged = []
+    for expense_id in ids:
+        expense = state.get(expense_id)
+        if expense is None:
+            results[expense_id] = {"id": expense_id, "outcome": "not_found"}
+        elif expense["status"] in ("Approved", "Rejected"):
+            results[expense_id] = {"id": expense_id, "outcome": "already_decided", "status": expense["status"]}
+        elif expense["current_level"] is None:
+            # No workflow (no approvers configured): the decision is final.
+            changes[expense_id] = (decision, None)
+        else:
+            staged.append(expense_id)
+
+    if staged:
+        advanced = _apply_decisions(conn, staged, approver_id, approve, comments)
+        for expense_id in staged:
+            if expense_id not in advanced:
+                results[expense_id] = {"id": expense_id, "outcome": "not_an_approver"}
+                continue
+            new_status, new_level = advanced[expense_id]
+            changes[expense_id] = (new_status or state[expense_id]["status"], new_level)
+
+    conn.executemany("""
+        UPDATE expenses
+        SET status = ?, current_level = ?, version = version + 1, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, [(status, level, expense_id) for expense_id, (status, level) in changes.items()])
+
+    for expense_id, (status, level) in changes.items():
+        results[expense_id] = {"id": expense_id, "outcome": "applied", "status": status,
+                               "current_level": level, "version": state[expense_id]["version"] + 1}
+    return [results[expense_id] for expense_id in ids]
+
+
+def _apply_decisions(conn: sqlite3.Connection, expense_ids: List[int], approver_id: Optional[int],
+                     approve: bool, comments: Optional[str]) -> Dict[int, tuple]:
+    """
+    Set-based _apply_decision for expenses that are all on a workflow level.
+    Returns {expense_id: (new status or None if unchanged, current_level)} for every
+    expense the approver could decide; the others are left untouched.
+    """
+    decision = "Approved" if approve else "Rejected"
+    marked = conn.execute(f"""
+        UPDATE approvals SET status = ?, comments = ?, approved_at = CURRENT_TIMESTAMP
+        WHERE approver_id = ? AND status = 'Pending' AND expense_id {_IN_IDS}
+          AND {_AT_CURRENT_LEVEL.format(table="approvals")}
+        RETURNING expense_id
+    """, (decision, comments, approver_id, json.dumps(expense_ids))).fetchall()
+    decided = {row[0] for row in marked}
+
+    rest = [expense_id for expense_id in expense_ids if expense_id not in decided]
+    if rest and approver_id is not None:
+        # Override approvers decide a level without holding a request on it.
+        overridden = conn.execute(f"""
+            INSERT INTO approvals (expense_id, approver_id, approval_level, status, comments, approved_at)
+            SELECT p.expense_id, ?, p.approval_level, ?, ?, CURRENT_TIMESTAMP
+            FROM approval_progress p
+            WHERE p.expense_id {_IN_IDS} AND p.override_approver_id = ?
+              AND {_AT_CURRENT_LEVEL.format(table="p")}
+            RETURNING expense_id
+        """, (approver_id, decision, comments, json.dumps(rest), approver_id)).fetchall()
+        decided.update(row[0] for row in overridden)
+    if not decided:
+        return {}
+
+    counter = "approved" if approve else "rejected"
+    levels = conn.execute(f"""
+        UPDATE approval_progress SET {counter} = {counter} + 1
+        WHERE expense_id {_IN_IDS} AND {_AT_CURRENT_LEVEL.format(table="approval_progress")}
+        RETURNING expense_id, approval_level, approver_ids, required, approved, rejected, override_approver_id
+    """, (json.dumps(sorted(decided)),)).fetchall()
+
+    advanced: Dict[int, tuple] = {}
+    closing: Dict[int, int] = {}
+    for row in levels:
+        is_override = approver_id is not None and approver_id == row["override_approver_id"]
+        total = len(json.loads(row["approver_ids"]))
+        if approve and (is_override or row["approved"] >= row["required"]):
+            closing[row["expense_id"]] = row["approval_level"]
+        elif not approve and (is_override or total - row["rejected"] < row["required"]):
+            # Quorum can no longer be reached on this level.
+            closing[row["expense_id"]] = row["approval_level"]
+        else:
+            advanced[row["expense_id"]] = (None, row["approval_level"])
+    if closing:
+        advanced.update(_close_levels(conn, closing, "Approved" if approve else "Rejected"))
+    return advanced
+
+
+def _close_levels(conn: sqlite3.Connection, levels: Dict[int, int], outcome: str) -> Dict[int, tuple]:
+    """
+    Set-based _close_level for {expense_id: level}, all with the same outcome.
+    Returns {expense_id: (new status, current_level)}.
+    """
+    ids = json.dumps(sorted(levels))
+    conn.execute(f"""
+        UPDATE approval_progress SET status = ?
+        WHERE expense_id {_IN_IDS} AND {_AT_CURRENT_LEVEL.format(table="approval_progress")}
+    """, (outcome, ids))
+    conn.execute(f"""
+        DELETE FROM approvals
+        WHERE status = 'Pending' AND expense_id {_IN_IDS} AND {_AT_CURRENT_LEVEL.format(table="approvals")}
+    """, (ids,))
+    if outcome == "Rejected":
+        return {expense_id: ("Rejected", level) for expense_id, level in levels.items()}
+
+    # Later levels are still Waiting; the lowest one per expense opens next.
+    upcoming = conn.execute(f"""
+        SELECT expense_id, MIN(approval_level) AS approval_level, approver_ids FROM approval_progress
+        WHERE expense_id {_IN_IDS} AND status = 'Waiting'
+        GROUP BY expense_id
+    """, (ids,)).fetchall()
+    conn.executemany("""
+        UPDATE approval_progress SET status = 'Active' WHERE expense_id = ? AND approval_level = ?
+    """, [(row["expense_id"], row["approval_level"]) for row in upcoming])
+    conn.executemany("""
+        INSERT INTO approvals (expense_id, approver_id, approval_level, status)
+        VALUES (?, ?, ?, 'Pending')
+    """, [(row["expense_id"], approver, row["approval_level"])
+          for row in upcoming for approver in json.loads(row["approver_ids"])])
+
+    results = {expense_id: ("Approved", level) for expense_id, level in levels.items()}
+    results.update({row["expense_id"]: ("In Review", row["approval_level"]) for row in upcoming})
+    return results
@@ -0,0 +1,306 @@
+"""
+Hot/cold archival of decided expenses.
+
+Expenses decided (Approved or Rejected) more than ARCHIVE_AFTER_DAYS ago move, with
+their approvals and approval_progress rows, out of the main database into one SQLite
+file per submission year, ARCHIVE_DIR/expenses-<year>.db. The main database then holds
+the open and recent work only, so its tables and indexes stay small enough to live in
+the page cache. Every connection ATTACHes the newest ARCHIVE_MAX_ATTACHED archives as
+archive_<year> (app/database.py), and the reads that need history take an
+include_archived flag (app/models.py): expense listings and exports, lookups by id,
+an approver's decisions. Dashboard totals include archived expenses through
+archived_totals (migration 12); the spend reports load archived rows into their
+snapshot. Search and duplicate detection cover the main database only.
+
+In WAL mode SQLite commits atomically per file, not across attached files, so each
+batch moves in two transactions:
+  1. copy the batch's expenses, approvals and progress into the archive and commit
+     (this writes the archive file only);
+  2. through the group-commit writer, delete from the main database the expenses
+     still identical to the copied rows, with their approvals, progress and finished
+     OCR jobs, and add them to archived_totals.
+A crash between the two leaves a batch in both places; reads skip archived rows that
+main still has, and the next run finishes the move. An expense edited in between
+stays in main and is copied again by the next run. Every batch commits on its own, so
+the job can be stopped and rerun at any point.
+
+The server runs the job every ARCHIVE_INTERVAL_SECONDS (start() / stop(), from the
+app lifespan). Its phase-2 writes then bump table_versions in the server process,
+which is what keeps the response cache from replaying listings of moved expenses.
+The command line is for a stopped server (or ARCHIVE_INTERVAL_SECONDS=0): its
+table_versions are its own, so a server running meanwhile keeps serving cached
+listings until something else writes to expenses.
+
+Usage (from backend/):
+    python -m app.services.archive              # archive expenses decided ARCHIVE_AFTER_DAYS ago
+    python -m app.services.archive --days 730   # ... or decided more than 730 days ago
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from .. import config
+from ..database import ARCHIVE_FILE, attached_archives, get_db_connection, open_connection
+from ..writer import writer
+from .dashboard import recompute_sql
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_TABLES = ("expenses", "approvals", "approval_progress")
+DECIDED = ("Approved", "Rejected")
+
+# Sets of expense ids are bound once as a JSON array under :ids.
+_IN_IDS = "IN (SELECT value FROM json_each(:ids))"
+
+# Next batch of decided expenses past the cutoff. It walks idx_expenses_updated_at in
+# order (the unary + keeps the planner off the status index, which would sort every
+# decided expense for each batch).
+BATCH_SQL = f"""
+    SELECT id, updated_at, COALESCE(strftime('%Y', submitted_at), strftime('%Y', expense_date)) AS year
+    FROM main.expenses
+    WHERE updated_at < :cutoff AND (updated_at, id) > (:after, :after_id)
+      AND +status IN {DECIDED}
+    ORDER BY updated_at, id
+    LIMIT :limit
+"""
+
+
+def archive_path(year: int) -> str:
+    return os.path.join(config.ARCHIVE_DIR, f"expenses-{year}.db")
+
+
+def _schema_sql(conn: sqlite3.Connection) -> List[str]:
+    """
+    CREATE statements of the archived tables and their indexes in main, tables first.
+    """
+    rows = conn.execute(f"""
+        SELECT sql FROM main.sqlite_master
+        WHERE tbl_name IN {ARCHIVED_TABLES} AND type IN ('table', 'index') AND sql IS NOT NULL
+        ORDER BY type = 'index', name
+    """).fetchall()
+    return [row[0] for row in rows]
+
+
+def create_archive(conn: sqlite3.Connection, year: int) -> str:
+    """
+    Create the archive file for a year with main's current schema, if it does not
+    exist yet. The file is built aside and renamed into place, so connections
+    attaching archives never see it half-made. Returns its path.
+    """
+    path = archive_path(year)
+    if os.path.exists(path):
+        return path
+    os.makedirs(config.ARCHIVE_DIR, exist_ok=True)
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    archive = sqlite3.connect(tmp)
+    try:
+        for statement in _schema_sql(conn):
+            archive.execute(statement)
+        archive.execute("PRAGMA journal_mode = WAL")
+        archive.commit()
+    finally:
+        archive.close()
+    os.replace(tmp, path)
+    return path
+
+
+def _column_sql(column: sqlite3.Row) -> str:
+    """
+    ALTER TABLE ... ADD COLUMN definition for a PRAGMA table_info row.
+    """
+    _, name, type_, notnull, default, _ = column
+    definition = f"{name} {type_}".rstrip()
+    if default is not None:
+        definition += f" DEFAULT {default}" + (" NOT NULL" if notnull else "")
+    return definition
+
+
+def sync_schemas() -> int:
+    """
+    Bring every archive file up to main's schema: add the columns and indexes later
+    migrations gave the archived tables. Returns the number of columns added.
+    """
+    if not os.path.isdir(config.ARCHIVE_DIR):
+        return 0
+    with get_db_connection() as conn:
+        columns = {table: conn.execute(f"PRAGMA main.table_info({table})").fetchall() for table in ARCHIVED_TABLES}
+        indexes = [sql for sql in _schema_sql(conn) if sql.startswith(("CREATE INDEX", "CREATE UNIQUE INDEX"))]
+    added = 0
+    for name in sorted(os.listdir(config.ARCHIVE_DIR)):
+        if not ARCHIVE_FILE.fullmatch(name):
+            continue
+        archive = sqlite3.connect(os.path.join(config.ARCHIVE_DIR, name))
+        try:
+            for table, wanted in columns.items():
+                have = {row[1] for row in archive.execute(f"PRAGMA table_info({table})")}
+                for column in wanted:
+                    if column[1] not in have:
+                        archive.execute(f"ALTER TABLE {table} ADD COLUMN {_column_sql(column)}")
+                        added += 1
+            for sql in indexes:
+                archive.execute(sql.replace(" INDEX ", " INDEX IF NOT EXISTS ", 1))
+            archive.commit()
+        finally:
+            archive.close()
+    return added
+
+
+def _attach(conn: sqlite3.Connection, year: int) -> str:
+    """
+    Attach the archive for a year (creating it if needed), detaching the oldest
+    attached archive when ARCHIVE_MAX_ATTACHED are already attached. Returns its schema.
+    """
+    schema = f"archive_{year}"
+    attached = attached_archives(conn)
+    if schema in attached:
+        return schema
+    path = create_archive(conn, year)
+    if len(attached) >= config.ARCHIVE_MAX_ATTACHED:
+        conn.execute(f"DETACH DATABASE {attached[-1]}")
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+    return schema
+
+
+def _copy(conn: sqlite3.Connection, schema: str, ids: List[int], columns: Dict[str, str]) -> List[tuple]:
+    """
+    Phase 1: write the expenses and their approval rows into the archive.
+    Copies from an earlier, interrupted run are replaced.
+    Returns the expense rows copied, as read in the same transaction.
+    """
+    params = {"ids": json.dumps(ids)}
+    conn.execute("BEGIN")
+    try:
+        copied = [tuple(row) for row in conn.execute(
+            f"SELECT {columns['expenses']} FROM main.expenses WHERE id {_IN_IDS}", params)]
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {schema}.expenses ({columns['expenses']})
+            SELECT {columns['expenses']} FROM main.expenses WHERE id {_IN_IDS}
+        """, params)
+        for table in ARCHIVED_TABLES[1:]:
+            conn.execute(f"DELETE FROM {schema}.{table} WHERE expense_id {_IN_IDS}", params)
+            conn.execute(f"""
+                INSERT INTO {schema}.{table} ({columns[table]})
+                SELECT {columns[table]} FROM main.{table} WHERE expense_id {_IN_IDS}
+            """, params)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return copied
+
+
+def _remove(conn: sqlite3.Connection, copied: List[tuple], columns: Dict[str, str]) -> int:
+    """
+    Phase 2 (a writer job): delete from main the expenses whose row is still the one
+    copied, and move them from expense_totals (by the delete triggers) to
+    archived_totals. Returns the number of expenses moved.
+    """
+    copies = {row[0]: row for row in copied}
+    current = conn.execute(f"SELECT {columns['expenses']} FROM main.expenses WHERE id {_IN_IDS}",
+                           {"ids": json.dumps(list(copies))})
+    moved = [row[0] for row in current if tuple(row) == copies[row[0]]]
+    if moved:
+        params = {"ids": json.dumps(moved)}
+        conn.execute(f"""
+            INSERT INTO archived_totals (dimension, key, count, amount)
+            SELECT * FROM ({recompute_sql(f"(SELECT * FROM main.expenses WHERE id {_IN_IDS})")}) WHERE true
+            ON CONFLICT (dimension, key) DO UPDATE
+            SET count = count + excluded.count, amount = amount + excluded.amount
+        """, params)
+        for table in ARCHIVED_TABLES[1:]:
+            conn.execute(f"DELETE FROM main.{table} WHERE expense_id {_IN_IDS}", params)
+        conn.execute(f"DELETE FROM main.ocr_jobs WHERE expense_id {_IN_IDS} AND status != 'Queued'", params)
+        conn.execute(f"DELETE FROM main.expenses WHERE id {_IN_IDS}", params)
+    return len(moved)
+
+
+def archive_decided(days: int = config.ARCHIVE_AFTER_DAYS,
+                    batch_size: int = config.ARCHIVE_BATCH_SIZE,
+                    stop_event: Optional[threading.Event] = None) -> Dict[int, int]:
+    """
+    Move expenses decided more than `days` ago into the per-year archives,
+    batch_size expenses per pair of transactions, until done or stop_event is set.
+    Returns {year: expenses moved}.
+    """
+    sync_schemas()
+    conn = open_connection()
+    try:
+        cutoff = conn.execute("SELECT datetime('now', ?)", (f"-{int(days)} days",)).fetchone()[0]
+        columns = {table: ", ".join(row[1] for row in conn.execute(f"PRAGMA main.table_info({table})"))
+                   for table in ARCHIVED_TABLES}
+        moved: Counter = Counter()
+        after, after_id = "", 0
+        while stop_event is None or not stop_event.is_set():
+            batch = conn.execute(BATCH_SQL, {"cutoff": cutoff, "after": after, "after_id": after_id,
+                                             "limit": batch_size}).fetchall()
+            if not batch:
+                break
+            after, after_id = batch[-1]["updated_at"], batch[-1]["id"]
+            by_year = defaultdict(list)
+            for row in batch:
+                if row["year"] is not None:
+                    by_year[int(row["year"])].append(row["id"])
+            for year, ids in sorted(by_year.items()):
+                copied = _copy(conn, _attach(conn, year), ids, columns)
+                moved[year] += writer.run(_remove, copied, columns, tables=("approvals", "expenses"))
+        return dict(moved)
+    finally:
+        conn.close()
+
+
+# ==================== IN THE SERVER ====================
+
+_stop: Optional[threading.Event] = None
+_thread: Optional[threading.Thread] = None
+
+
+def _run(stop_event: threading.Event, interval: float) -> None:
+    while not stop_event.is_set():
+        try:
+            moved = archive_decided(stop_event=stop_event)
+            if moved:
+                logger.info("Archived %d decided expenses", sum(moved.values()))
+        except Exception:
+            logger.exception("Archiving decided expenses failed; retrying in %.0f s", interval)
+        stop_event.wait(interval)
+
+
+def start(interval: float = config.ARCHIVE_INTERVAL_SECONDS) -> None:
+    """
+    Archive in a background thread now and then every `interval` seconds (0: never).
+    """
+    global _stop, _thread
+    if interval <= 0 or _thread is not None:
+        return
+    _stop = threading.Event()
+    _thread = threading.Thread(target=_run, args=(_stop, interval), name="archiver", daemon=True)
+    _thread.start()
+
+
+def stop() -> None:
+    """
+    Stop the background thread, letting a batch in progress finish.
+    """
+    global _stop, _thread
+    if _thread is not None:
+        _stop.set()
+        _thread.join()
+        _stop = _thread = None
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    days = int(args[args.index("--days") + 1]) if "--days" in args else config.ARCHIVE_AFTER_DAYS
+    moved = archive_decided(days)
+    for year, count in sorted(moved.items()):
+        print(f"✓ Archived {count} expenses into {archive_path(year)}")
+    if not moved:
+        print(f"✓ No expenses decided more than {days} days ago")
@@ -0,0 +1,301 @@
+"""
+Exchange rates and currency conversion into the company currency.
+
+A provider (the exchangerate-api.com endpoint from the README, or a local JSON file
+for offline and test use) is polled at most once per EXCHANGE_RATE_TTL_SECONDS. Each
+poll is persisted as a daily snapshot in exchange_rates, so an expense is converted
+at the rate of its expense_date even after the provider has moved on. All snapshots
+are held in memory as one NumPy matrix (day x currency), so converting a whole
+result set is a couple of array lookups rather than a rate lookup per row.
+"""
+
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import requests
+
+from .. import config
+from ..database import get_db_connection
+from ..writer import writer
+
+logger = logging.getLogger(__name__)
+
+RETRY_AFTER_FAILURE_SECONDS = 60
+
+# A snapshot: (ISO day, {currency: units per 1 base})
+Snapshot = Tuple[str, Dict[str, float]]
+
+
+class RatesUnavailable(RuntimeError):
+    """
+    Raised when no snapshot is stored and the provider cannot be reached.
+    """
+
+
+class UnknownCurrency(ValueError):
+    """
+    Raised by convert() for a currency no snapshot has a rate for.
+    """
+
+
+# ==================== PROVIDERS ====================
+
+def _rebase(rates: Dict[str, float], source: str, base: str) -> Dict[str, float]:
+    if source == base:
+        return rates
+    if base not in rates:
+        raise RatesUnavailable(f"Provider has no {base} rate to rebase {source} quotes")
+    pivot = rates[base]
+    return {currency: rate / pivot for currency, rate in rates.items()}
+
+
+class FileRateProvider:
+    """
+    Reads rates from a JSON file: {"base": "USD", "date": "2024-01-02", "rates": {...}}.
+    An optional "history" object of {day: rates} in the same base adds older snapshots.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self, base: str) -> List[Snapshot]:
+        with open(self.path, encoding="utf-8") as f:
+            doc = json.load(f)
+        source = doc.get("base", base)
+        snapshots = dict(doc.get("history", {}))
+        snapshots[doc.get("date") or date.today().isoformat()] = doc["rates"]
+        return [(day, _rebase(rates, source, base)) for day, rates in sorted(snapshots.items())]
+
+
+class ExchangeRateApiProvider:
+    """
+    Latest rates from exchangerate-api.com (one request returns every currency).
+    """
+
+    def __init__(self, url: str = config.EXCHANGE_RATE_API_URL, timeout: float = config.EXCHANGE_RATE_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def fetch(self, base: str) -> List[Snapshot]:
+        response = self.session.get(self.url.format(base=base), timeout=self.timeout)
+        response.raise_for_status()
+        doc = response.json()
+        return [(doc.get("date") or date.today().isoformat(), _rebase(doc["rates"], doc.get("base", base), base))]
+
+
+def make_provider(name: str = config.EXCHANGE_RATE_PROVIDER):
+    if name == "file":
+        return FileRateProvider(config.EXCHANGE_RATE_FILE)
+    if name == "exchangerate-api":
+        return ExchangeRateApiProvider()
+    raise ValueError(f"Unknown exchange rate provider {name!r}")
+
+
+# ==================== RATE TABLE ====================
+
+@dataclass
+class RateTable:
+    """
+    Every stored snapshot for one base currency.
+    rates[i, j] is units of currencies[j] per 1 base on days[i] (NaN if not quoted).
+    """
+    base: str
+    days: np.ndarray                 # sorted datetime64[D]
+    currencies: Dict[str, int]       # currency code -> column
+    rates: np.ndarray                # float64, len(days) x len(currencies)
+
+    @classmethod
+    def from_rows(cls, base: str, rows: Iterable[Tuple[str, str, float]]) -> "RateTable":
+        rows = list(rows)
+        days = sorted({day for day, _, _ in rows})
+        currencies = {code: i for i, code in enumerate(sorted({code for _, code, _ in rows} | {base}))}
+        day_index = {day: i for i, day in enumerate(days)}
+        rates = np.full((len(days), len(currencies)), np.nan)
+        if rows:
+            rates[[day_index[d] for d, _, _ in rows], [currencies[c] for _, c, _ in rows]] = \
+                [rate for _, _, rate in rows]
+            rates[:, currencies[base]] = 1.0
+        return cls(base, np.array(days, dtype="datetime64[D]"), currencies, rates)
+
+    def rows_for(self, days: Optional[Sequence[Any]], count: int) -> np.ndarray:
+        """
+        Snapshot row per day (ISO strings, dates or a datetime64[D] array): the latest
+        snapshot on or before the day, the earliest one for older days, the latest one
+        for missing days.
+        """
+        if not len(self.days):
+            raise RatesUnavailable(f"No {self.base} exchange rates stored")
+        latest = len(self.days) - 1
+        if days is None:
+            return np.full(count, latest)
+        if isinstance(days, np.ndarray) and days.dtype == np.dtype("datetime64[D]"):
+            wanted = days
+        else:
+            wanted = np.array([str(d)[:10] if d else "NaT" for d in days], dtype="datetime64[D]")
+        rows = np.clip(np.searchsorted(self.days, wanted, side="right") - 1, 0, None)
+        return np.where(np.isnat(wanted), latest, rows)
+
+    def lookup(self, currencies: Sequence[str], days: Optional[Sequence[Any]] = None) -> np.ndarray:
+        """
+        Rates for parallel sequences of currency codes and days (see rows_for).
+        Unknown currencies give NaN.
+        """
+        codes, code_inverse = np.unique(np.asarray(currencies, dtype=str), return_inverse=True)
+        columns = np.array([self.currencies.get(code, -1) for code in codes])[code_inverse]
+        result = self.rates[self.rows_for(days, len(columns)), np.clip(columns, 0, None)]
+        result[columns < 0] = np.nan
+        return result
+
+
+# ==================== SERVICE ====================
+
+def _store_rates(conn, rows: List[Tuple[str, str, str, float]]) -> None:
+    conn.executemany("""
+        INSERT OR REPLACE INTO exchange_rates (base, rate_date, currency, rate) VALUES (?, ?, ?, ?)
+    """, rows)
+
+
+class RateService:
+    """
+    Rate lookups and conversion with a TTL-cached RateTable per base currency.
+    When the cache expires the provider is polled once, its snapshots are stored,
+    and the table is reloaded from exchange_rates. If the provider fails, the stored
+    snapshots keep being used until it recovers.
+    """
+
+    def __init__(self, provider=None, base: str = config.COMPANY_CURRENCY,
+                 ttl: float = config.EXCHANGE_RATE_TTL_SECONDS):
+        self.provider = provider if provider is not None else make_provider()
+        self.base = base
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tables: Dict[str, Tuple[float, RateTable]] = {}
+
+    def table(self, base: Optional[str] = None) -> RateTable:
+        base = base or self.base
+        cached = self._tables.get(base)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        with self._lock:
+            cached = self._tables.get(base)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+            ttl = self.ttl
+            try:
+                self.store(base, self.provider.fetch(base))
+            except Exception as e:
+                # Keep serving stored snapshots (RatesUnavailable on lookup if there are none)
+                # and retry sooner than a full TTL.
+                logger.warning("Exchange rate refresh for %s failed: %s", base, e)
+                ttl = min(ttl, RETRY_AFTER_FAILURE_SECONDS)
+            table = self._load(base)
+            self._tables[base] = (time.monotonic() + ttl, table)
+            return table
+
+    def stored_table(self, base: Optional[str] = None) -> RateTable:
+        """
+        The cached table, however old, or the stored snapshots; never polls the provider
+        or waits on a refresh. For write paths, where a provider timeout would hold up
+        every concurrent writer. A table loaded here is already expired, so the next
+        table() call still refreshes it.
+        """
+        base = base or self.base
+        cached = self._tables.get(base)
+        if cached:
+            return cached[1]
+        table = self._load(base)
+        self._tables.setdefault(base, (0.0, table))
+        return table
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tables.clear()
+
+    @staticmethod
+    def store(base: str, snapshots: List[Snapshot]) -> None:
+        """
+        Persist snapshots, replacing any stored rates for the same base and day.
+        """
+        writer.run(_store_rates, [(base, day, currency, float(rate))
+                                  for day, rates in snapshots for currency, rate in rates.items()],
+                   tables=("exchange_rates",))
+
+    @staticmethod
+    def _load(base: str) -> RateTable:
+        with get_db_connection() as conn:
+            rows = conn.execute(
+                "SELECT rate_date, currency, rate FROM exchange_rates WHERE base = ?", (base,)
+            ).fetchall()
+        return RateTable.from_rows(base, [tuple(row) for row in rows])
+
+    # ---------- conversion ----------
+
+    def rates(self, day: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        Return the snapshot used for a day (default: the latest) as {"base", "date", "rates"}.
+        """
+        table = self.table()
+        row = int(table.rows_for([day] if day else None, 1)[0])
+        quoted = {code: float(table.rates[row, col]) for code, col in table.currencies.items()
+                  if not np.isnan(table.rates[row, col])}
+        return {"base": table.base, "date": str(table.days[row]), "rates": quoted}
+
+    def convert_many(self, amounts: Sequence[float], currencies: Sequence[str],
+                     days: Optional[Sequence[Any]] = None, target: Optional[str] = None,
+                     refresh: bool = True) -> np.ndarray:
+        """
+        Convert parallel sequences of amounts and currency codes into `target` (default:
+        the company currency), at each day's rate (default: latest). Returns a float64
+        array; amounts in a currency without a rate come back as NaN.
+        refresh=False converts with the stored snapshots only (see stored_table).
+        """
+        if not len(amounts):
+            return np.empty(0)
+        table = self.table() if refresh else self.stored_table()
+        source = table.lookup(currencies, days)
+        if target is None or target == table.base:
+            return np.asarray(amounts, dtype=float) / source
+        return np.asarray(amounts, dtype=float) * table.lookup([target] * len(source), days) / source
+
+    def convert(self, amount: float, currency: str, day: Optional[Any] = None,
+                target: Optional[str] = None) -> float:
+        value = float(self.convert_many([amount], [currency], [day] if day else None, target)[0])
+        if np.isnan(value):
+            raise UnknownCurrency(f"No exchange rate for {currency if target is None else (currency, target)}")
+        return value
+
+    def convert_rows(self, rows: List[Dict[str, Any]], target: Optional[str] = None,
+                     field: str = "converted_amount") -> List[Dict[str, Any]]:
+        """
+        Add `field` (rounded to cents, None if no rate) and "converted_currency" to each
+        row, reading its amount, currency and expense_date. Modifies and returns rows.
+        """
+        if not rows:
+            return rows
+        values = self.convert_many([row["amount"] for row in rows], [row["currency"] for row in rows],
+                                   [row.get("expense_date") for row in rows], target)
+        values = np.round(values, 2).tolist()
+        currency = target or self.base
+        for row, value in zip(rows, values):
+            row[field] = None if value != value else value
+            row["converted_currency"] = currency
+        return rows
+
+
+rate_service = RateService()
+
+
+if __name__ == "__main__":
+    from ..migrations import migrate
+
+    migrate()
+    table = rate_service.table()
+    print(f"✓ {len(table.days)} {table.base} snapshots, {len(table.currencies)} currencies"
+          + (f", latest {table.days[-1]}" if len(table.days) else ""))
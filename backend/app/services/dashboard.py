@@ -0,0 +1,141 @@
+"""
+Dashboard totals: expense count and amount per employee, department, status, category
+and month. expense_totals holds one row per (dimension, key) and is kept current by
+triggers on expenses and users (migration 8), so every write path — single submits,
+bulk imports, approval decisions, OCR autofill — updates it in the same transaction.
+Reading the dashboard is then a handful of primary-key range scans whose size depends
+on the number of departments / categories / months, not on the number of expenses.
+Expenses moved to the archives (app/services/archive.py) leave expense_totals and are
+added to archived_totals (migration 12); the dashboard reads both through the
+dashboard_totals view. rebuild() and check() cover expense_totals only.
+
+Usage (from backend/):
+    python -m app.services.dashboard            # rebuild the totals from expenses
+    python -m app.services.dashboard --check    # compare the totals with a full recompute
+"""
+
+import sqlite3
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..database import get_db_connection
+
+DEFAULT_MONTHS = 12
+AMOUNT_TOLERANCE = 0.005    # running float sums may drift from a fresh TOTAL() by rounding
+
+
+def recompute_sql(source: str = "expenses") -> str:
+    """
+    The totals of every dimension computed from scratch over `source`, a table with
+    the expense columns employee_id, amount, status, category and expense_date.
+    """
+    return f"""
+    SELECT 'all' AS dimension, '' AS key, COUNT(*) AS count, TOTAL(amount) AS amount FROM {source}
+    UNION ALL
+    SELECT 'employee', CAST(employee_id AS TEXT), COUNT(*), TOTAL(amount) FROM {source} GROUP BY employee_id
+    UNION ALL
+    SELECT 'department', COALESCE(u.department, ''), COUNT(*), TOTAL(e.amount)
+    FROM {source} e LEFT JOIN users u ON u.id = e.employee_id GROUP BY COALESCE(u.department, '')
+    UNION ALL
+    SELECT 'status', status, COUNT(*), TOTAL(amount) FROM {source} GROUP BY status
+    UNION ALL
+    SELECT 'category', category, COUNT(*), TOTAL(amount) FROM {source} GROUP BY category
+    UNION ALL
+    SELECT 'month', substr(expense_date, 1, 7), COUNT(*), TOTAL(amount) FROM {source}
+    GROUP BY substr(expense_date, 1, 7)
+"""
+
+
+# The hot totals computed from scratch; used by rebuild() and check().
+RECOMPUTE_SQL = recompute_sql()
+
+
+def _totals(count: int, amount: float) -> Dict[str, Any]:
+    return {"count": count, "amount": round(amount, 2)}
+
+
+def _dimension(conn: sqlite3.Connection, dimension: str) -> Dict[str, Dict[str, Any]]:
+    rows = conn.execute(
+        "SELECT key, count, amount FROM dashboard_totals WHERE dimension = ? AND count != 0 ORDER BY key",
+        (dimension,),
+    ).fetchall()
+    return {row["key"]: _totals(row["count"], row["amount"]) for row in rows}
+
+
+# ==================== READS ====================
+
+def summary(employee_id: Optional[int] = None, months: int = DEFAULT_MONTHS) -> Dict[str, Any]:
+    """
+    Return the dashboard totals: overall, by status, category and department, the
+    latest `months` months, and (if employee_id is given) that employee's own totals.
+    Archived expenses are included.
+    Amounts are summed as stored, i.e. in each expense's own currency.
+    """
+    with get_db_connection() as conn:
+        total = conn.execute(
+            "SELECT count, amount FROM dashboard_totals WHERE dimension = 'all' AND key = ''"
+        ).fetchone()
+        by_month = conn.execute("""
+            SELECT key, count, amount FROM dashboard_totals
+            WHERE dimension = 'month' AND count != 0
+            ORDER BY key DESC LIMIT ?
+        """, (months,)).fetchall()
+        result = {
+            "total": _totals(total["count"], total["amount"]) if total else _totals(0, 0.0),
+            "by_status": _dimension(conn, "status"),
+            "by_category": _dimension(conn, "category"),
+            "by_department": _dimension(conn, "department"),
+            "by_month": [{"month": row["key"], **_totals(row["count"], row["amount"])} for row in by_month],
+        }
+        if employee_id is not None:
+            mine = conn.execute(
+                "SELECT count, amount FROM dashboard_totals WHERE dimension = 'employee' AND key = ?",
+                (str(employee_id),),
+            ).fetchone()
+            result["employee"] = _totals(mine["count"], mine["amount"]) if mine else _totals(0, 0.0)
+    return result
+
+
+# ==================== MAINTENANCE ====================
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    """
+    Replace the totals with a full recompute, e.g. after expenses were edited with the
+    triggers disabled or to clear accumulated float drift.
+    """
+    conn.execute("DELETE FROM expense_totals")
+    conn.execute(f"INSERT INTO expense_totals (dimension, key, count, amount) {RECOMPUTE_SQL}")
+
+
+def check(conn: sqlite3.Connection) -> List[Tuple[str, str, Tuple[int, float], Tuple[int, float]]]:
+    """
+    Compare the stored totals with a full recompute.
+    Returns (dimension, key, stored (count, amount), expected (count, amount)) for every
+    mismatch; rows with a zero count count as missing. An empty list means consistent.
+    """
+    stored = {(row["dimension"], row["key"]): (row["count"], row["amount"])
+              for row in conn.execute("SELECT * FROM expense_totals WHERE count != 0")}
+    expected = {(row["dimension"], row["key"]): (row["count"], row["amount"])
+                for row in conn.execute(RECOMPUTE_SQL) if row["count"]}
+    mismatches = []
+    for key in sorted(stored.keys() | expected.keys()):
+        have, want = stored.get(key, (0, 0.0)), expected.get(key, (0, 0.0))
+        if have[0] != want[0] or abs(have[1] - want[1]) > AMOUNT_TOLERANCE:
+            mismatches.append((*key, have, want))
+    return mismatches
+
+
+if __name__ == "__main__":
+    with get_db_connection() as conn:
+        if "--check" in sys.argv[1:]:
+            mismatches = check(conn)
+            for dimension, key, have, want in mismatches:
+                print(f"✗ {dimension} {key!r}: stored {have[0]} / {have[1]:.2f}, expected {want[0]} / {want[1]:.2f}")
+            if mismatches:
+                raise SystemExit(1)
+            print("✓ Dashboard totals match the expenses table")
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            rebuild(conn)
+            conn.commit()
+            print("✓ Dashboard totals rebuilt")
@@ -0,0 +1,335 @@
+"""
+Duplicate and near-duplicate expense detection at submission time.
+
+Every expense has a row in expense_fingerprints (migration 11): its employee, its
+amount in cents of the company currency (of its own currency when no rate is known),
+its date, the distinct lower-cased words of its description (vendor and purpose),
+its receipt's content hash, and a digest of (employee, currency, cents, date, words).
+Checking a new expense never walks the employee's history:
+  - exact duplicate: one lookup of the digest index, plus one of the receipt hash
+    index when the expense has a receipt;
+  - near duplicate: same employee and currency, date within ±DUPLICATE_WINDOW_DAYS,
+    amount within DUPLICATE_AMOUNT_TOLERANCE: one range scan of the window index,
+    bounded by the date range and MAX_MATCHES.
+Fingerprints are computed by the submitting thread, converting with the stored rate
+snapshots only (the provider is polled by the read paths), and written, with the
+lookups, in the submission's group-commit job, so two copies of an expense submitted
+in the same batch still find each other. Matches are flagged in expense_duplicates
+and returned with the submission.
+
+Editing a fingerprinted field drops the expense's fingerprint and flags (a trigger);
+a rescan fingerprints such expenses again and flags every pair in the history in one
+pass over the window index.
+
+Usage (from backend/):
+    python -m app.services.duplicates --rescan    # backfill fingerprints, flag duplicates
+"""
+
+import hashlib
+import math
+import re
+import sqlite3
+import sys
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .. import config
+from ..database import get_db_connection, open_read_connection
+from .currency import RatesUnavailable, rate_service
+from .receipt_store import is_hash
+
+MAX_MATCHES = 20            # matches returned per kind for one expense
+BACKFILL_CHUNK = 5000       # expenses fingerprinted per transaction by backfill()
+RESCAN_BATCH = 5000         # flagged pairs written per transaction by rescan()
+RESCAN_MAX_WINDOW = 1000    # earlier expenses one expense is compared with during a rescan
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_KIND_ORDER = {"exact": 0, "receipt": 1, "near": 2}
+
+# A pair found again keeps its strongest kind: exact > receipt > near.
+FLAG_SQL = """
+    INSERT INTO expense_duplicates (expense_id, duplicate_of, kind, similarity) VALUES (?, ?, ?, ?)
+    ON CONFLICT (expense_id, duplicate_of) DO UPDATE
+    SET kind = excluded.kind, similarity = excluded.similarity
+    WHERE excluded.kind = 'exact' OR (excluded.kind = 'receipt' AND kind = 'near')
+"""
+STORE_SQL = """
+    INSERT OR REPLACE INTO expense_fingerprints (expense_id, employee_id, currency, amount_cents,
+                                                 expense_date, tokens, digest, receipt_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    employee_id: int
+    currency: str
+    amount_cents: int
+    expense_date: str
+    tokens: str             # sorted distinct words, space-separated
+    receipt_hash: Optional[str]
+
+    @property
+    def digest(self) -> str:
+        key = f"{self.employee_id}|{self.currency}|{self.amount_cents}|{self.expense_date}|{self.tokens}"
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def row(self, expense_id: int) -> tuple:
+        return (expense_id, self.employee_id, self.currency, self.amount_cents, self.expense_date,
+                self.tokens, self.digest, self.receipt_hash)
+
+
+def tokens(description: Optional[str]) -> str:
+    return " ".join(sorted({word.lower() for word in _WORD.findall(description or "")}))
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    Jaccard similarity of two token strings (1.0 when both are empty).
+    """
+    left, right = set(a.split()), set(b.split())
+    if not left and not right:
+        return 1.0
+    return round(len(left & right) / len(left | right), 2)
+
+
+def _receipt_hash(receipt_url: Optional[str]) -> Optional[str]:
+    candidate = (receipt_url or "").rsplit("/", 1)[-1]
+    return candidate if is_hash(candidate) else None
+
+
+def fingerprints(expenses: List[Dict[str, Any]]) -> List[Fingerprint]:
+    """
+    Fingerprint expenses (dicts with employee_id, amount, currency, expense_date,
+    description and optionally receipt_url), converting all amounts in one call.
+    """
+    if not expenses:
+        return []
+    days = [str(e["expense_date"])[:10] for e in expenses]
+    try:
+        # Stored snapshots only: submissions never wait on the rate provider.
+        converted = rate_service.convert_many([e["amount"] for e in expenses],
+                                              [e["currency"] for e in expenses], days, refresh=False)
+    except RatesUnavailable:
+        converted = np.full(len(expenses), np.nan)
+    result = []
+    for expense, day, value in zip(expenses, days, converted.tolist()):
+        if value != value:
+            # No rate for this currency: compare within the currency itself.
+            currency, value = expense["currency"].upper(), float(expense["amount"])
+        else:
+            currency = rate_service.base
+        result.append(Fingerprint(int(expense["employee_id"]), currency, int(round(value * 100)), day,
+                                  tokens(expense.get("description")), _receipt_hash(expense.get("receipt_url"))))
+    return result
+
+
+def fingerprint(expense: Dict[str, Any]) -> Fingerprint:
+    return fingerprints([expense])[0]
+
+
+# ==================== DETECTION ====================
+
+def amount_bounds(cents: int, tolerance: float = config.DUPLICATE_AMOUNT_TOLERANCE) -> Tuple[int, int]:
+    return math.floor(cents * (1 - tolerance)), math.ceil(cents * (1 + tolerance))
+
+
+def find_matches(conn: sqlite3.Connection, fp: Fingerprint, expense_id: int = 0,
+                 window_days: int = config.DUPLICATE_WINDOW_DAYS,
+                 tolerance: float = config.DUPLICATE_AMOUNT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Expenses (other than expense_id) that duplicate a fingerprint: {"expense_id",
+    "kind" (exact / receipt / near), "similarity"}, strongest first.
+    """
+    matches: Dict[int, Dict[str, Any]] = {}
+    for (other,) in conn.execute(
+            "SELECT expense_id FROM expense_fingerprints WHERE digest = ? AND expense_id != ? LIMIT ?",
+            (fp.digest, expense_id, MAX_MATCHES)):
+        matches[other] = {"expense_id": other, "kind": "exact", "similarity": 1.0}
+    if fp.receipt_hash:
+        for other, other_tokens in conn.execute("""
+                SELECT expense_id, tokens FROM expense_fingerprints
+                WHERE receipt_hash = ? AND expense_id != ? LIMIT ?
+                """, (fp.receipt_hash, expense_id, MAX_MATCHES)):
+            matches.setdefault(other, {"expense_id": other, "kind": "receipt",
+                                       "similarity": similarity(fp.tokens, other_tokens)})
+    day = date.fromisoformat(fp.expense_date)
+    low, high = amount_bounds(fp.amount_cents, tolerance)
+    for other, other_tokens in conn.execute("""
+            SELECT expense_id, tokens FROM expense_fingerprints
+            WHERE employee_id = ? AND currency = ? AND expense_date BETWEEN ? AND ?
+              AND amount_cents BETWEEN ? AND ? AND expense_id != ? LIMIT ?
+            """, (fp.employee_id, fp.currency, str(day - timedelta(days=window_days)),
+                  str(day + timedelta(days=window_days)), low, high, expense_id, MAX_MATCHES)):
+        matches.setdefault(other, {"expense_id": other, "kind": "near",
+                                   "similarity": similarity(fp.tokens, other_tokens)})
+    return sorted(matches.values(), key=lambda m: (_KIND_ORDER[m["kind"]], -m["similarity"], m["expense_id"]))
+
+
+def record(conn: sqlite3.Connection, expense_id: int, fp: Fingerprint) -> List[Dict[str, Any]]:
+    """
+    Check a new expense against the stored fingerprints, then store its own and flag
+    what it matched, on the caller's transaction (a group-commit job).
+    Returns the matches.
+    """
+    matches = find_matches(conn, fp, expense_id)
+    conn.execute(STORE_SQL, fp.row(expense_id))
+    if matches:
+        conn.executemany(FLAG_SQL, [(expense_id, m["expense_id"], m["kind"], m["similarity"])
+                                    for m in matches])
+    return matches
+
+
+def record_many(conn: sqlite3.Connection, expense_ids: List[int],
+                fps: List[Fingerprint]) -> List[List[Dict[str, Any]]]:
+    """
+    record() for a batch of new expenses, in order, so later ones see earlier ones.
+    """
+    return [record(conn, expense_id, fp) for expense_id, fp in zip(expense_ids, fps)]
+
+
+def flagged(expense_id: int) -> List[Dict[str, Any]]:
+    """
+    Stored flags involving an expense, from either side of the pair.
+    """
+    with get_db_connection() as conn:
+        rows = conn.execute("""
+            SELECT duplicate_of AS expense_id, kind, similarity, detected_at, 'earlier' AS position
+            FROM expense_duplicates WHERE expense_id = ?
+            UNION ALL
+            SELECT expense_id, kind, similarity, detected_at, 'later' AS position
+            FROM expense_duplicates WHERE duplicate_of = ?
+        """, (expense_id, expense_id)).fetchall()
+    return sorted((dict(row) for row in rows),
+                  key=lambda m: (_KIND_ORDER[m["kind"]], -m["similarity"], m["expense_id"]))
+
+
+# ==================== RESCAN ====================
+
+def backfill(conn: sqlite3.Connection, chunk_size: int = BACKFILL_CHUNK) -> int:
+    """
+    Fingerprint every expense that has none (expenses from before migration 11, or
+    edited since), a chunk per transaction. Returns how many were fingerprinted.
+    """
+    done, last_id = 0, 0
+    while True:
+        rows = conn.execute("""
+            SELECT e.id, e.employee_id, e.amount, e.currency, e.expense_date, e.description, e.receipt_url
+            FROM expenses e
+            WHERE e.id > ? AND NOT EXISTS (SELECT 1 FROM expense_fingerprints f WHERE f.expense_id = e.id)
+            ORDER BY e.id LIMIT ?
+        """, (last_id, chunk_size)).fetchall()
+        if not rows:
+            return done
+        expenses = [dict(row) for row in rows]
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(STORE_SQL, [fp.row(e["id"]) for e, fp in zip(expenses, fingerprints(expenses))])
+        conn.commit()
+        done += len(rows)
+        last_id = rows[-1]["id"]
+
+
+def _pairs(rows: Iterable[tuple], window_days: int, tolerance: float) -> Iterable[tuple]:
+    """
+    Flag rows for (expense_id, employee_id, currency, expense_date, amount_cents, tokens,
+    digest) ordered by employee, currency and date: each expense is compared with the
+    earlier-dated ones of the same employee and currency still inside the window.
+    """
+    window: deque = deque()
+    group = None
+    for expense_id, employee_id, currency, day, cents, words, digest in rows:
+        ordinal = date.fromisoformat(str(day)[:10]).toordinal()
+        if (employee_id, currency) != group:
+            group = (employee_id, currency)
+            window.clear()
+        while window and ordinal - window[0][1] > window_days:
+            window.popleft()
+        for other_id, _, other_cents, other_words, other_digest in window:
+            # As at submission, the later expense's amount sets the tolerance band.
+            if expense_id > other_id:
+                pair, low_high, candidate = (expense_id, other_id), amount_bounds(cents, tolerance), other_cents
+            else:
+                pair, low_high, candidate = (other_id, expense_id), amount_bounds(other_cents, tolerance), cents
+            if low_high[0] <= candidate <= low_high[1]:
+                if digest == other_digest:
+                    yield (*pair, "exact", 1.0)
+                else:
+                    yield (*pair, "near", similarity(words, other_words))
+        window.append((expense_id, ordinal, cents, words, digest))
+        if len(window) > RESCAN_MAX_WINDOW:
+            window.popleft()
+
+
+def rescan(window_days: int = config.DUPLICATE_WINDOW_DAYS,
+           tolerance: float = config.DUPLICATE_AMOUNT_TOLERANCE) -> Dict[str, int]:
+    """
+    Backfill missing fingerprints, then flag every duplicate pair in the history:
+    near / exact pairs from one ordered pass over the window index, receipt pairs from
+    the receipt index. Existing flags are kept (or upgraded), so it can run while the
+    server takes submissions. Returns counts.
+    """
+    counts = {"fingerprinted": 0, "pairs": 0}
+    with get_db_connection() as conn:
+        counts["fingerprinted"] = backfill(conn)
+
+        def write(batch: List[tuple]) -> None:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(FLAG_SQL, batch)
+            conn.commit()
+            counts["pairs"] += len(batch)
+
+        def flag(pairs: Iterable[tuple]) -> None:
+            batch = []
+            for pair in pairs:
+                batch.append(pair)
+                if len(batch) >= RESCAN_BATCH:
+                    write(batch)
+                    batch = []
+            if batch:
+                write(batch)
+
+        # A separate read-only snapshot, so the writes above never disturb the scan.
+        reader = open_read_connection()
+        try:
+            cursor = reader.cursor()
+            cursor.row_factory = None
+            cursor.execute("""
+                SELECT expense_id, employee_id, currency, expense_date, amount_cents, tokens, digest
+                FROM expense_fingerprints
+                ORDER BY employee_id, currency, expense_date
+            """)
+            flag(_pairs(cursor, window_days, tolerance))
+
+            def receipt_pairs():
+                cursor.execute("""
+                    SELECT receipt_hash, expense_id, tokens FROM expense_fingerprints
+                    WHERE receipt_hash IS NOT NULL AND receipt_hash IN (
+                        SELECT receipt_hash FROM expense_fingerprints WHERE receipt_hash IS NOT NULL
+                        GROUP BY receipt_hash HAVING COUNT(*) > 1)
+                    ORDER BY receipt_hash, expense_id
+                """)
+                first = None
+                for receipt_hash, expense_id, words in cursor:
+                    if first is None or first[0] != receipt_hash:
+                        first = (receipt_hash, expense_id, words)
+                        continue
+                    yield expense_id, first[1], "receipt", similarity(words, first[2])
+
+            flag(receipt_pairs())
+        finally:
+            reader.close()
+    return counts
+
+
+if __name__ == "__main__":
+    if "--rescan" not in sys.argv[1:]:
+        raise SystemExit("usage: python -m app.services.duplicates --rescan")
+    from ..migrations import migrate
+
+    migrate()
+    result = rescan()
+    print(f"✓ Fingerprinted {result['fingerprinted']:,} expenses, flagged {result['pairs']:,} duplicate pairs")
@@ -0,0 +1,152 @@
+"""
+Bulk expense submission: validation, chunked inserts and incremental CSV / NDJSON parsing.
+Rows are validated and inserted a chunk at a time, so memory stays bounded by the
+chunk size no matter how large the upload is.
+"""
+
+import codecs
+import csv
+import json
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+from pydantic import ValidationError
+
+from ..models import UserModel
+from ..schemas import ExpenseCreate
+from .approval_workflow import submit_expenses
+
+IMPORT_CHUNK_SIZE = 500     # rows validated and committed per transaction
+MAX_BATCH_SIZE = 5000       # items accepted by the JSON batch endpoint
+
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'row'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def import_chunk(items: List[Tuple[int, Any]]) -> List[Dict[str, Any]]:
+    """
+    Validate and insert one chunk of (row number, raw item) pairs.
+    Items that already failed parsing can be passed as exceptions.
+    Returns one result per row, in row order: {"row", "id"} or {"row", "error"};
+    created rows that duplicate an existing expense also carry "duplicates".
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    valid: List[Tuple[int, ExpenseCreate]] = []
+    for row, item in items:
+        if isinstance(item, Exception):
+            results[row] = {"row": row, "error": str(item)}
+            continue
+        try:
+            valid.append((row, ExpenseCreate.model_validate(item)))
+        except ValidationError as e:
+            results[row] = {"row": row, "error": _describe(e)}
+
+    known = UserModel.get_existing_ids(expense.employee_id for _, expense in valid)
+    to_insert = []
+    for row, expense in valid:
+        if expense.employee_id in known:
+            to_insert.append((row, expense))
+        else:
+            results[row] = {"row": row, "error": f"employee_id: unknown employee {expense.employee_id}"}
+
+    submitted = submit_expenses([expense.model_dump() for _, expense in to_insert])
+    for (row, _), created in zip(to_insert, submitted):
+        results[row] = {"row": row, "id": created["id"]}
+        if created["duplicates"]:
+            results[row]["duplicates"] = created["duplicates"]
+    return [results[row] for row, _ in items]
+
+
+def import_items(items: Iterable[Any], chunk_size: int = IMPORT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+    """
+    Import an in-memory list of items (the JSON batch endpoint), chunk by chunk.
+    Row numbers are the 0-based positions in the list.
+    """
+    results: List[Dict[str, Any]] = []
+    chunk: List[Tuple[int, Any]] = []
+    for row, item in enumerate(items):
+        chunk.append((row, item))
+        if len(chunk) >= chunk_size:
+            results.extend(import_chunk(chunk))
+            chunk = []
+    if chunk:
+        results.extend(import_chunk(chunk))
+    return results
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    created = sum(1 for r in results if "id" in r)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+# ==================== STREAM PARSING ====================
+
+async def aiter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Decode a UTF-8 byte stream (BOM tolerated) into lines without buffering the whole body.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in stream:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def aiter_records(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """
+    Yield (row number, item) pairs from a CSV (with header) or NDJSON stream.
+    Row numbers are 1-based data rows; a row that cannot be parsed is yielded as an exception.
+    """
+    row = 0
+    if fmt == "ndjson":
+        async for line in aiter_lines(stream):
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                yield row, json.loads(line)
+            except ValueError as e:
+                yield row, ValueError(f"invalid JSON: {e}")
+        return
+
+    header = None
+    record = ""
+    async for line in aiter_lines(stream):
+        # A quoted field may span lines; keep reading until the quotes balance.
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        text, record = record, ""
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, ValueError(f"expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells fall back to the schema defaults.
+        yield row, {key: value for key, value in zip(header, values) if value != ""}
+    if record:
+        yield row + 1, ValueError("unterminated quoted field")
+
+
+async def aiter_chunks(records: AsyncIterator[Tuple[int, Any]],
+                       size: int = IMPORT_CHUNK_SIZE) -> AsyncIterator[List[Tuple[int, Any]]]:
+    chunk: List[Tuple[int, Any]] = []
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
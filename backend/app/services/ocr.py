@@ -0,0 +1,358 @@
+"""
+Receipt OCR jobs.
+Scanning a receipt takes seconds of CPU, so uploads only enqueue a job: a spawn
+process pool downsizes and binarizes the image, runs the configured OCR backend and
+parses amount / date / vendor, and a completion callback writes the result back to
+the expense. Results are cached in ocr_results by content hash and backend, and
+identical receipts already in flight share one worker run.
+"""
+
+import importlib
+import json
+import multiprocessing
+import re
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .. import config
+from ..database import get_db_connection
+from ..writer import writer
+from . import receipt_store
+from .approval_workflow import has_decisions, replan
+
+
+class OcrQueueFull(RuntimeError):
+    """
+    Raised when more receipts are waiting for a worker than OCR_MAX_QUEUE allows.
+    """
+
+
+# ==================== BACKENDS ====================
+# A backend turns a prepared (grayscale, binarized) PIL image into text. These run in
+# the worker processes, so they must be importable module-level functions.
+
+def tesseract_backend(image) -> str:
+    import pytesseract
+    return pytesseract.image_to_string(image)
+
+
+def fake_backend(image) -> str:
+    """
+    Deterministic stand-in for tests: returns the image's "ocr_text" PNG text chunk.
+    """
+    return image.info.get("ocr_text", "")
+
+
+BACKENDS: Dict[str, Callable[[Any], str]] = {"tesseract": tesseract_backend, "fake": fake_backend}
+
+
+def resolve_backend(name: str) -> Callable[[Any], str]:
+    """
+    Look up a backend by name, or import one given as "package.module:function".
+    """
+    if name in BACKENDS:
+        return BACKENDS[name]
+    module, _, attr = name.partition(":")
+    if not attr:
+        raise ValueError(f"Unknown OCR backend {name!r}")
+    return getattr(importlib.import_module(module), attr)
+
+
+# ==================== EXTRACTION ====================
+
+def prepare_image(path: str, max_dimension: int = config.OCR_MAX_DIMENSION):
+    """
+    Load a receipt and normalise it for OCR: upright, grayscale, at most max_dimension
+    pixels on the longest side, contrast-stretched and thresholded to black and white.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as original:
+        info = dict(original.info)
+        image = ImageOps.exif_transpose(original).convert("L")
+    image.thumbnail((max_dimension, max_dimension))
+    image = ImageOps.autocontrast(image)
+    histogram = image.histogram()
+    threshold = sum(i * n for i, n in enumerate(histogram)) / max(sum(histogram), 1)
+    image = image.point(lambda p: 255 if p > threshold else 0, mode="1")
+    image.info = info
+    return image
+
+
+_AMOUNT = re.compile(r"(?<![\d.,])(\d{1,3}(?:[,\s]\d{3})+|\d+)[.,](\d{2})(?![\d])")
+_CURRENCY_SYMBOLS = {"$": "USD", "€": "EUR", "£": "GBP", "₹": "INR", "¥": "JPY"}
+_CURRENCY_CODE = re.compile(r"\b(USD|EUR|GBP|INR|JPY|CAD|AUD|CHF|CNY|SGD|AED)\b")
+_MONTHS = "jan feb mar apr may jun jul aug sep oct nov dec".split()
+_DATE_PATTERNS = [
+    (re.compile(r"\b(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})\b"), ("y", "m", "d")),
+    (re.compile(r"\b(\d{1,2})[-/.](\d{1,2})[-/.](\d{4}|\d{2})\b"), ("a", "b", "y")),
+    (re.compile(r"\b([A-Za-z]{3})[a-z]*\.? (\d{1,2}),? (\d{4})\b"), ("mon", "d", "y")),
+    (re.compile(r"\b(\d{1,2}) ([A-Za-z]{3})[a-z]*\.?,? (\d{4})\b"), ("d", "mon", "y")),
+]
+
+
+def _parse_amount(match: re.Match) -> float:
+    return float(re.sub(r"[,\s]", "", match.group(1)) + "." + match.group(2))
+
+
+def _parse_date(text: str) -> Optional[str]:
+    for pattern, fields in _DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            parts = dict(zip(fields, match.groups()))
+            try:
+                year = int(parts["y"]) + (2000 if len(parts["y"]) == 2 else 0)
+                if "mon" in parts:
+                    month, day = _MONTHS.index(parts["mon"].lower()) + 1, int(parts["d"])
+                elif "a" in parts:
+                    # Ambiguous a/b/yyyy: month first unless that cannot be a month.
+                    a, b = int(parts["a"]), int(parts["b"])
+                    month, day = (b, a) if a > 12 else (a, b)
+                else:
+                    month, day = int(parts["m"]), int(parts["d"])
+                return date(year, month, day).isoformat()
+            except ValueError:
+                continue
+    return None
+
+
+def parse_receipt(text: str) -> Dict[str, Any]:
+    """
+    Pull amount, currency, date and vendor out of OCR text.
+    The amount is the last one on a "total" line (not "subtotal"), else the largest.
+    """
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    amount = None
+    totals = [line for line in lines
+              if re.search(r"\btotal\b", line, re.I) and not re.search(r"sub\s*-?total", line, re.I)]
+    for line in reversed(totals):
+        matches = list(_AMOUNT.finditer(line))
+        if matches:
+            amount = _parse_amount(matches[-1])
+            break
+    if amount is None:
+        values = [_parse_amount(m) for m in _AMOUNT.finditer(text)]
+        amount = max(values) if values else None
+
+    currency = next((code for symbol, code in _CURRENCY_SYMBOLS.items() if symbol in text), None)
+    if currency is None:
+        match = _CURRENCY_CODE.search(text)
+        currency = match.group(1) if match else None
+
+    vendor = next((line for line in lines
+                   if len(re.findall(r"[A-Za-z]", line)) >= 3 and not _AMOUNT.search(line)
+                   and _parse_date(line) is None), None)
+    return {"amount": amount, "currency": currency, "expense_date": _parse_date(text),
+            "vendor": vendor, "text": text[:2000]}
+
+
+def _ocr_worker(path: str, backend: str, max_dimension: int) -> Tuple[Dict[str, Any], float]:
+    # Runs inside a worker process and reports its own CPU time.
+    start = time.perf_counter()
+    text = resolve_backend(backend)(prepare_image(path, max_dimension))
+    return parse_receipt(text), time.perf_counter() - start
+
+
+# ==================== JOB QUEUE ====================
+
+def _job_from_row(row) -> Dict[str, Any]:
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["cached"] = bool(job["cached"])
+    job["autofill"] = bool(job["autofill"])
+    return job
+
+
+def _fail_job(conn, job_id: int, error: str) -> None:
+    conn.execute("""
+        UPDATE ocr_jobs SET status = 'Failed', error = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?
+    """, (error, job_id))
+
+
+class OcrQueue:
+    """
+    Bounded spawn process pool for OCR jobs.
+    Jobs live in ocr_jobs (Queued → Done / Failed); a job whose worker has started is
+    reported as Running. Jobs still Queued at startup are re-dispatched by recover().
+    """
+
+    def __init__(self, backend: str = config.OCR_BACKEND, workers: int = config.OCR_WORKERS,
+                 max_queue: int = config.OCR_MAX_QUEUE, max_dimension: int = config.OCR_MAX_DIMENSION):
+        self.backend = backend
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_dimension = max_dimension
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._jobs: Dict[int, Future] = {}
+        self._completed = 0
+        self._failed = 0
+        self._cache_hits = 0
+        self._work_time_total = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: never fork a process that already runs request threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    def enqueue(self, expense_id: int, content_hash: str, autofill: bool = False) -> Dict[str, Any]:
+        """
+        Create a job for a stored receipt and start it, or finish it at once from the cache.
+        Returns the job. Raises OcrQueueFull when too many receipts are waiting.
+        """
+        job_id, cached = writer.run(self._insert_job, expense_id, content_hash, autofill,
+                                    tables=("approvals", "expenses"))
+        if not cached:
+            self._dispatch(job_id, content_hash)
+        else:
+            with self._lock:
+                self._cache_hits += 1
+        return self.get_job(job_id)
+
+    def _insert_job(self, conn, expense_id: int, content_hash: str, autofill: bool) -> Tuple[int, bool]:
+        # Writer job: returns the new job's id and whether the cache already finished it.
+        cached = conn.execute("SELECT result FROM ocr_results WHERE content_hash = ? AND backend = ?",
+                              (content_hash, self.backend)).fetchone()
+        if cached is None and len(self._inflight) >= self.max_queue and content_hash not in self._inflight:
+            raise OcrQueueFull(f"{len(self._inflight)} receipts already waiting for OCR")
+        job_id = conn.execute("""
+            INSERT INTO ocr_jobs (expense_id, content_hash, autofill) VALUES (?, ?, ?)
+        """, (expense_id, content_hash, int(autofill))).lastrowid
+        if cached is not None:
+            self._complete(conn, job_id, json.loads(cached["result"]), cached=True)
+        return job_id, cached is not None
+
+    def _dispatch(self, job_id: int, content_hash: str) -> None:
+        executor = self._get_executor()
+        with self._lock:
+            future = self._inflight.get(content_hash)
+            if future is None:
+                future = executor.submit(
+                    _ocr_worker, receipt_store.path_for(content_hash), self.backend, self.max_dimension)
+                self._inflight[content_hash] = future
+            self._jobs[job_id] = future
+        future.add_done_callback(lambda f: self._finish(job_id, content_hash, f))
+
+    def _finish(self, job_id: int, content_hash: str, future: Future) -> None:
+        # Runs on the executor's result thread once the worker is done.
+        with self._lock:
+            if self._inflight.get(content_hash) is future:
+                del self._inflight[content_hash]
+            self._jobs.pop(job_id, None)
+        try:
+            result, work_time = future.result()
+        except Exception as e:
+            writer.run(_fail_job, job_id, f"{type(e).__name__}: {e}")
+            with self._lock:
+                self._failed += 1
+            return
+        writer.run(self._store_result, job_id, content_hash, result, tables=("approvals", "expenses"))
+        with self._lock:
+            self._completed += 1
+            self._work_time_total += work_time
+
+    def _store_result(self, conn, job_id: int, content_hash: str, result: Dict[str, Any]) -> None:
+        conn.execute("""
+            INSERT OR REPLACE INTO ocr_results (content_hash, backend, result) VALUES (?, ?, ?)
+        """, (content_hash, self.backend, json.dumps(result)))
+        self._complete(conn, job_id, result, cached=False)
+
+    @staticmethod
+    def _complete(conn, job_id: int, result: Dict[str, Any], cached: bool) -> None:
+        """
+        Mark a job Done and write the result to its expense. With autofill, a still
+        Pending expense also takes the amount, currency, date and vendor that were read.
+        Its approval levels were planned from the submitted amount, so a new amount or
+        currency re-plans them; once an approver has decided, those two are kept.
+        """
+        conn.execute("""
+            UPDATE ocr_jobs SET status = 'Done', cached = ?, result = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (int(cached), json.dumps(result), job_id))
+        job = conn.execute("SELECT expense_id, autofill FROM ocr_jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.execute("UPDATE expenses SET receipt_data = ? WHERE id = ?",
+                     (json.dumps({k: v for k, v in result.items() if k != "text"}), job["expense_id"]))
+        fields = {column: result[key] for column, key in (("amount", "amount"), ("currency", "currency"),
+                                                          ("expense_date", "expense_date"),
+                                                          ("description", "vendor"))
+                  if result.get(key) is not None}
+        if not (job["autofill"] and fields):
+            return
+        expense = conn.execute("SELECT amount, currency, status FROM expenses WHERE id = ?",
+                               (job["expense_id"],)).fetchone()
+        if expense is None or expense["status"] != "Pending":
+            return
+        replanned = any(column in fields and fields[column] != expense[column] for column in ("amount", "currency"))
+        if replanned and has_decisions(conn, job["expense_id"]):
+            fields.pop("amount", None)
+            fields.pop("currency", None)
+            replanned = False
+        if fields:
+            assignments = ", ".join(f"{column} = ?" for column in fields)
+            conn.execute(f"""
+                UPDATE expenses SET {assignments}, version = version + 1, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (*fields.values(), job["expense_id"]))
+        if replanned:
+            replan(conn, job["expense_id"])
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Return a job with its parsed result, or None if there is no such job.
+        """
+        with get_db_connection() as conn:
+            row = conn.execute("SELECT * FROM ocr_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = _job_from_row(row)
+        future = self._jobs.get(job_id)
+        if job["status"] == "Queued" and future is not None and future.running():
+            job["status"] = "Running"
+        return job
+
+    def jobs_for_expense(self, expense_id: int) -> List[Dict[str, Any]]:
+        with get_db_connection() as conn:
+            rows = conn.execute("SELECT * FROM ocr_jobs WHERE expense_id = ? ORDER BY id DESC",
+                                (expense_id,)).fetchall()
+        return [_job_from_row(row) for row in rows]
+
+    def recover(self) -> int:
+        """
+        Re-dispatch jobs left Queued by a previous process. Returns how many.
+        """
+        with get_db_connection() as conn:
+            rows = conn.execute("SELECT id, content_hash FROM ocr_jobs WHERE status = 'Queued' ORDER BY id").fetchall()
+        for row in rows:
+            self._dispatch(row["id"], row["content_hash"])
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self._completed or 1
+            return {
+                "backend": self.backend,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": len(self._inflight),
+                "completed": self._completed,
+                "failed": self._failed,
+                "cache_hits": self._cache_hits,
+                "work_time_avg_ms": round(self._work_time_total * 1000 / done, 3),
+            }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+ocr_queue = OcrQueue()
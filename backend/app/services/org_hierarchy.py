@@ -0,0 +1,164 @@
+"""
+Org hierarchy index: a closure table over users.manager_id.
+org_closure holds one row per (ancestor, descendant) pair at every distance, plus
+each user as their own ancestor at depth 0, so "who is this employee's director",
+"is X in Y's org" and "expenses from Y's org" are single indexed lookups or joins
+instead of one query per management level. UserModel keeps the table current.
+"""
+
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from ..database import get_db_connection
+
+# Orgs up to this size are listed by probing each member's expenses; larger ones by
+# walking the submitted_at index and checking membership row by row.
+SMALL_ORG_SIZE = 500
+
+
+class OrgCycleError(ValueError):
+    """
+    Raised when a manager assignment would make a user their own (indirect) manager.
+    """
+
+
+# ==================== MAINTENANCE ====================
+# These run on the caller's connection, inside the transaction that changes users.
+
+def add_user(conn: sqlite3.Connection, user_id: int, manager_id: Optional[int]) -> None:
+    """
+    Index a newly created user under their manager.
+    """
+    conn.execute("INSERT INTO org_closure (ancestor_id, descendant_id, depth) VALUES (?, ?, 0)",
+                 (user_id, user_id))
+    if manager_id is not None:
+        conn.execute("""
+            INSERT INTO org_closure (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, ?, depth + 1 FROM org_closure WHERE descendant_id = ?
+        """, (user_id, manager_id))
+
+
+def move_user(conn: sqlite3.Connection, user_id: int, manager_id: Optional[int]) -> None:
+    """
+    Re-parent a user, and with them their whole subtree, under a new manager (or none).
+    Raises OrgCycleError if the new manager is the user or one of their reports.
+    """
+    if manager_id is not None and conn.execute(
+        "SELECT 1 FROM org_closure WHERE ancestor_id = ? AND descendant_id = ?", (user_id, manager_id)
+    ).fetchone():
+        raise OrgCycleError(f"User {manager_id} reports to user {user_id}; cannot become their manager")
+
+    # Detach the subtree from its old ancestors, keeping the links inside it.
+    conn.execute("""
+        DELETE FROM org_closure
+        WHERE descendant_id IN (SELECT descendant_id FROM org_closure WHERE ancestor_id = :user)
+          AND ancestor_id NOT IN (SELECT descendant_id FROM org_closure WHERE ancestor_id = :user)
+    """, {"user": user_id})
+    if manager_id is not None:
+        conn.execute("""
+            INSERT INTO org_closure (ancestor_id, descendant_id, depth)
+            SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+            FROM org_closure above, org_closure below
+            WHERE above.descendant_id = ? AND below.ancestor_id = ?
+        """, (manager_id, user_id))
+
+
+def rebuild(conn: sqlite3.Connection) -> List[int]:
+    """
+    Recompute the whole table from users.manager_id, e.g. after users were edited
+    outside UserModel. Returns the ids of users caught in a manager cycle (their
+    chains are cut where the cycle closes); an empty list means the org is a forest.
+    """
+    conn.execute("DELETE FROM org_closure")
+    conn.execute("""
+        INSERT INTO org_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE chain(ancestor_id, descendant_id, depth, path) AS (
+            SELECT id, id, 0, '/' || id || '/' FROM users
+            UNION ALL
+            SELECT u.manager_id, chain.descendant_id, chain.depth + 1, chain.path || u.manager_id || '/'
+            FROM chain JOIN users u ON u.id = chain.ancestor_id
+            WHERE u.manager_id IS NOT NULL AND instr(chain.path, '/' || u.manager_id || '/') = 0
+        )
+        SELECT ancestor_id, descendant_id, depth FROM chain
+    """)
+    # A user is in a cycle if their manager is already one of their reports.
+    rows = conn.execute("""
+        SELECT u.id FROM users u JOIN org_closure c
+          ON c.ancestor_id = u.id AND c.descendant_id = u.manager_id
+        ORDER BY u.id
+    """).fetchall()
+    return [row[0] for row in rows]
+
+
+# ==================== LOOKUPS ====================
+
+def is_small_org(conn: sqlite3.Connection, manager_id: int) -> bool:
+    """
+    True if manager_id has at most SMALL_ORG_SIZE reports; counts no further than that.
+    """
+    count = conn.execute("""
+        SELECT COUNT(*) FROM (SELECT 1 FROM org_closure WHERE ancestor_id = ? AND depth > 0 LIMIT ?)
+    """, (manager_id, SMALL_ORG_SIZE + 1)).fetchone()[0]
+    return count <= SMALL_ORG_SIZE
+
+
+def ancestor_at(user_id: int, depth: int) -> Optional[int]:
+    """
+    Return the id of the manager `depth` levels above the user (1 = direct manager,
+    2 = their manager, ...), or None if the chain is shorter.
+    """
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT ancestor_id FROM org_closure WHERE descendant_id = ? AND depth = ?",
+                           (user_id, depth)).fetchone()
+    return row[0] if row else None
+
+
+def management_chain(user_id: int) -> List[Dict[str, Any]]:
+    """
+    Return the user's managers, nearest first, with their depth above the user.
+    """
+    with get_db_connection() as conn:
+        rows = conn.execute("""
+            SELECT c.depth, u.id, u.email, u.full_name, u.role, u.manager_id, u.department, u.is_active
+            FROM org_closure c JOIN users u ON u.id = c.ancestor_id
+            WHERE c.descendant_id = ? AND c.depth > 0
+            ORDER BY c.depth
+        """, (user_id,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def is_in_subtree(manager_id: int, user_id: int) -> bool:
+    """
+    True if user_id reports to manager_id at any depth.
+    """
+    with get_db_connection() as conn:
+        row = conn.execute("SELECT depth FROM org_closure WHERE ancestor_id = ? AND descendant_id = ?",
+                           (manager_id, user_id)).fetchone()
+    return row is not None and row[0] > 0
+
+
+def subtree(manager_id: int, max_depth: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Return the active users reporting to manager_id, directly or not, up to max_depth levels down.
+    """
+    depth_clause = "AND c.depth <= ?" if max_depth is not None else ""
+    params = (manager_id, max_depth) if max_depth is not None else (manager_id,)
+    with get_db_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT c.depth, u.id, u.email, u.full_name, u.role, u.manager_id, u.department
+            FROM org_closure c JOIN users u ON u.id = c.descendant_id
+            WHERE c.ancestor_id = ? AND c.depth > 0 {depth_clause} AND u.is_active = 1
+            ORDER BY c.depth, u.id
+        """, params).fetchall()
+    return [dict(row) for row in rows]
+
+
+if __name__ == "__main__":
+    with get_db_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        cycles = rebuild(conn)
+        conn.commit()
+    if cycles:
+        print(f"✗ Manager cycle through users: {', '.join(map(str, cycles))}")
+        raise SystemExit(1)
+    print("✓ Org hierarchy rebuilt")
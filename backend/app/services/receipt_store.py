@@ -0,0 +1,227 @@
+"""
+Content-addressed receipt files.
+Uploads are streamed to a temporary file in RECEIPT_DIR while being hashed, then
+renamed to <RECEIPT_DIR>/<first two hex digits>/<sha256>. An identical receipt maps
+to the same path, so it is stored once however many expenses reference it.
+Thumbnails live beside them under thumbs/ and are generated after the upload returns.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+from .. import config
+
+THUMBNAIL_SIZE = 320
+_HASH = re.compile(r"[0-9a-f]{64}")
+
+# Leading bytes of the receipt formats we accept.
+_SIGNATURES = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
+class ReceiptTooLarge(ValueError):
+    """
+    Raised when an upload exceeds the configured size limit.
+    """
+
+
+class UnsupportedReceipt(ValueError):
+    """
+    Raised for an upload that is not a PDF or a PNG / JPEG / GIF / WebP image, or a
+    multipart body without the expected file field.
+    """
+
+
+def is_hash(value: str) -> bool:
+    return bool(_HASH.fullmatch(value))
+
+
+def path_for(content_hash: str, root: str = None) -> str:
+    return os.path.join(root or config.RECEIPT_DIR, content_hash[:2], content_hash)
+
+
+def thumbnail_path(content_hash: str) -> str:
+    return os.path.join(config.RECEIPT_DIR, "thumbs", content_hash[:2], f"{content_hash}.jpg")
+
+
+def exists(content_hash: str) -> bool:
+    return os.path.exists(path_for(content_hash))
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """
+    Return the content type of a receipt from its first bytes, or None if unsupported.
+    """
+    for signature, content_type in _SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+# ==================== WRITING ====================
+
+class _ReceiptWriter:
+    """
+    Temp file + running sha256 + size limit + content sniffing for one upload.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.limit = config.RECEIPT_MAX_BYTES if max_bytes is None else max_bytes
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        os.makedirs(config.RECEIPT_DIR, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=config.RECEIPT_DIR, prefix=".upload-")
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.limit:
+            raise ReceiptTooLarge(f"Receipt exceeds {self.limit} bytes")
+        if len(self.head) < 16:
+            self.head += chunk[:16]
+        self.digest.update(chunk)
+        # Buffered writes of one network chunk; cheap next to the upload itself.
+        self.file.write(chunk)
+
+    def finish(self) -> Tuple[str, str, int, Optional[str]]:
+        """
+        Move the upload to its content address. Returns (sha256, path, size, content type).
+        """
+        self.file.close()
+        content_hash = self.digest.hexdigest()
+        path = path_for(content_hash)
+        if os.path.exists(path):
+            os.unlink(self.tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(self.tmp_path, path)
+        return content_hash, path, self.size, sniff(self.head)
+
+    def discard(self) -> None:
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.unlink(self.tmp_path)
+
+
+async def save_stream(chunks: AsyncIterator[bytes], max_bytes: int = None) -> Tuple[str, str, int]:
+    """
+    Write a raw upload to the store while hashing it, never holding more than one chunk.
+    Returns (sha256 hex digest, path, size in bytes).
+    Raises ReceiptTooLarge (leaving nothing behind) past max_bytes.
+    """
+    writer = _ReceiptWriter(max_bytes)
+    try:
+        async for chunk in chunks:
+            writer.write(chunk)
+        content_hash, path, size, _ = writer.finish()
+        return content_hash, path, size
+    except BaseException:
+        writer.discard()
+        raise
+
+
+async def save_multipart(content_type: str, chunks: AsyncIterator[bytes], field: str = "file",
+                         max_bytes: int = None) -> Dict[str, object]:
+    """
+    Stream the `field` file part of a multipart/form-data body into the store, feeding
+    the incremental parser one network chunk at a time (other parts are skipped).
+    Returns {"content_hash", "path", "size", "content_type", "filename"}.
+    Raises ReceiptTooLarge or UnsupportedReceipt; nothing is left behind on error.
+    """
+    media_type, options = parse_options_header(content_type)
+    if media_type != b"multipart/form-data" or b"boundary" not in options:
+        raise UnsupportedReceipt("Expected a multipart/form-data upload")
+
+    state = {"headers": {}, "header": b"", "value": b"", "writer": None, "done": None, "filename": None}
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header"].lower()] = state["value"]
+        state["header"] = state["value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        if disposition.get(b"name") == field.encode() and state["done"] is None and state["writer"] is None:
+            state["writer"] = _ReceiptWriter(max_bytes)
+            state["filename"] = disposition.get(b"filename", b"").decode("utf-8", "replace") or None
+
+    def on_part_data(data, start, end):
+        if state["writer"] is not None:
+            state["writer"].write(data[start:end])
+
+    def on_part_end():
+        if state["writer"] is not None:
+            state["done"], state["writer"] = state["writer"], None
+
+    parser = MultipartParser(options[b"boundary"], {
+        "on_part_begin": on_part_begin, "on_header_field": on_header_field,
+        "on_header_value": on_header_value, "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished, "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in chunks:
+            parser.write(chunk)
+        parser.finalize()
+        writer = state["done"]
+        if writer is None:
+            raise UnsupportedReceipt(f"No '{field}' file in the upload")
+        if sniff(writer.head) is None:
+            raise UnsupportedReceipt("Receipts must be PDF, PNG, JPEG, GIF or WebP files")
+        content_hash, path, size, detected = writer.finish()
+    except BaseException:
+        for writer in (state["writer"], state["done"]):
+            if writer is not None:
+                writer.discard()
+        raise
+    return {"content_hash": content_hash, "path": path, "size": size,
+            "content_type": detected, "filename": state["filename"]}
+
+
+# ==================== THUMBNAILS ====================
+
+def make_thumbnail(content_hash: str, size: int = THUMBNAIL_SIZE) -> Optional[str]:
+    """
+    Write a JPEG thumbnail for an image receipt (no-op for PDFs and existing thumbnails).
+    Returns the thumbnail path, or None if the receipt cannot be thumbnailed.
+    """
+    target = thumbnail_path(content_hash)
+    if os.path.exists(target):
+        return target
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(path_for(content_hash)) as original:
+            # Let JPEG decode at reduced scale instead of inflating the full image.
+            original.draft("RGB", (size, size))
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((size, size))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".thumb-")
+            with os.fdopen(fd, "wb") as f:
+                image.convert("RGB").save(f, "JPEG", quality=80)
+            os.replace(tmp_path, target)
+    except (UnidentifiedImageError, OSError):
+        return None
+    return target
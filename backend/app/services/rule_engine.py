@@ -0,0 +1,194 @@
+"""
+Compiled, in-memory index of the active approval rules.
+Rules are loaded once, grouped by department and approval level, and kept sorted
+by amount threshold, so resolving an expense's approver chain is a few binary
+searches instead of a query plus a row-by-row scan. ApprovalRuleModel keeps the
+index current when rules are created or deactivated.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from ..database import get_db_connection
+
+# Rule types that decide who approves a level (the others only modify a level).
+_ROUTING_TYPES = ("amount_threshold", "department_rule")
+
+
+@dataclass
+class WorkflowStep:
+    """
+    One level of an expense's approval chain.
+    required_percentage and override_approver_id come from percentage_approval and
+    specific_approver rules on the same level (the README's 60% / CFO / hybrid rules).
+    """
+    level: int
+    rule_id: int
+    rule_name: str
+    approver_role: Optional[str] = None
+    approver_id: Optional[int] = None
+    required_percentage: Optional[float] = None
+    override_approver_id: Optional[int] = None
+
+
+@dataclass
+class _LevelRules:
+    # amount_threshold rules with a bound, as (condition_value, id, rule), sorted
+    thresholds: List[Tuple[float, int, Dict[str, Any]]] = field(default_factory=list)
+    # amount_threshold rules without a bound and department_rule rules, as (id, rule), sorted
+    unbounded: List[Tuple[int, Dict[str, Any]]] = field(default_factory=list)
+    percentage: List[Tuple[int, Dict[str, Any]]] = field(default_factory=list)
+    specific: List[Tuple[int, Dict[str, Any]]] = field(default_factory=list)
+
+    def route(self, amount: float) -> Optional[Dict[str, Any]]:
+        # A bounded rule applies while amount <= condition_value (as in
+        # ApprovalRuleModel.get_rules_for_amount); the tightest bound wins.
+        i = bisect_left(self.thresholds, (amount,))
+        if i < len(self.thresholds):
+            return self.thresholds[i][2]
+        return self.unbounded[0][1] if self.unbounded else None
+
+    def is_empty(self) -> bool:
+        return not (self.thresholds or self.unbounded or self.percentage or self.specific)
+
+
+class RuleEngine:
+    """
+    Approval rules indexed by department (None = company-wide), then by level.
+    Department rules take precedence over company-wide rules on the same level.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._index: Dict[Optional[str], Dict[int, _LevelRules]] = {}
+        self._where: Dict[int, Tuple[Optional[str], int]] = {}
+        self._levels_cache: Dict[Optional[str], List[int]] = {}
+
+    # ---------- building ----------
+
+    def load(self, rules: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        (Re)build the whole index, from the given rules or from the active rules in the database.
+        """
+        if rules is None:
+            with get_db_connection() as conn:
+                rows = conn.execute("SELECT * FROM approval_rules WHERE is_active = 1").fetchall()
+            rules = [dict(row) for row in rows]
+        with self._lock:
+            self._index = {}
+            self._where = {}
+            self._levels_cache = {}
+            for rule in rules:
+                self._insert(rule)
+            self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def _insert(self, rule: Dict[str, Any]) -> None:
+        department = rule.get("department")
+        level = rule["approval_level"]
+        rules = self._index.setdefault(department, {}).setdefault(level, _LevelRules())
+        entry = (rule["id"], rule)
+        rule_type = rule["rule_type"]
+        if rule_type == "amount_threshold" and rule.get("condition_value") is not None:
+            insort(rules.thresholds, (float(rule["condition_value"]), rule["id"], rule))
+        elif rule_type in _ROUTING_TYPES:
+            insort(rules.unbounded, entry)
+        elif rule_type == "percentage_approval":
+            insort(rules.percentage, entry)
+        elif rule_type == "specific_approver":
+            insort(rules.specific, entry)
+        self._where[rule["id"]] = (department, level)
+        if department is None:
+            self._levels_cache.clear()
+        else:
+            self._levels_cache.pop(department, None)
+
+    def add_rule(self, rule: Dict[str, Any]) -> None:
+        """
+        Index a newly created rule. A no-op until the index is first loaded.
+        """
+        if not rule.get("is_active", 1):
+            return
+        with self._lock:
+            if self._loaded:
+                self._insert(rule)
+
+    def remove_rule(self, rule_id: int) -> None:
+        """
+        Drop a deactivated rule from the index.
+        """
+        with self._lock:
+            location = self._where.pop(rule_id, None)
+            if location is None:
+                return
+            department, level = location
+            rules = self._index[department][level]
+            rules.thresholds = [t for t in rules.thresholds if t[1] != rule_id]
+            for name in ("unbounded", "percentage", "specific"):
+                setattr(rules, name, [e for e in getattr(rules, name) if e[0] != rule_id])
+            if rules.is_empty():
+                del self._index[department][level]
+            self._levels_cache.clear()
+
+    # ---------- lookup ----------
+
+    def _levels(self, department: Optional[str]) -> List[int]:
+        levels = self._levels_cache.get(department)
+        if levels is None:
+            levels = sorted(set(self._index.get(None, {})) | set(self._index.get(department, {})))
+            self._levels_cache[department] = levels
+        return levels
+
+    def resolve_workflow(self, expense: Mapping[str, Any]) -> List[WorkflowStep]:
+        """
+        Return the ordered approver chain for an expense.
+        Reads expense["amount"] and the department from "department" or "employee_department".
+        Levels with no routing rule for this amount are skipped.
+        """
+        self._ensure_loaded()
+        amount = float(expense["amount"])
+        department = expense.get("department") or expense.get("employee_department")
+        company = self._index.get(None, {})
+        own = self._index.get(department, {}) if department is not None else {}
+
+        steps = []
+        for level in self._levels(department):
+            scoped = [rules for rules in (own.get(level), company.get(level)) if rules is not None]
+            rule = next((r for r in (s.route(amount) for s in scoped) if r is not None), None)
+            if rule is None:
+                continue
+            percentage = next((s.percentage[0][1] for s in scoped if s.percentage), None)
+            specific = next((s.specific[0][1] for s in scoped if s.specific), None)
+            steps.append(WorkflowStep(
+                level=level,
+                rule_id=rule["id"],
+                rule_name=rule["rule_name"],
+                approver_role=rule.get("approver_role"),
+                approver_id=rule.get("approver_id"),
+                required_percentage=percentage["condition_value"] if percentage else None,
+                override_approver_id=specific["approver_id"] if specific else None,
+            ))
+        return steps
+
+    def invalidate(self) -> None:
+        """
+        Force a full reload on next use (e.g. after rules were edited outside the models).
+        """
+        with self._lock:
+            self._loaded = False
+
+
+rule_engine = RuleEngine()
+
+
+def resolve_workflow(expense: Mapping[str, Any]) -> List[WorkflowStep]:
+    """
+    Resolve an expense's approver chain with the shared rule index.
+    """
+    return rule_engine.resolve_workflow(expense)
@@ -0,0 +1,127 @@
+"""
+Full-text search over expense descriptions and categories.
+
+expenses_fts (migration 10) is an external-content FTS5 index: triggers on expenses
+keep it in step with every insert, update and delete in the same transaction, and
+the text itself stays in expenses. A search is an index lookup per term, ranked by
+bm25, instead of a LIKE '%...%' scan over the whole table.
+
+User input is never passed to MATCH as FTS5 syntax: it is split into words, each
+word is quoted, and the words are ANDed, so "uber airport" finds expenses containing
+both. A trailing * on a word makes it a prefix match ("air*"); with prefix=True the
+last word is a prefix match as well, for search-as-you-type.
+
+Usage (from backend/):
+    python -m app.services.search              # rebuild the index from expenses (backfill)
+    python -m app.services.search --check      # verify the index against expenses
+    python -m app.services.search --optimize   # merge index segments after large imports
+"""
+
+import re
+import sqlite3
+import sys
+from typing import Any, List, Optional
+
+from ..database import get_db_connection
+
+MAX_TERMS = 16
+BROAD_MATCHES = 5000   # queries matching more rows than this are "broad" (see is_broad)
+RANK_WINDOW = 10000    # broad queries are ranked over this many of their newest matches
+
+_WORD = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+
+def fts_query(text: str, prefix: bool = False) -> str:
+    """
+    Turn free text into a safe FTS5 query: quoted words, ANDed, with prefix stars
+    where the user typed one (and on the last word if prefix). Returns "" when the
+    text holds no words. Raises ValueError for more than MAX_TERMS words.
+    """
+    words = _WORD.findall(text or "")
+    if len(words) > MAX_TERMS:
+        raise ValueError(f"At most {MAX_TERMS} search terms")
+    terms = []
+    for i, (word, star) in enumerate(words):
+        is_prefix = bool(star) or (prefix and i == len(words) - 1)
+        terms.append('"' + word.replace('"', '""') + '"' + ("*" if is_prefix else ""))
+    return " ".join(terms)
+
+
+def is_broad(conn: sqlite3.Connection, match: str, threshold: int = BROAD_MATCHES) -> bool:
+    """
+    Whether an FTS5 query matches more than `threshold` expenses. Counting stops at the
+    threshold, so this costs at most one short walk of the term doclists.
+    """
+    return conn.execute(
+        "SELECT COUNT(*) FROM (SELECT 1 FROM expenses_fts WHERE expenses_fts MATCH ? LIMIT ?)",
+        (match, threshold + 1),
+    ).fetchone()[0] > threshold
+
+
+def window_floor(conn: sqlite3.Connection, clauses: List[str], params: List[Any],
+                 window: int = RANK_WINDOW) -> Optional[int]:
+    """
+    Lowest expense id among the `window` newest rows matching the search clauses (a
+    MATCH on expenses_fts s plus expense listing filters on e and u), or None if fewer
+    match. The index is walked newest id first and stops at the window, so ranking
+    "s.rowid >= floor" scores at most `window` rows however common the words are.
+    """
+    row = conn.execute(f"""
+        SELECT s.rowid FROM expenses_fts s
+        JOIN expenses e ON e.id = s.rowid
+        JOIN users u ON e.employee_id = u.id
+        WHERE {' AND '.join(clauses)}
+        ORDER BY s.rowid DESC
+        LIMIT 1 OFFSET ?
+    """, [*params, window - 1]).fetchone()
+    return row[0] if row else None
+
+
+# ==================== MAINTENANCE ====================
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    """
+    Re-index every expense, e.g. for a database whose index was dropped or written
+    to with the triggers disabled.
+    """
+    conn.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('rebuild')")
+
+
+def check(conn: sqlite3.Connection) -> List[str]:
+    """
+    Verify the index and that it matches the expenses table.
+    Returns the problems found; an empty list means consistent.
+    """
+    try:
+        conn.execute("INSERT INTO expenses_fts (expenses_fts, rank) VALUES ('integrity-check', 1)")
+    except sqlite3.DatabaseError as e:
+        return [str(e)]
+    return []
+
+
+def optimize(conn: sqlite3.Connection) -> None:
+    """
+    Merge the index's b-trees into one, which speeds up queries after bulk inserts.
+    """
+    conn.execute("INSERT INTO expenses_fts (expenses_fts) VALUES ('optimize')")
+
+
+if __name__ == "__main__":
+    with get_db_connection() as conn:
+        if "--check" in sys.argv[1:]:
+            problems = check(conn)
+            for problem in problems:
+                print(f"✗ {problem}")
+            if problems:
+                raise SystemExit(1)
+            print("✓ Search index matches the expenses table")
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            if "--optimize" in sys.argv[1:]:
+                optimize(conn)
+            else:
+                rebuild(conn)
+            conn.commit()
+            count = conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
+            print(f"✓ Search index {'optimized' if '--optimize' in sys.argv[1:] else 'rebuilt'} "
+                  f"over {count:,} expenses")
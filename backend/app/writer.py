@@ -0,0 +1,216 @@
+"""
+Group commit for the hot write paths (expense submission, approval decisions).
+
+SQLite has one writer at a time and every commit syncs the WAL, so handlers that each
+open their own write transaction queue up on the database lock, and under a spike
+some of them run out of busy_timeout ("database is locked"). Instead, handlers hand
+their mutation to a single writer thread, which runs whatever is queued in one
+transaction, each job inside its own SAVEPOINT, and commits once:
+  - a job that raises is rolled back to its savepoint and its caller gets the
+    exception; the other jobs in the batch still commit;
+  - a batch closes at WRITER_MAX_BATCH jobs, or WRITER_MAX_DELAY_MS after its first
+    job arrived (0: take only what is already queued);
+  - callers get their job's return value (e.g. the new rowid) once the batch commits.
+Jobs are functions taking the connection first; they must not commit or begin
+transactions themselves. A job may call writer.run again; it then runs inline, as
+part of the same savepoint.
+"""
+
+import asyncio
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from . import config
+from .cache import table_versions
+from .database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class WriterBusy(RuntimeError):
+    """
+    Raised when more writes are queued than WRITER_MAX_QUEUE allows.
+    """
+
+
+@dataclass
+class _Job:
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: Dict[str, Any]
+    tables: Tuple[str, ...]
+    future: Future = field(default_factory=Future)
+    queued_at: float = field(default_factory=time.perf_counter)
+
+
+class GroupCommitWriter:
+    """
+    Single writer thread that commits queued jobs in batches.
+    The thread starts on the first submit; shutdown() drains the queue and stops it.
+    """
+
+    def __init__(self, max_batch: int = config.WRITER_MAX_BATCH,
+                 max_delay: float = config.WRITER_MAX_DELAY_MS / 1000,
+                 max_queue: int = config.WRITER_MAX_QUEUE):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._local = threading.local()
+
+        # Stats
+        self._jobs = 0
+        self._failed = 0
+        self._batches = 0
+        self._largest_batch = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._commit_total = 0.0
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, fn: Callable[..., Any], *args, tables: Sequence[str] = (), **kwargs) -> Future:
+        """
+        Queue fn(conn, *args, **kwargs). `tables` are bumped in table_versions after the
+        batch commits. Returns a Future for fn's result. Raises WriterBusy when full.
+        """
+        if self._queue.qsize() >= self.max_queue:
+            with self._lock:
+                self._rejected += 1
+            raise WriterBusy(f"{self._queue.qsize()} writes already queued")
+        job = _Job(fn, args, kwargs, tuple(tables))
+        self._ensure_started()
+        self._queue.put(job)
+        return job.future
+
+    def run(self, fn: Callable[..., Any], *args, tables: Sequence[str] = (), **kwargs) -> Any:
+        """
+        Submit a job and wait for its result (or exception).
+        """
+        if getattr(self._local, "in_writer", False):
+            # Nested call from a job: join the transaction already open on this thread.
+            with get_db_connection() as conn:
+                return fn(conn, *args, **kwargs)
+        return self.submit(fn, *args, tables=tables, **kwargs).result()
+
+    async def run_async(self, fn: Callable[..., Any], *args, tables: Sequence[str] = (), **kwargs) -> Any:
+        """
+        run() for async handlers: awaits the result without blocking the event loop.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, tables=tables, **kwargs))
+
+    # ---------- writer thread ----------
+
+    def _next_batch(self) -> Tuple[list, bool]:
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.perf_counter()
+                job = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _run(self) -> None:
+        self._local.in_writer = True
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if batch:
+                try:
+                    self._commit(batch)
+                except BaseException as e:  # never leave a caller waiting
+                    logger.exception("Group commit of %d writes failed", len(batch))
+                    for job in batch:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+
+    def _commit(self, batch: list) -> None:
+        started = time.perf_counter()
+        outcomes = []
+        with get_db_connection() as conn:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.Error as e:
+                for job in batch:
+                    job.future.set_exception(e)
+                return
+            for job in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((True, job.fn(conn, *job.args, **job.kwargs)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    outcomes.append((False, e))
+                conn.execute("RELEASE job")
+            try:
+                conn.commit()
+            except sqlite3.Error as e:
+                conn.rollback()
+                outcomes = [(False, e)] * len(batch)
+
+        tables = {table for job, (ok, _) in zip(batch, outcomes) if ok for table in job.tables}
+        if tables:
+            table_versions.bump(*sorted(tables))
+        finished = time.perf_counter()
+        with self._lock:
+            self._batches += 1
+            self._jobs += len(batch)
+            self._failed += sum(1 for ok, _ in outcomes if not ok)
+            self._largest_batch = max(self._largest_batch, len(batch))
+            self._wait_total += sum(started - job.queued_at for job in batch)
+            self._commit_total += finished - started
+        for job, (ok, value) in zip(batch, outcomes):
+            if ok:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_batch": self.max_batch,
+                "max_delay_ms": self.max_delay * 1000,
+                "queued": self._queue.qsize(),
+                "jobs": self._jobs,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "batches": self._batches,
+                "avg_batch": round(self._jobs / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "queue_wait_avg_ms": round(self._wait_total * 1000 / self._jobs, 3) if self._jobs else 0.0,
+                "commit_avg_ms": round(self._commit_total * 1000 / self._batches, 3) if self._batches else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """
+        Commit everything already queued, then stop the writer thread.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+writer = GroupCommitWriter()
@@ -0,0 +1,169 @@
+"""
+Spend analytics benchmark: vectorized reports over a columnar snapshot (default 10M
+synthetic rows) versus aggregating dict rows in Python, plus loading and incrementally
+refreshing the snapshot from SQLite.
+
+Usage (from backend/):
+    python -m benchmarks.bench_analytics [--rows 10000000] [--baseline-rows 500000] [--db-rows 1000000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+DEPARTMENTS = ["Engineering", "Sales", "Marketing", "Finance", "Operations", "Support", "Legal", "HR", None]
+CATEGORIES = ["Travel", "Meals", "Lodging", "Software", "Hardware", "Training", "General"]
+STATUSES = ["Pending", "In Review", "Approved", "Rejected"]
+START_DAY = np.datetime64("2019-01-01")
+YEARS = 5
+
+
+def make_snapshot(rows: int, employees: int, seed: int = 3):
+    """
+    A ColumnarSnapshot filled directly with synthetic columns (all in USD).
+    """
+    from app.services.analytics import ColumnarSnapshot
+
+    rng = np.random.default_rng(seed)
+    snapshot = ColumnarSnapshot()
+    snapshot.id = np.arange(1, rows + 1, dtype=np.int64)
+    snapshot.employee_id = rng.integers(1, employees + 1, rows)
+    snapshot.amount = np.round(rng.lognormal(4, 1, rows), 2)
+    snapshot.currency = snapshot.currencies.encode(["USD"]).repeat(rows)
+    snapshot.category = rng.integers(0, len(CATEGORIES), rows).astype(np.int32)
+    snapshot.categories.encode(CATEGORIES)
+    snapshot.status = rng.choice(4, rows, p=[0.2, 0.05, 0.7, 0.05]).astype(np.int32)
+    snapshot.statuses.encode(STATUSES)
+    snapshot.day = START_DAY + rng.integers(0, 365 * YEARS, rows)
+    snapshot.departments.encode(DEPARTMENTS)
+    snapshot.employee_department = rng.integers(0, len(DEPARTMENTS), employees + 1).astype(np.int32)
+    return snapshot
+
+
+def dict_rows(snapshot, count: int) -> list:
+    """
+    The first `count` rows as the dicts dict_from_row would produce.
+    """
+    departments = snapshot.department()
+    return [{
+        "id": int(snapshot.id[i]), "employee_id": int(snapshot.employee_id[i]),
+        "amount": float(snapshot.amount[i]), "currency": "USD",
+        "category": CATEGORIES[snapshot.category[i]], "status": STATUSES[snapshot.status[i]],
+        "expense_date": str(snapshot.day[i]), "department": DEPARTMENTS[departments[i]],
+    } for i in range(count)]
+
+
+def python_reports(rows: list) -> None:
+    """
+    Department percentiles, monthly totals and category medians the row-by-row way.
+    """
+    by_department, by_month, by_category = defaultdict(list), defaultdict(float), defaultdict(list)
+    for row in rows:
+        if row["status"] == "Rejected":
+            continue
+        by_department[row["department"]].append(row["amount"])
+        by_month[row["expense_date"][:7]] += row["amount"]
+        by_category[row["category"]].append(row["amount"])
+    for amounts in by_department.values():
+        amounts.sort()
+        [amounts[int(q * (len(amounts) - 1))] for q in (0.5, 0.9, 0.99)]
+    medians = {}
+    for category, amounts in by_category.items():
+        amounts.sort()
+        medians[category] = amounts[len(amounts) // 2]
+    [amount for category, amounts in by_category.items() for amount in amounts if amount > 10 * medians[category]]
+
+
+def timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def bench_reports(args) -> None:
+    from app.services.analytics import department_report, outlier_report, trend_report
+
+    start = time.perf_counter()
+    snapshot = make_snapshot(args.rows, args.employees)
+    print(f"generate {args.rows:,} rows: {time.perf_counter() - start:.1f} s, "
+          f"{sum(getattr(snapshot, n).nbytes for n in ('id', 'employee_id', 'amount', 'currency', 'category', 'status', 'day')) / 2**20:,.0f} MiB")
+
+    reports = [("departments", department_report, {}), ("trends", trend_report, {}),
+               ("outliers", outlier_report, {"by": "category"})]
+    vectorized = 0.0
+    for name, report, kwargs in reports:
+        elapsed = timed(report, snapshot, "USD", **kwargs)
+        vectorized += elapsed
+        print(f"{name:<12} {elapsed * 1000:>8,.0f} ms  ({args.rows / elapsed:>12,.0f} rows/s)")
+
+    rows = dict_rows(snapshot, args.baseline_rows)
+    baseline = timed(python_reports, rows) / args.baseline_rows
+    print(f"dict rows, all three (on {args.baseline_rows:,}): {1 / baseline:>12,.0f} rows/s")
+    print(f"vectorized, all three:          {args.rows / vectorized:>12,.0f} rows/s  "
+          f"({baseline * args.rows / vectorized:.0f}x)")
+    return vectorized, baseline
+
+
+def bench_sqlite(args) -> None:
+    from app import database
+    from app.migrations import migrate
+    from app.models import dict_from_row
+    from app.services.analytics import ColumnarSnapshot
+
+    snapshot = make_snapshot(args.db_rows, args.employees, seed=4)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure(os.path.join(tmp, "bench.db"))
+        migrate()
+        with database.get_db_connection() as conn:
+            conn.executemany("""
+                INSERT INTO users (id, email, hashed_password, full_name, role, department)
+                VALUES (?, ?, 'x', 'Bench', 'Employee', ?)
+            """, [(i, f"u{i}@bench", DEPARTMENTS[snapshot.employee_department[i]])
+                  for i in range(1, args.employees + 1)])
+            conn.executemany("""
+                INSERT INTO expenses (id, employee_id, amount, currency, category, status, expense_date,
+                                      updated_at)
+                VALUES (?, ?, ?, 'USD', ?, ?, ?, ? || ' 12:00:00')
+            """, zip(snapshot.id.tolist(), snapshot.employee_id.tolist(), snapshot.amount.tolist(),
+                     [CATEGORIES[c] for c in snapshot.category], [STATUSES[s] for s in snapshot.status],
+                     snapshot.day.astype(str).tolist(), snapshot.day.astype(str).tolist()))
+            conn.commit()
+
+            loaded = ColumnarSnapshot()
+            load = timed(loaded.refresh, conn)
+            dicts = timed(lambda: [dict_from_row(row) for row in conn.execute("SELECT * FROM expenses")])
+            changed = np.random.default_rng(5).choice(snapshot.id, args.updates, replace=False).tolist()
+            conn.executemany("UPDATE expenses SET amount = amount + 1, updated_at = CURRENT_TIMESTAMP "
+                             "WHERE id = ?", [(i,) for i in changed])
+            conn.commit()
+            refresh = timed(loaded.refresh, conn)
+        database.close_pool()
+    print(f"SQLite {args.db_rows:,} rows -> dict rows:       {dicts:>6.2f} s")
+    print(f"SQLite {args.db_rows:,} rows -> columnar load:   {load:>6.2f} s")
+    print(f"refresh after {args.updates:,} updates:           {refresh * 1000:>6.0f} ms")
+    return dicts / args.db_rows, refresh
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--baseline-rows", type=int, default=500_000)
+    parser.add_argument("--db-rows", type=int, default=1_000_000)
+    parser.add_argument("--employees", type=int, default=20_000)
+    parser.add_argument("--updates", type=int, default=1_000)
+    args = parser.parse_args()
+    vectorized, per_row_reports = bench_reports(args)
+    per_row_fetch, refresh = bench_sqlite(args)
+    # What a report request costs at --rows: re-reading dict rows every time versus
+    # refreshing the resident snapshot (fetch cost extrapolated from --db-rows).
+    dict_path = args.rows * (per_row_fetch + per_row_reports)
+    print(f"per report request at {args.rows:,} rows: dict rows {dict_path:,.1f} s, "
+          f"snapshot {refresh + vectorized:,.1f} s ({dict_path / (refresh + vectorized):.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
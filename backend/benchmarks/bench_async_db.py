@@ -0,0 +1,85 @@
+"""
+Concurrency benchmark for the async database path.
+
+Runs one slow query alongside a stream of fast "unrelated requests" on the same
+event loop, first with the query executed inline (what the old async routes did)
+and then through app.async_models. Reports how long the fast requests were stalled.
+
+Usage (from backend/):
+    python -m benchmarks.bench_async_db [--slow-rows 3000000] [--fast 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+SLOW_QUERY = """
+    WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < ?)
+    SELECT COUNT(*) FROM c
+"""
+
+
+def slow_query(rows: int) -> int:
+    from app.database import get_db_connection
+    with get_db_connection() as conn:
+        return conn.execute(SLOW_QUERY, (rows,)).fetchone()[0]
+
+
+async def fast_requests(count: int, interval: float) -> list:
+    """
+    Simulate unrelated requests: each one should take ~0ms of loop time.
+    Returns the observed latency of every request in milliseconds.
+    """
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        latencies.append((time.perf_counter() - start - interval) * 1000)
+    return latencies
+
+
+async def scenario(mode: str, slow_rows: int, fast: int) -> dict:
+    from app.async_models import run_db
+
+    async def slow_inline():
+        return slow_query(slow_rows)
+
+    async def slow_async():
+        return await run_db(slow_query, slow_rows)
+
+    slow = slow_inline if mode == "inline" else slow_async
+    start = time.perf_counter()
+    fast_task = asyncio.create_task(fast_requests(fast, 0.001))
+    await asyncio.sleep(0)
+    await slow()
+    slow_done = time.perf_counter() - start
+    latencies = await fast_task
+    return {
+        "mode": mode,
+        "slow_query_s": round(slow_done, 3),
+        "fast_p50_ms": round(statistics.median(latencies), 3),
+        "fast_max_ms": round(max(latencies), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--slow-rows", type=int, default=3_000_000)
+    parser.add_argument("--fast", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from app import database
+        database.configure(os.path.join(tmp, "bench.db"))
+        for mode in ("inline", "async"):
+            result = asyncio.run(scenario(mode, args.slow_rows, args.fast))
+            print(f"{result['mode']:>7}: slow query {result['slow_query_s']:.3f}s | "
+                  f"fast requests p50 {result['fast_p50_ms']:.3f}ms, max {result['fast_max_ms']:.3f}ms")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
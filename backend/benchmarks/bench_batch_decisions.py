@@ -0,0 +1,61 @@
+"""
+Batch decision benchmark: one PUT /approvals/{id}/approve per expense versus
+POST /approvals/batch, both driven in-process through the FastAPI app.
+
+Usage (from backend/):
+    python -m benchmarks.bench_batch_decisions [--expenses 20000] [--per-id-sample 1000]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from .bench_bulk_insert import make_items, rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--expenses", type=int, default=20_000)
+    parser.add_argument("--per-id-sample", type=int, default=1_000,
+                        help="expenses approved one PUT at a time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+        from fastapi.testclient import TestClient
+        from app import database
+        from app.main import app
+        from app.models import UserModel
+        from app.services.approval_workflow import MAX_BATCH_DECISIONS
+        from app.services.expense_import import import_items
+
+        with TestClient(app) as client:
+            manager = UserModel.create_user("boss@example.com", "x", "Boss", "Manager")
+            reports = [UserModel.create_user(f"bench{i}@example.com", "x", f"Bench {i}", "Employee",
+                                             manager_id=manager)
+                       for i in range(50)]
+            ids = [r["id"] for r in import_items(make_items(args.expenses + args.per_id_sample, reports))]
+            sample, rest = ids[:args.per_id_sample], ids[args.per_id_sample:]
+
+            start = time.perf_counter()
+            for expense_id in sample:
+                client.put(f"/approvals/{expense_id}/approve", json={"approver_id": manager}).raise_for_status()
+            per_id = (time.perf_counter() - start) / len(sample)
+
+            start = time.perf_counter()
+            for offset in range(0, len(rest), MAX_BATCH_DECISIONS):
+                response = client.post("/approvals/batch", json={
+                    "decision": "approve", "approver_id": manager,
+                    "expense_ids": rest[offset:offset + MAX_BATCH_DECISIONS],
+                })
+                assert response.json()["applied"] == len(rest[offset:offset + MAX_BATCH_DECISIONS])
+            batch = time.perf_counter() - start
+
+        print(f"per-id PUTs:   {rate(1, per_id)}")
+        print(f"batch POSTs:   {rate(len(rest), batch)}  ({per_id * len(rest) / batch:.1f}x)")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Bulk submission benchmark: one POST /api/expenses/ per row versus POST /api/expenses/batch,
+both driven in-process through the FastAPI app, plus the model-level numbers without HTTP.
+
+Usage (from backend/):
+    python -m benchmarks.bench_bulk_insert [--rows 20000] [--per-row-sample 2000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+
+def make_items(count: int, employee_ids: list) -> list:
+    rng = random.Random(42)
+    return [
+        {
+            "employee_id": rng.choice(employee_ids),
+            "amount": round(rng.uniform(5, 500), 2),
+            "description": f"Card transaction {i}",
+            "category": rng.choice(["Travel", "Meals", "Office", "Software"]),
+            "currency": "USD",
+            "expense_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        }
+        for i in range(count)
+    ]
+
+
+def rate(rows: int, seconds: float) -> str:
+    return f"{rows / seconds:>10,.0f} rows/s"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--per-row-sample", type=int, default=2_000,
+                        help="rows submitted one POST at a time (the slow path is extrapolated)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+        from fastapi.testclient import TestClient
+        from app import database
+        from app.main import app
+        from app.models import ExpenseModel, UserModel
+        from app.schemas import ExpenseCreate
+        from app.services.expense_import import MAX_BATCH_SIZE, import_items
+
+        with TestClient(app) as client:
+            employee_ids = [UserModel.create_user(f"bench{i}@example.com", "x", f"Bench {i}", "Employee")
+                            for i in range(50)]
+            items = make_items(args.rows, employee_ids)
+            sample = items[:args.per_row_sample]
+
+            start = time.perf_counter()
+            for item in sample:
+                client.post("/api/expenses/", json=item).raise_for_status()
+            http_row = (time.perf_counter() - start) / len(sample)
+
+            start = time.perf_counter()
+            for offset in range(0, len(items), MAX_BATCH_SIZE):
+                response = client.post("/api/expenses/batch", json=items[offset:offset + MAX_BATCH_SIZE])
+                assert response.json()["failed"] == 0
+            http_bulk = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for item in sample:
+                expense = ExpenseCreate.model_validate(item)
+                ExpenseModel.create_expense(expense.employee_id, expense.amount, expense.currency,
+                                            expense.category, expense.description, str(expense.expense_date))
+            model_row = (time.perf_counter() - start) / len(sample)
+
+            start = time.perf_counter()
+            assert all("id" in r for r in import_items(items))
+            model_bulk = time.perf_counter() - start
+
+        print(f"HTTP  per-row POSTs: {rate(1, http_row)}")
+        print(f"HTTP  batch POSTs:   {rate(args.rows, http_bulk)}  ({http_row * args.rows / http_bulk:.1f}x)")
+        print(f"model per-row:       {rate(1, model_row)}")
+        print(f"model bulk:          {rate(args.rows, model_bulk)}  ({model_row * args.rows / model_bulk:.1f}x)")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
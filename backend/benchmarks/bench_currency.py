@@ -0,0 +1,72 @@
+"""
+Currency conversion benchmark: RateService.convert_many over a whole result set versus
+converting row by row with RateService.convert, against a year of daily snapshots.
+
+Usage (from backend/):
+    python -m benchmarks.bench_currency [--rows 1000000] [--currencies 40] [--days 365]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+
+class SyntheticProvider:
+    def __init__(self, snapshots):
+        self.snapshots = snapshots
+
+    def fetch(self, base):
+        return self.snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--currencies", type=int, default=40)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-row-sample", type=int, default=20_000)
+    args = parser.parse_args()
+    rng = random.Random(5)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from app import database
+        from app.migrations import migrate
+        from app.services.currency import RateService
+
+        database.configure(os.path.join(tmp, "bench.db"))
+        migrate()
+        codes = ["USD"] + [f"C{i:02d}" for i in range(args.currencies - 1)]
+        start_day = date(2024, 1, 1)
+        days = [(start_day + timedelta(days=i)).isoformat() for i in range(args.days)]
+        snapshots = [(day, {code: rng.uniform(0.5, 150) for code in codes}) for day in days]
+        service = RateService(SyntheticProvider(snapshots), base="USD")
+
+        start = time.perf_counter()
+        service.table()
+        load = time.perf_counter() - start
+
+        amounts = [round(rng.uniform(1, 1000), 2) for _ in range(args.rows)]
+        currencies = [rng.choice(codes) for _ in range(args.rows)]
+        expense_days = [rng.choice(days) for _ in range(args.rows)]
+
+        start = time.perf_counter()
+        converted = service.convert_many(amounts, currencies, expense_days)
+        batch = time.perf_counter() - start
+
+        n = args.per_row_sample
+        start = time.perf_counter()
+        for i in range(n):
+            assert abs(service.convert(amounts[i], currencies[i], expense_days[i]) - converted[i]) < 1e-6
+        per_row = (time.perf_counter() - start) / n
+
+        print(f"load {len(snapshots)} snapshots x {len(codes)} currencies: {load * 1000:.0f} ms (once per TTL)")
+        print(f"convert (per row):      {1 / per_row:>12,.0f} rows/s")
+        print(f"convert_many (batch):   {args.rows / batch:>12,.0f} rows/s  ({per_row * args.rows / batch:.0f}x)")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
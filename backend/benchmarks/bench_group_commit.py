@@ -0,0 +1,145 @@
+"""
+Write-path benchmark: expense submissions (insert + workflow) and approval decisions
+from concurrent threads, each committing its own transaction (the previous path)
+versus handing them to the group-commit writer. Reports throughput, latency
+percentiles and "database is locked" errors per concurrency level.
+
+Usage (from backend/):
+    python -m benchmarks.bench_group_commit [--threads 1 8 32] [--ops 300] [--synchronous NORMAL]
+"""
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, List
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def per_request(fn: Callable, *args):
+    """
+    The previous path: the handler's own write transaction and commit.
+    """
+    from app.database import get_db_connection
+
+    with get_db_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        result = fn(conn, *args)
+        conn.commit()
+        return result
+
+
+def drive(threads: int, ops: int, write: Callable, employees: List[int], manager: int) -> dict:
+    """
+    Each thread alternates submitting an expense and approving the one it submitted.
+    """
+    from app.services.approval_workflow import _decide, _submit_expense
+    from app.services.duplicates import fingerprint
+
+    latencies: List[float] = []
+    errors = {"locked": 0, "other": 0}
+    lock = threading.Lock()
+
+    def worker(n: int):
+        local, local_errors = [], {"locked": 0, "other": 0}
+        for i in range(ops // 2):
+            fields = {"employee_id": employees[(n + i) % len(employees)], "amount": 10.0 + i,
+                      "currency": "USD", "category": "Travel", "description": "Taxi",
+                      "expense_date": "2024-03-01"}
+            for job, args in ((_submit_expense, (fields, fingerprint(fields))), (_decide, None)):
+                start = time.perf_counter()
+                try:
+                    if args is None:
+                        args = (expense_id, manager, True, None, None)
+                    result = write(job, *args)
+                    if job is _submit_expense:
+                        expense_id = result["id"]
+                except sqlite3.OperationalError as e:
+                    local_errors["locked" if "locked" in str(e) else "other"] += 1
+                    break
+                local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            for key, value in local_errors.items():
+                errors[key] += value
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return {
+        "ops_per_s": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        **errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--ops", type=int, default=300, help="writes per thread")
+    parser.add_argument("--synchronous", default="NORMAL", choices=["OFF", "NORMAL", "FULL"],
+                        help="PRAGMA synchronous for the run (FULL syncs the WAL on every commit)")
+    parser.add_argument("--max-batch", type=int, default=None)
+    parser.add_argument("--max-delay-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    from app import config, database
+    from app.migrations import migrate
+    from app.writer import GroupCommitWriter
+
+    # Every pooled connection uses the requested sync setting.
+    original = database._apply_pragmas
+
+    def apply_pragmas(conn):
+        original(conn)
+        conn.execute(f"PRAGMA synchronous = {args.synchronous}")
+    database._apply_pragmas = apply_pragmas
+
+    print(f"{'threads':>7} {'path':<14} {'ops/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'locked':>7} {'avg batch':>9}")
+    for threads in args.threads:
+        for name in ("per-request", "group commit"):
+            with tempfile.TemporaryDirectory() as tmp:
+                database.configure(os.path.join(tmp, "bench.db"), max_size=threads + 2)
+                migrate()
+                with database.get_db_connection() as conn:
+                    conn.execute("INSERT INTO users (id, email, hashed_password, full_name, role) "
+                                 "VALUES (1, 'm@bench', 'x', 'Manager', 'Manager')")
+                    conn.executemany("""
+                        INSERT INTO users (id, email, hashed_password, full_name, role, manager_id)
+                        VALUES (?, ?, 'x', 'Bench', 'Employee', 1)
+                    """, [(i, f"u{i}@bench") for i in range(2, 202)])
+                    conn.commit()
+                writer = None
+                if name == "per-request":
+                    write = per_request
+                else:
+                    writer = GroupCommitWriter(
+                        max_batch=args.max_batch or config.WRITER_MAX_BATCH,
+                        max_delay=(args.max_delay_ms if args.max_delay_ms is not None
+                                   else config.WRITER_MAX_DELAY_MS) / 1000)
+                    write = writer.run
+                result = drive(threads, args.ops, write, list(range(2, 202)), 1)
+                avg_batch = writer.stats()["avg_batch"] if writer else 1
+                if writer:
+                    writer.shutdown()
+                database.close_pool()
+            print(f"{threads:>7} {name:<14} {result['ops_per_s']:>9,.0f} {result['p50_ms']:>8.2f} "
+                  f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['locked']:>7} {avg_batch:>9}")
+    database._apply_pragmas = original
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Org hierarchy benchmark: closure-table lookups versus walking users.manager_id one
+query per level, on a synthetic org (default 50k employees, 12 levels deep).
+
+Usage (from backend/):
+    python -m benchmarks.bench_org_hierarchy [--employees 50000] [--depth 12] [--expenses 200000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+
+def make_org(employees: int, depth: int, rng: random.Random) -> list:
+    """
+    Return (id, manager_id) pairs; level sizes grow geometrically down to the leaves.
+    """
+    growth = employees ** (1 / (depth - 1))
+    users, previous, next_id = [], [None], 1
+    for level in range(depth):
+        size = max(1, round(growth ** level)) if level < depth - 1 else employees - len(users)
+        current = []
+        for _ in range(size):
+            users.append((next_id, rng.choice(previous)))
+            current.append(next_id)
+            next_id += 1
+        previous = current
+    return users
+
+
+def timed(fn, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - start) / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--employees", type=int, default=50_000)
+    parser.add_argument("--depth", type=int, default=12)
+    parser.add_argument("--expenses", type=int, default=200_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from app import database
+        from app.migrations import migrate
+        from app.models import ExpenseModel, UserModel
+        from app.services import org_hierarchy
+
+        database.configure(os.path.join(tmp, "bench.db"))
+        migrate()
+        users = make_org(args.employees, args.depth, rng)
+        with database.get_db_connection() as conn:
+            conn.executemany("""
+                INSERT INTO users (id, email, hashed_password, full_name, role, manager_id)
+                VALUES (?, 'u' || ? || '@example.com', 'x', 'User ' || ?, 'Employee', ?)
+            """, [(uid, uid, uid, manager) for uid, manager in users])
+            conn.executemany("""
+                INSERT INTO expenses (employee_id, amount, category, expense_date, submitted_at)
+                VALUES (?, 10, 'Travel', '2024-01-01', datetime('2024-01-01', '+' || ? || ' seconds'))
+            """, [(rng.randint(1, args.employees), i) for i in range(args.expenses)])
+            conn.commit()
+            conn.execute("BEGIN IMMEDIATE")
+            start = time.perf_counter()
+            assert org_hierarchy.rebuild(conn) == []
+            conn.commit()
+            build = time.perf_counter() - start
+            closure_rows = conn.execute("SELECT COUNT(*) FROM org_closure").fetchone()[0]
+
+        leaves = [uid for uid, _ in users[-args.employees // 2:]]
+        sample = rng.sample(leaves, args.lookups)
+        levels = args.depth - 1
+
+        def walk_chain(user_id):
+            for _ in range(levels):
+                user_id = UserModel.get_user_by_id(user_id)["manager_id"]
+            return user_id
+
+        walked = timed(walk_chain, sample)
+        indexed = timed(lambda uid: org_hierarchy.ancestor_at(uid, levels), sample)
+        assert all(walk_chain(uid) == org_hierarchy.ancestor_at(uid, levels) for uid in sample[:50])
+
+        managers = [uid for uid, _ in users[1:200]]
+        member = timed(lambda m: org_hierarchy.is_in_subtree(m, sample[0]), managers)
+
+        def subtree_by_walking(manager_id):
+            # The old way: breadth-first over manager_id, then an IN list.
+            ids, frontier = [], [manager_id]
+            with database.get_db_connection() as conn:
+                while frontier:
+                    placeholders = ", ".join("?" * len(frontier))
+                    frontier = [r[0] for r in conn.execute(
+                        f"SELECT id FROM users WHERE manager_id IN ({placeholders})", frontier)]
+                    ids.extend(frontier)
+                rows = []
+                for offset in range(0, len(ids), 500):
+                    chunk = ids[offset:offset + 500]
+                    rows.extend(conn.execute(
+                        f"SELECT id, submitted_at FROM expenses WHERE employee_id IN ({', '.join('?' * len(chunk))})",
+                        chunk).fetchall())
+            return sorted(rows, key=lambda r: (r[1], r[0]), reverse=True)[:50]
+
+        # Top-level managers (large orgs) and mid-level ones (small or empty orgs).
+        roots = managers[:10] + [uid for uid, _ in users[2_000:2_010]]
+        bfs = timed(subtree_by_walking, roots)
+        page = timed(lambda m: ExpenseModel.list_expenses(org_manager_id=m, limit=50), roots)
+        assert ([r[0] for r in subtree_by_walking(roots[0])] ==
+                [e["id"] for e in ExpenseModel.list_expenses(org_manager_id=roots[0], limit=50)["items"]])
+
+        print(f"org: {args.employees:,} employees, {args.depth} levels, {closure_rows:,} closure rows "
+              f"(rebuilt in {build:.2f} s)")
+        print(f"ancestor {levels} levels up, manager_id walk: {walked * 1e6:9.1f} µs")
+        print(f"ancestor {levels} levels up, closure table:   {indexed * 1e6:9.1f} µs  ({walked / indexed:.0f}x)")
+        print(f"subtree membership, closure table:      {member * 1e6:9.1f} µs")
+        print(f"first page of org expenses, BFS + IN:   {bfs * 1e3:9.2f} ms")
+        print(f"first page of org expenses, closure:    {page * 1e3:9.2f} ms  ({bfs / page:.0f}x)")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
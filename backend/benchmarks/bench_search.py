@@ -0,0 +1,132 @@
+"""
+Expense search benchmark: FTS5 queries (ranked, prefix, filtered, deep pages) versus
+the LIKE '%...%' scan they replace, on a synthetic table (default 5M rows), plus the
+time to backfill the index with `python -m app.services.search`.
+
+Usage (from backend/):
+    python -m benchmarks.bench_search [--rows 5000000] [--repeat 20] [--like-repeat 2]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+import numpy as np
+
+COMMON = ["taxi", "lunch", "dinner", "hotel", "airport", "parking", "flight", "train", "coffee",
+          "client", "team", "conference", "office", "supplies", "software", "license", "fuel"]
+VENDORS = ["uber", "lyft", "marriott", "hilton", "delta", "starbucks", "amazon", "staples",
+           "adobe"] + [f"vendor{i:04d}" for i in range(5000)]
+CATEGORIES = ["Travel", "Meals", "Lodging", "Software", "Office", "General"]
+STATUSES = ["Pending", "In Review", "Approved", "Rejected"]
+
+
+def make_rows(count: int, employees: int, seed: int = 11):
+    """
+    Descriptions of two or three common words plus a vendor name (Zipf-ish: a few
+    vendors are everywhere, most are rare).
+    """
+    rng = np.random.default_rng(seed)
+    vendor_weights = 1.0 / np.arange(1, len(VENDORS) + 1)
+    vendor_weights /= vendor_weights.sum()
+    vendors = rng.choice(np.array(VENDORS), count, p=vendor_weights)
+    words = rng.choice(np.array(COMMON), (count, 3))
+    lengths = rng.integers(2, 4, count)
+    days = (np.datetime64("2020-01-01") + rng.integers(0, 4 * 365, count)).astype(str)
+    for i in range(count):
+        yield (int(rng.integers(1, employees + 1)) if i % 1000 == 0 else (i % employees) + 1,
+               " ".join(words[i, :lengths[i]]) + " " + vendors[i],
+               CATEGORIES[i % len(CATEGORIES)], STATUSES[i % 7 % 4], days[i])
+
+
+def timings(repeat: int, fn: Callable) -> List[float]:
+    result = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        result.append(time.perf_counter() - start)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--employees", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--like-repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    from app import database
+    from app.migrations import migrate
+    from app.models import ExpenseModel
+    from app.services import search
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.configure(os.path.join(tmp, "bench.db"))
+        migrate()
+        with database.get_db_connection() as conn:
+            conn.executemany("INSERT INTO users (id, email, hashed_password, full_name, role, department) "
+                             "VALUES (?, ?, 'x', 'Bench', 'Employee', 'Sales')",
+                             [(i, f"u{i}@bench") for i in range(1, args.employees + 1)])
+            # Load without the index trigger, then time the backfill on its own.
+            trigger = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'trg_expenses_fts_insert'").fetchone()[0]
+            conn.execute("DROP TRIGGER trg_expenses_fts_insert")
+            start = time.perf_counter()
+            conn.executemany("""
+                INSERT INTO expenses (employee_id, amount, description, category, status, expense_date)
+                VALUES (?, 25.0, ?, ?, ?, ?)
+            """, make_rows(args.rows, args.employees))
+            conn.execute(trigger)
+            conn.commit()
+            print(f"load {args.rows:,} rows: {time.perf_counter() - start:.0f} s")
+
+            start = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            search.rebuild(conn)
+            conn.commit()
+            print(f"backfill (rebuild) index: {time.perf_counter() - start:.0f} s")
+            start = time.perf_counter()
+            search.optimize(conn)
+            conn.commit()
+            print(f"optimize index: {time.perf_counter() - start:.0f} s")
+
+        cases = [
+            ("rare vendor", {"q": "vendor4321", "prefix": False}),
+            ("two terms", {"q": "uber airport", "prefix": False}),
+            ("prefix (type-ahead)", {"q": "marr"}),
+            ("common term", {"q": "taxi", "prefix": False}),
+            ("common term, newest", {"q": "taxi", "prefix": False, "sort": "newest"}),
+            ("term + employee", {"q": "hotel", "prefix": False, "employee_id": 4242}),
+            ("term + status + dates", {"q": "delta flight", "prefix": False, "status": "Pending",
+                                       "date_from": "2021-01-01", "date_to": "2021-03-31"}),
+            ("newest first", {"q": "lyft", "prefix": False, "sort": "newest"}),
+        ]
+        print(f"{'query':<24} {'hits/page':>9} {'p50 ms':>9} {'p95 ms':>9} {'LIKE ms':>10}")
+        with database.get_db_connection() as conn:
+            for name, params in cases:
+                page = ExpenseModel.search_expenses(**params)
+                times = timings(args.repeat, lambda: ExpenseModel.search_expenses(**params))
+                words = params["q"].split()
+                like = " AND ".join(["(description LIKE ? OR category LIKE ?)"] * len(words))
+                like_params = [f"%{w}%" for w in words for _ in range(2)]
+                like_times = timings(args.like_repeat, lambda: conn.execute(
+                    f"SELECT * FROM expenses WHERE {like} ORDER BY submitted_at DESC, id DESC LIMIT 51",
+                    like_params).fetchall())
+                print(f"{name:<24} {len(page['items']):>9} {np.percentile(times, 50) * 1000:>9.2f} "
+                      f"{np.percentile(times, 95) * 1000:>9.2f} {min(like_times) * 1000:>10,.0f}")
+
+            # Keyset paging stays flat with depth: time page 20 of a common term.
+            params = {"q": "parking", "prefix": False, "sort": "newest", "limit": 50}
+            cursor = None
+            for _ in range(19):
+                cursor = ExpenseModel.search_expenses(**params, cursor=cursor)["next_cursor"]
+            deep = timings(args.repeat, lambda: ExpenseModel.search_expenses(**params, cursor=cursor))
+            print(f"{'common, newest, page 20':<24} {50:>9} {np.percentile(deep, 50) * 1000:>9.2f} "
+                  f"{np.percentile(deep, 95) * 1000:>9.2f}")
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
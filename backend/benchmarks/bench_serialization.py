@@ -0,0 +1,118 @@
+"""
+Listing serialization benchmark: rows straight from the cursor to JSON bytes
+(encode_rows / fetch_dicts + dumps) versus the previous path of sqlite3.Row ->
+dict_from_row -> response_model validation or jsonable_encoder -> json.dumps,
+at 1k and 100k rows.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization [--rows 1000 100000] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def starlette_dumps(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        from fastapi.encoders import jsonable_encoder
+        from pydantic import TypeAdapter
+
+        from app import database, responses
+        from app.migrations import migrate
+        from app.models import dict_from_row, fetch_dicts
+        from app.routes.users import USER_COLUMNS, User
+
+        database.configure(os.path.join(tmp, "bench.db"))
+        migrate()
+        users_adapter = TypeAdapter(List[User])
+        encoder = "orjson" if responses.orjson is not None else "json"
+        expense_sql = """
+            SELECT e.*, u.full_name as employee_name, u.email as employee_email,
+                   u.department as employee_department
+            FROM expenses e JOIN users u ON e.employee_id = u.id
+            ORDER BY e.id LIMIT ?
+        """
+
+        with database.get_db_connection() as conn:
+            most = max(args.rows)
+            conn.executemany("""
+                INSERT INTO users (id, email, hashed_password, full_name, role, manager_id, department)
+                VALUES (?, ?, 'x', ?, 'Employee', ?, 'Engineering')
+            """, [(i, f"user{i}@example.com", f"User {i}", i // 10 or None) for i in range(1, most + 1)])
+            conn.executemany("""
+                INSERT INTO expenses (employee_id, amount, category, description, expense_date)
+                VALUES (?, ?, 'Travel', 'Taxi from the airport to the client office', '2024-03-01')
+            """, [((i % most) + 1, 10.0 + i % 500) for i in range(most)])
+            conn.commit()
+
+            print(f"{'':<42}" + "".join(f"{n:>14,} rows" for n in args.rows))
+
+            def row(label, timings):
+                print(f"{label:<42}" + "".join(f"{t * 1000:>15,.1f} ms" for t in timings))
+
+            old, new, new_json = [], [], []
+            for n in args.rows:
+                # Previous GET /api/users/: dicts per row, then response_model validation + dump.
+                def users_old():
+                    rows = conn.execute("SELECT * FROM users WHERE is_active = 1 LIMIT ?", (n,)).fetchall()
+                    dicts = [dict_from_row(r) for r in rows]
+                    starlette_dumps(users_adapter.dump_python(users_adapter.validate_python(dicts), mode="json"))
+
+                def users_new():
+                    cursor = conn.cursor()
+                    cursor.row_factory = None
+                    cursor.execute(f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE is_active = 1 LIMIT ?", (n,))
+                    responses.encode_rows(cursor)
+
+                old.append(best_of(args.repeat, users_old))
+                new.append(best_of(args.repeat, users_new))
+                saved, responses.orjson = responses.orjson, None
+                new_json.append(best_of(args.repeat, users_new))
+                responses.orjson = saved
+            row("users: Row + response_model", old)
+            row(f"users: encode_rows ({encoder})", new)
+            row("users: encode_rows (stdlib json)", new_json)
+            print("  speedup: " + ", ".join(f"{o / n:.1f}x" for o, n in zip(old, new)))
+
+            old, new = [], []
+            for n in args.rows:
+                # Previous expense page: dicts per row, then jsonable_encoder + json.dumps.
+                def expenses_old():
+                    rows = conn.execute(expense_sql, (n,)).fetchall()
+                    starlette_dumps(jsonable_encoder({"items": [dict_from_row(r) for r in rows], "next_cursor": None}))
+
+                def expenses_new():
+                    responses.dumps({"items": fetch_dicts(conn, expense_sql, (n,)), "next_cursor": None})
+
+                old.append(best_of(args.repeat, expenses_old))
+                new.append(best_of(args.repeat, expenses_new))
+            row("expenses: Row + jsonable_encoder", old)
+            row(f"expenses: fetch_dicts + dumps ({encoder})", new)
+            print("  speedup: " + ", ".join(f"{o / n:.1f}x" for o, n in zip(old, new)))
+        database.close_pool()
+
+
+if __name__ == "__main__":
+    main()
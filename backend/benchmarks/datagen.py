@@ -0,0 +1,241 @@
+"""
+Synthetic data for load tests: an org of directors, team managers and employees, and
+years of expenses with their approval rows, bulk-loaded into a fresh database with
+the current schema (migrate(), as init_database runs it).
+
+  - Every department has a director (Manager, reporting to the admin) and teams of
+    TEAM_SIZE employees under a team manager who reports to the director.
+  - Expenses are spread evenly over --days up to today, so ids follow submitted_at.
+    Amounts are log-normal; anything over TWO_LEVEL_AMOUNT goes through two levels
+    (team manager, then director). Recent expenses are mostly still Pending or In
+    Review, older ones Approved or Rejected. approvals and approval_progress rows
+    match each expense's state.
+  - Every user's password is --password, so /api/auth/login can be driven too.
+Rows are inserted in chunks with the expense/approval indexes and triggers dropped
+and the journal off, then the indexes are recreated and the derived tables
+(org_closure, expense_totals, expenses_fts, expense_fingerprints) rebuilt with their
+maintenance functions.
+
+Usage (from backend/):
+    python -m benchmarks.datagen --db /tmp/load.db [--employees 10000] [--expenses 10000000]
+"""
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+DEPARTMENTS = ["Sales", "Engineering", "Marketing", "Finance", "Operations", "Support", "Legal", "HR"]
+TEAM_SIZE = 8
+TWO_LEVEL_AMOUNT = 500.0
+RECENT_DAYS = 30        # expenses younger than this are mostly undecided
+
+CURRENCIES = (["USD", "EUR", "GBP", "INR", "JPY"], [0.70, 0.12, 0.08, 0.07, 0.03])
+CATEGORIES = (["Travel", "Meals", "Lodging", "Software", "Office", "Training", "General"],
+              [0.25, 0.25, 0.15, 0.10, 0.10, 0.05, 0.10])
+WORDS = ["Taxi", "Lunch", "Dinner", "Hotel", "Airport", "Parking", "Flight", "Train", "Coffee",
+         "Client", "Team", "Conference", "Office", "Supplies", "Software", "License", "Fuel"]
+VENDORS = ["Uber", "Lyft", "Marriott", "Hilton", "Delta", "Starbucks", "Amazon", "Staples", "Adobe",
+           "United", "Hertz", "Shell", "Zoom", "Slack", "Expedia"]
+# (status, weight) for recent and older expenses
+RECENT_STATUSES = (["Pending", "In Review", "Approved", "Rejected"], [0.60, 0.10, 0.25, 0.05])
+OLD_STATUSES = (["Pending", "In Review", "Approved", "Rejected"], [0.005, 0.005, 0.88, 0.11])
+
+# Tables whose indexes and triggers are dropped during the load
+BULK_TABLES = ("expenses", "approvals", "approval_progress")
+
+
+def make_users(employees: int, password_hash: str) -> Tuple[List[tuple], Dict[str, np.ndarray]]:
+    """
+    User rows (admin, directors, team managers, employees) and, for the expense
+    generator, each employee's id, team manager and director.
+    """
+    rows = [(1, "admin@bench.example", password_hash, "Bench Admin", "Admin", None, "Executive")]
+    directors = {}
+    for dept in DEPARTMENTS:
+        directors[dept] = len(rows) + 1
+        rows.append((len(rows) + 1, f"director.{dept.lower()}@bench.example", password_hash,
+                     f"{dept} Director", "Manager", 1, dept))
+    employee_ids, manager_ids, director_ids = [], [], []
+    for n in range(employees):
+        dept = DEPARTMENTS[(n // TEAM_SIZE) % len(DEPARTMENTS)]
+        if n % TEAM_SIZE == 0:
+            manager = len(rows) + 1
+            rows.append((manager, f"manager{manager}@bench.example", password_hash,
+                         f"Manager {manager}", "Manager", directors[dept], dept))
+        user_id = len(rows) + 1
+        rows.append((user_id, f"user{user_id}@bench.example", password_hash,
+                     f"Employee {user_id}", "Employee", manager, dept))
+        employee_ids.append(user_id)
+        manager_ids.append(manager)
+        director_ids.append(directors[dept])
+    return rows, {"employee": np.array(employee_ids), "manager": np.array(manager_ids),
+                  "director": np.array(director_ids)}
+
+
+def _timestamps(seconds: np.ndarray, start: datetime) -> np.ndarray:
+    stamps = np.datetime64(start, "s") + seconds.astype("timedelta64[s]")
+    return np.char.replace(np.datetime_as_string(stamps), "T", " ").astype(object)
+
+
+def expense_chunks(count: int, staff: Dict[str, np.ndarray], days: int, end: date,
+                   chunk_size: int, seed: int) -> Iterator[Tuple[List[tuple], List[tuple], List[tuple]]]:
+    """
+    Yield (expenses, approvals, approval_progress) rows chunk by chunk, ids from 1.
+    """
+    rng = np.random.default_rng(seed)
+    start = datetime.combine(end - timedelta(days=days), datetime.min.time())
+    span = days * 86400
+    recent_from = span - RECENT_DAYS * 86400
+    approval_id = 0
+    for first in range(0, count, chunk_size):
+        n = min(chunk_size, count - first)
+        ids = np.arange(first + 1, first + n + 1)
+        # Evenly spread over the span, so ids are in submitted_at order
+        offsets = ((ids - 1 + rng.random(n)) * (span / count)).astype(np.int64)
+        who = rng.integers(0, len(staff["employee"]), n)
+        amount = np.round(np.clip(rng.lognormal(3.8, 1.1, n), 1, 25000), 2)
+        two_level = amount > TWO_LEVEL_AMOUNT
+        recent = offsets >= recent_from
+        status = np.where(recent, rng.choice(RECENT_STATUSES[0], n, p=RECENT_STATUSES[1]),
+                          rng.choice(OLD_STATUSES[0], n, p=OLD_STATUSES[1])).astype(object)
+        status[(status == "In Review") & ~two_level] = "Pending"
+        levels = np.where(two_level, 2, 1)
+        current = np.where(status == "In Review", 2, np.where(status == "Approved", levels, 1))
+        decisions = (np.isin(status, ["Approved", "Rejected"]).astype(int)
+                     + ((status == "Approved") & two_level) + (status == "In Review"))
+        submitted = _timestamps(offsets, start)
+        updated = _timestamps(offsets + decisions * rng.integers(3600, 3 * 86400, n), start)
+        expense_date = _timestamps(offsets - rng.integers(0, 20 * 86400, n), start)
+        words = rng.choice(WORDS, (n, 2))
+        vendors = rng.choice(VENDORS, n)
+        employee, manager, director = (staff[key][who].tolist() for key in ("employee", "manager", "director"))
+
+        expenses = list(zip(
+            ids.tolist(), employee, amount.tolist(),
+            rng.choice(CURRENCIES[0], n, p=CURRENCIES[1]).tolist(),
+            rng.choice(CATEGORIES[0], n, p=CATEGORIES[1]).tolist(),
+            [f"{a} {b} {v}" for (a, b), v in zip(words.tolist(), vendors.tolist())],
+            [d[:10] for d in expense_date], status.tolist(), submitted.tolist(), updated.tolist(),
+            current.tolist(), (decisions + 1).tolist(),
+        ))
+
+        approvals, progress = [], []
+        for i, (expense_id, st, lv) in enumerate(zip(ids.tolist(), status.tolist(), levels.tolist())):
+            # Level 1 (team manager): decided unless Pending; level 2 (director) is
+            # reached only after level 1 approves.
+            first_state = "Pending" if st == "Pending" else ("Rejected" if st == "Rejected" else "Approved")
+            approval_id += 1
+            approvals.append((approval_id, expense_id, manager[i], 1, first_state,
+                              None if first_state == "Pending" else updated[i], submitted[i]))
+            progress.append((expense_id, 1, f"[{manager[i]}]", 1, int(first_state == "Approved"),
+                             int(first_state == "Rejected"),
+                             "Active" if first_state == "Pending" else first_state))
+            if lv == 2:
+                second_state = {"In Review": "Pending", "Approved": "Approved"}.get(st)
+                if second_state:
+                    approval_id += 1
+                    approvals.append((approval_id, expense_id, director[i], 2, second_state,
+                                      None if second_state == "Pending" else updated[i], updated[i]))
+                progress.append((expense_id, 2, f"[{director[i]}]", 1, int(second_state == "Approved"), 0,
+                                 {"Pending": "Active", "Approved": "Approved"}.get(second_state, "Waiting")))
+        yield expenses, approvals, progress
+
+
+def generate(path: str, employees: int, expenses: int, days: int = 3 * 365, end: date = None,
+             password: str = "benchmark", chunk_size: int = 200_000, seed: int = 7) -> Dict[str, int]:
+    """
+    Create and fill a new database at path. Returns the row counts loaded.
+    """
+    from app import database
+    from app.migrations import migrate
+    from app.security import pwd_context
+    from app.services import dashboard, duplicates, org_hierarchy, search
+
+    if os.path.exists(path):
+        raise SystemExit(f"{path} already exists; datagen only fills a new database")
+    database.configure(path)
+    migrate()
+    database.close_pool()
+
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -200000")
+    placeholders = ",".join("?" * len(BULK_TABLES))
+    dropped = conn.execute(f"""
+        SELECT type, name, sql FROM sqlite_master
+        WHERE type IN ('index', 'trigger') AND sql IS NOT NULL AND tbl_name IN ({placeholders})
+    """, BULK_TABLES).fetchall()
+    for type_, name, _ in dropped:
+        conn.execute(f"DROP {type_.upper()} {name}")
+
+    started = time.perf_counter()
+    conn.execute("BEGIN")
+    users, staff = make_users(employees, pwd_context.hash(password))
+    conn.executemany("""
+        INSERT INTO users (id, email, hashed_password, full_name, role, manager_id, department)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, users)
+    counts = {"users": len(users), "expenses": 0, "approvals": 0}
+    for expense_rows, approval_rows, progress_rows in expense_chunks(
+            expenses, staff, days, end or date.today(), chunk_size, seed):
+        conn.executemany("""
+            INSERT INTO expenses (id, employee_id, amount, currency, category, description, expense_date,
+                                  status, submitted_at, updated_at, current_level, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, expense_rows)
+        conn.executemany("""
+            INSERT INTO approvals (id, expense_id, approver_id, approval_level, status, approved_at, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, approval_rows)
+        conn.executemany("""
+            INSERT INTO approval_progress (expense_id, approval_level, approver_ids, required,
+                                           approved, rejected, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, progress_rows)
+        counts["expenses"] += len(expense_rows)
+        counts["approvals"] += len(approval_rows)
+        print(f"  {counts['expenses']:,} expenses ({time.perf_counter() - started:.0f} s)", flush=True)
+
+    print("Recreating indexes and triggers, rebuilding derived tables...", flush=True)
+    for _, _, sql in dropped:
+        conn.execute(sql)
+    org_hierarchy.rebuild(conn)
+    dashboard.rebuild(conn)
+    search.rebuild(conn)
+    conn.execute("COMMIT")
+    # WAL first: fingerprinting reads the stored rates through the app's pool while
+    # backfill() writes a chunk per transaction of its own.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.row_factory = sqlite3.Row
+    counts["fingerprints"] = duplicates.backfill(conn)
+    database.close_pool()
+    conn.execute("ANALYZE")
+    conn.close()
+    print(f"✓ Loaded {counts['users']:,} users, {counts['expenses']:,} expenses and "
+          f"{counts['approvals']:,} approvals ({counts['fingerprints']:,} fingerprinted) "
+          f"in {time.perf_counter() - started:.0f} s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", required=True, help="path of the database to create")
+    parser.add_argument("--employees", type=int, default=10_000)
+    parser.add_argument("--expenses", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=3 * 365, help="history length, ending today")
+    parser.add_argument("--password", default="benchmark", help="password of every generated user")
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    generate(args.db, args.employees, args.expenses, args.days, password=args.password,
+             chunk_size=args.chunk_size, seed=args.seed)
+
+
+if __name__ == "__main__":
+    main()
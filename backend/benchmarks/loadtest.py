@@ -0,0 +1,276 @@
+"""
+HTTP load test for the hot routes: GET /api/expenses/, GET /approvals/pending,
+GET /api/users/ and POST /api/auth/login, against a database from benchmarks.datagen.
+
+Each route is driven on its own by --concurrency clients looping for --duration
+seconds (after --warmup), either in-process through the ASGI app (no sockets: the
+app's own cost) or over HTTP against a local uvicorn (--workers processes), and
+reports requests/s and p50/p95/p99 latency. Listing requests pick a random employee,
+manager org or status per request, so they are not all served by the response cache.
+Results are written as JSON; --compare prints the change between two result files,
+e.g. from the commits before and after a change.
+
+Usage (from backend/):
+    python -m benchmarks.datagen --db /tmp/load.db --employees 10000 --expenses 10000000
+    python -m benchmarks.loadtest --db /tmp/load.db [--mode inprocess uvicorn] [--concurrency 1 16 64]
+                                  [--routes expenses approvals users login] [--duration 10] [--out FILE]
+    python -m benchmarks.loadtest --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BASE_URL = "http://127.0.0.1:{port}"
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+# ==================== REQUESTS ====================
+
+class Population:
+    """
+    Ids to draw request parameters from, read once from the database.
+    """
+
+    def __init__(self, path: str):
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            self.employees = [r[0] for r in conn.execute("SELECT id FROM users WHERE role = 'Employee'")]
+            self.managers = [r[0] for r in conn.execute("SELECT id FROM users WHERE role = 'Manager'")]
+            self.emails = [r[0] for r in conn.execute("SELECT email FROM users WHERE role = 'Employee' LIMIT 10000")]
+            self.counts = {table: conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+                           for table in ("users", "expenses", "approvals")}
+        finally:
+            conn.close()
+
+
+def expenses_request(pop: Population, rng: random.Random, password: str) -> Tuple[str, str, Dict[str, Any]]:
+    # The expenses page: an employee's own list, or everything by status (a first page
+    # is mostly a cache hit; later pages need a cursor the client would carry).
+    if rng.random() < 0.7:
+        params = {"employee_id": rng.choice(pop.employees), "limit": 20}
+    else:
+        params = {"status": rng.choice(["Pending", "Approved", "Rejected", "In Review"]), "limit": 50}
+    return "GET", "/api/expenses/", {"params": params}
+
+
+def approvals_request(pop: Population, rng: random.Random, password: str) -> Tuple[str, str, Dict[str, Any]]:
+    # A manager's approval queue: pending expenses from their org.
+    return "GET", "/approvals/pending", {"params": {"org_manager_id": rng.choice(pop.managers), "limit": 20}}
+
+
+def users_request(pop: Population, rng: random.Random, password: str) -> Tuple[str, str, Dict[str, Any]]:
+    return "GET", "/api/users/", {}
+
+
+def login_request(pop: Population, rng: random.Random, password: str) -> Tuple[str, str, Dict[str, Any]]:
+    return "POST", "/api/auth/login", {"json": {"email": rng.choice(pop.emails), "password": password}}
+
+
+ROUTES: Dict[str, Callable[[Population, random.Random, str], Tuple[str, str, Dict[str, Any]]]] = {
+    "expenses": expenses_request,
+    "approvals": approvals_request,
+    "users": users_request,
+    "login": login_request,
+}
+
+
+# ==================== DRIVER ====================
+
+async def drive(client: httpx.AsyncClient, route: str, concurrency: int, duration: float,
+                warmup: float, pop: Population, password: str, seed: int) -> Dict[str, Any]:
+    """
+    Run `concurrency` clients against one route; only requests started after the
+    warmup count. Returns requests/s, latency percentiles (ms) and error counts.
+    """
+    make_request = ROUTES[route]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    begin = time.perf_counter()
+    measure_from, stop_at = begin + warmup, begin + warmup + duration
+
+    async def client_loop(n: int):
+        rng = random.Random(seed * 1000 + n)
+        while True:
+            start = time.perf_counter()
+            if start >= stop_at:
+                return
+            method, url, kwargs = make_request(pop, rng, password)
+            try:
+                response = await client.request(method, url, **kwargs)
+                error = None if response.status_code < 400 else str(response.status_code)
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            if start >= measure_from:
+                if error:
+                    errors[error] = errors.get(error, 0) + 1
+                else:
+                    latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client_loop(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+    result = {"route": route, "concurrency": concurrency, "requests": len(latencies),
+              "errors": errors, "rps": round(len(latencies) / elapsed, 1)}
+    if latencies:
+        result.update({f"p{int(q * 100)}_ms": round(percentile(latencies, q) * 1000, 2)
+                       for q in (0.50, 0.95, 0.99)})
+        result["mean_ms"] = round(sum(latencies) * 1000 / len(latencies), 2)
+    return result
+
+
+async def run_inprocess(args, pop: Population) -> List[Dict[str, Any]]:
+    from app.main import app
+
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for concurrency in args.concurrency:
+                for route in args.routes:
+                    result = await drive(client, route, concurrency, args.duration, args.warmup,
+                                         pop, args.password, args.seed)
+                    results.append({"mode": "inprocess", **result})
+                    print_result(results[-1])
+    return results
+
+
+async def run_uvicorn(args, pop: Population) -> List[Dict[str, Any]]:
+    base_url = BASE_URL.format(port=args.port)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        env={**os.environ, "DATABASE_PATH": os.path.abspath(args.db)},
+    )
+    results = []
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=60,
+                                     limits=httpx.Limits(max_connections=max(args.concurrency))) as client:
+            deadline = time.perf_counter() + 60
+            while True:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if server.poll() is not None or time.perf_counter() > deadline:
+                    raise SystemExit("uvicorn did not start")
+                await asyncio.sleep(0.2)
+            for concurrency in args.concurrency:
+                for route in args.routes:
+                    result = await drive(client, route, concurrency, args.duration, args.warmup,
+                                         pop, args.password, args.seed)
+                    results.append({"mode": f"uvicorn x{args.workers}", **result})
+                    print_result(results[-1])
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results
+
+
+# ==================== REPORTING ====================
+
+def print_result(r: Dict[str, Any]) -> None:
+    errors = sum(r["errors"].values())
+    print(f"{r['mode']:<12} {r['concurrency']:>5} {r['route']:<10} {r['rps']:>9,.1f} "
+          f"{r.get('p50_ms', 0):>9.2f} {r.get('p95_ms', 0):>9.2f} {r.get('p99_ms', 0):>9.2f} {errors:>7}",
+          flush=True)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+def compare(before_path: str, after_path: str) -> None:
+    """
+    Print requests/s and p50/p99 for each (mode, concurrency, route) in both files.
+    """
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"before: {before['revision']} ({before['started_at']})")
+    print(f"after:  {after['revision']} ({after['started_at']})")
+    old = {(r["mode"], r["concurrency"], r["route"]): r for r in before["results"]}
+    print(f"{'mode':<12} {'conc':>5} {'route':<10} {'rps':>22} {'p50 ms':>22} {'p99 ms':>22}")
+    for r in after["results"]:
+        o = old.get((r["mode"], r["concurrency"], r["route"]))
+        if o is None:
+            continue
+        cells = []
+        for key in ("rps", "p50_ms", "p99_ms"):
+            a, b = o.get(key, 0), r.get(key, 0)
+            change = f"{(b - a) / a * 100:+.0f}%" if a else "n/a"
+            cells.append(f"{a:>8.1f}→{b:<8.1f}{change:>5}")
+        print(f"{r['mode']:<12} {r['concurrency']:>5} {r['route']:<10} {cells[0]:>22} {cells[1]:>22} {cells[2]:>22}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", help="database generated by benchmarks.datagen")
+    parser.add_argument("--mode", nargs="+", choices=["inprocess", "uvicorn"], default=["inprocess", "uvicorn"])
+    parser.add_argument("--routes", nargs="+", choices=list(ROUTES), default=list(ROUTES))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per route and level")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--password", default="benchmark", help="password datagen gave every user")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="results file (default: loadtest-<revision>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not args.db or not os.path.exists(args.db):
+        parser.error("--db must name a database generated by benchmarks.datagen")
+    # The in-process app reads its database path from the environment at import.
+    os.environ["DATABASE_PATH"] = os.path.abspath(args.db)
+    pop = Population(args.db)
+    revision = git_revision()
+    report = {
+        "revision": revision,
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "database": {"path": os.path.abspath(args.db), **pop.counts},
+        "settings": {key: getattr(args, key) for key in ("duration", "warmup", "workers", "seed")},
+        "results": [],
+    }
+    print(f"{'mode':<12} {'conc':>5} {'route':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'errors':>7}")
+    for mode in args.mode:
+        runner = run_inprocess if mode == "inprocess" else run_uvicorn
+        report["results"].extend(asyncio.run(runner(args, pop)))
+
+    out = args.out or f"loadtest-{revision or 'unknown'}.json"
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Test setup: each run gets its own database, receipt store and archive directory, the
+deterministic fake OCR backend and no background archiving (tests start it
+themselves). app.config reads these at import, so they are set before any app
+module is imported.
+"""
+
+import os
+import tempfile
+
+_root = tempfile.mkdtemp(prefix="expenses-tests-")
+os.environ.update({
+    "DATABASE_PATH": os.path.join(_root, "expenses.db"),
+    "RECEIPT_DIR": os.path.join(_root, "receipts"),
+    "ARCHIVE_DIR": os.path.join(_root, "archive"),
+    "OCR_BACKEND": "fake",
+    "EXCHANGE_RATE_PROVIDER": "file",
+    "ARCHIVE_INTERVAL_SECONDS": "0",
+})
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.migrations import migrate  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    migrate()
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,11 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_app_restarts_in_the_same_process():
+    # Shutdown stops the database threads; the next lifespan must get new ones.
+    for _ in range(2):
+        with TestClient(app) as client:
+            response = client.post("/api/auth/login", json={"email": "nobody@example.com", "password": "x"})
+            assert response.status_code == 401
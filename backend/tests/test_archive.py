@@ -0,0 +1,46 @@
+import time
+import uuid
+
+from app.database import get_db_connection
+from app.models import UserModel
+from app.security import create_access_token
+from app.services.approval_workflow import decide, submit_expense
+from app.services import archive
+
+
+def test_archiving_invalidates_cached_listings(client):
+    tag = uuid.uuid4().hex[:8]
+    manager = UserModel.create_user(f"m-{tag}@example.com", "x", "Manager", "Manager")
+    employee = UserModel.create_user(f"e-{tag}@example.com", "x", "Employee", "Employee", manager)
+    expense_id = submit_expense(employee_id=employee, amount=12.5, currency="USD", category="Meals",
+                                description="Old lunch", expense_date="2024-05-01")["id"]
+    decide(expense_id, manager, True)
+    with get_db_connection() as conn:
+        conn.execute("""
+            UPDATE expenses SET submitted_at = '2024-05-01 12:00:00', updated_at = datetime('now', '-400 days')
+            WHERE id = ?
+        """, (expense_id,))
+        conn.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token(1, 'admin@example.com', 'Admin')}"}
+    params = {"employee_id": employee}
+    first = client.get("/api/expenses/", params=params, headers=headers)
+    assert [e["id"] for e in first.json()["items"]] == [expense_id]
+    etag = first.headers["etag"]
+    assert client.get("/api/expenses/", params=params, headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    # The server's own archiver moves it; its writes must reach the response cache.
+    archive.start(interval=3600)
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            after = client.get("/api/expenses/", params=params, headers={**headers, "If-None-Match": etag})
+            if after.status_code != 304 or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+    finally:
+        archive.stop()
+    assert after.status_code == 200
+    assert after.json()["items"] == []
+    archived = client.get("/api/expenses/", params={**params, "include_archived": True}, headers=headers)
+    assert [e["id"] for e in archived.json()["items"]] == [expense_id]
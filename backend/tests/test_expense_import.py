@@ -0,0 +1,44 @@
+import uuid
+
+from app.database import get_db_connection
+from app.models import UserModel
+from app.services.approval_workflow import _start_workflows, decide
+from app.services.expense_import import import_items
+
+
+def make_team():
+    tag = uuid.uuid4().hex[:8]
+    manager = UserModel.create_user(f"m-{tag}@example.com", "x", "Manager", "Manager")
+    employee = UserModel.create_user(f"e-{tag}@example.com", "x", "Employee", "Employee", manager)
+    return manager, employee
+
+
+def item(employee, amount, description="Taxi to the airport"):
+    return {"employee_id": employee, "amount": amount, "currency": "USD", "category": "Travel",
+            "description": description, "expense_date": "2026-10-01"}
+
+
+def test_import_starts_workflows_and_records_fingerprints():
+    manager, employee = make_team()
+    results = import_items([item(employee, 42.0), item(employee, 42.0), item(999999, 1.0)])
+    assert results[2]["error"].startswith("employee_id")
+    ids = [results[0]["id"], results[1]["id"]]
+    assert [d["expense_id"] for d in results[1]["duplicates"]] == [ids[0]]
+    with get_db_connection() as conn:
+        for expense_id in ids:
+            assert conn.execute("SELECT current_level FROM expenses WHERE id = ?", (expense_id,)).fetchone()[0] == 1
+            assert conn.execute("SELECT approver_id FROM approvals WHERE expense_id = ?",
+                                (expense_id,)).fetchall()[0][0] == manager
+            assert conn.execute("SELECT 1 FROM expense_fingerprints WHERE expense_id = ?", (expense_id,)).fetchone()
+
+
+def test_start_workflows_skips_decided_expenses():
+    manager, employee = make_team()
+    expense_id = import_items([item(employee, 10.0, "Lunch")])[0]["id"]
+    decide(expense_id, manager, True)
+    with get_db_connection() as conn:
+        _start_workflows(conn, [expense_id])
+        pending = conn.execute("SELECT COUNT(*) FROM approvals WHERE expense_id = ? AND status = 'Pending'",
+                               (expense_id,)).fetchone()[0]
+        conn.rollback()
+    assert pending == 0
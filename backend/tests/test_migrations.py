@@ -0,0 +1,26 @@
+import sqlite3
+
+from app import migrations
+from app.migrations import MIGRATIONS, check_query_plans, migrate
+
+
+def test_migrate_is_idempotent(tmp_path):
+    conn = sqlite3.connect(tmp_path / "expenses.db")
+    assert migrate(conn) == MIGRATIONS[-1][0]
+    assert migrate(conn) == MIGRATIONS[-1][0]
+
+
+def test_hot_queries_use_indexes(tmp_path):
+    conn = sqlite3.connect(tmp_path / "expenses.db")
+    migrate(conn)
+    failures = check_query_plans(conn)
+    assert failures == [], "\n".join(f"{name}: {' | '.join(plan)}" for name, plan in failures)
+
+
+def test_check_flags_table_scans_and_sorts(monkeypatch):
+    monkeypatch.setattr(migrations, "HOT_QUERIES", [
+        ("scan", "SELECT * FROM expenses WHERE description = ?", ("taxi",)),
+        ("sort", "SELECT * FROM expenses WHERE employee_id = ? ORDER BY amount", (1,)),
+        ("fts scan", "SELECT rowid FROM expenses_fts", ()),
+    ])
+    assert [name for name, _ in check_query_plans()] == ["scan", "sort", "fts scan"]
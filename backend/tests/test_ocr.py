@@ -0,0 +1,107 @@
+import hashlib
+import io
+import os
+import time
+import uuid
+
+import pytest
+from PIL import Image, PngImagePlugin
+
+from app.database import get_db_connection
+from app.models import ApprovalRuleModel, ExpenseModel, UserModel
+from app.services import receipt_store
+from app.services.approval_workflow import decide, submit_expense
+from app.services.ocr import ocr_queue
+
+
+@pytest.fixture(scope="module", autouse=True)
+def stop_workers():
+    yield
+    ocr_queue.shutdown()
+
+
+def store_receipt(text: str) -> str:
+    """
+    Store a PNG whose "ocr_text" chunk the fake backend returns as the scanned text.
+    """
+    info = PngImagePlugin.PngInfo()
+    info.add_text("ocr_text", text)
+    buffer = io.BytesIO()
+    Image.new("L", (40, 40), 255).save(buffer, "PNG", pnginfo=info)
+    content = buffer.getvalue()
+    content_hash = hashlib.sha256(content).hexdigest()
+    path = receipt_store.path_for(content_hash)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return content_hash
+
+
+def wait_for(job_id: int) -> dict:
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        job = ocr_queue.get_job(job_id)
+        if job["status"] in ("Done", "Failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"OCR job {job_id} did not finish")
+
+
+def submit(employee: int, amount: float) -> int:
+    return submit_expense(employee_id=employee, amount=amount, currency="USD", category="Meals",
+                          description="Team lunch", expense_date="2026-10-01")["id"]
+
+
+def levels(expense_id: int) -> list:
+    with get_db_connection() as conn:
+        return conn.execute("""
+            SELECT approval_level, status, approved FROM approval_progress WHERE expense_id = ? ORDER BY 1
+        """, (expense_id,)).fetchall()
+
+
+def test_job_lifecycle_and_cache_hit():
+    tag = uuid.uuid4().hex[:8]
+    manager = UserModel.create_user(f"m-{tag}@example.com", "x", "Manager", "Manager")
+    employee = UserModel.create_user(f"e-{tag}@example.com", "x", "Employee", "Employee", manager)
+    content_hash = store_receipt(f"Cafe {tag}\n2026-10-02\nTOTAL 18.40")
+
+    first = submit(employee, 20.0)
+    job = ocr_queue.enqueue(first, content_hash, autofill=True)
+    assert job["status"] in ("Queued", "Running") and not job["cached"]
+    job = wait_for(job["id"])
+    assert job["status"] == "Done" and not job["cached"]
+    assert job["result"]["amount"] == 18.4 and job["result"]["expense_date"] == "2026-10-02"
+    expense = ExpenseModel.get_expense_by_id(first)
+    assert expense["amount"] == 18.4 and expense["description"] == f"Cafe {tag}"
+    assert expense["receipt_data"] is not None
+
+    # The same receipt again: answered from ocr_results without a worker run.
+    second = submit(employee, 30.0)
+    cached = ocr_queue.enqueue(second, content_hash, autofill=False)
+    assert cached["status"] == "Done" and cached["cached"]
+    assert cached["result"]["amount"] == 18.4
+    assert ExpenseModel.get_expense_by_id(second)["amount"] == 30.0
+
+
+def test_autofill_does_not_replan_a_decided_expense():
+    tag = uuid.uuid4().hex[:8]
+    department = f"ocr-{tag}"
+    admins = [UserModel.create_user(f"a{i}-{tag}@example.com", "x", "Admin", "Admin") for i in range(2)]
+    employee = UserModel.create_user(f"e-{tag}@example.com", "x", "Employee", "Employee", admins[0], department)
+    # Every Admin has to approve level 1, so one approval leaves the expense Pending.
+    ApprovalRuleModel.create_rule(f"{department} admins", "department_rule", 1,
+                                  approver_role="Admin", department=department)
+    ApprovalRuleModel.create_rule(f"{department} all admins", "percentage_approval", 1,
+                                  condition_value=100, department=department)
+
+    expense_id = submit(employee, 50.0)
+    decide(expense_id, admins[0], True)
+    assert ExpenseModel.get_expense_by_id(expense_id)["status"] == "Pending"
+    planned = levels(expense_id)
+
+    job = ocr_queue.enqueue(expense_id, store_receipt(f"Diner {tag}\nTOTAL 75.00"), autofill=True)
+    assert wait_for(job["id"])["status"] == "Done"
+    expense = ExpenseModel.get_expense_by_id(expense_id)
+    assert expense["amount"] == 50.0
+    assert expense["description"] == f"Diner {tag}"
+    assert levels(expense_id) == planned
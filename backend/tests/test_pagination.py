@@ -0,0 +1,29 @@
+import base64
+import json
+
+import pytest
+
+from app.pagination import decode_cursor, encode_cursor
+from app.security import create_access_token
+
+
+def raw_cursor(key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).rstrip(b"=").decode()
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(["2024-01-01 10:00:00", 7])) == ("2024-01-01 10:00:00", 7)
+    assert decode_cursor(encode_cursor([-1.5, 3, None]), 3) == (-1.5, 3, None)
+
+
+@pytest.mark.parametrize("key", [[{"a": 1}, 1], [[1], 1], ["2024-01-01", True], ["2024-01-01"], {"a": 1}])
+def test_decode_rejects_malformed_keys(key):
+    with pytest.raises(ValueError):
+        decode_cursor(raw_cursor(key))
+
+
+@pytest.mark.parametrize("cursor", [raw_cursor([{"a": 1}, 1]), raw_cursor(["x", [2]]), "not-base64!"])
+def test_malformed_cursor_is_a_client_error(client, cursor):
+    headers = {"Authorization": f"Bearer {create_access_token(1, 'admin@example.com', 'Admin')}"}
+    response = client.get("/api/expenses/", params={"cursor": cursor}, headers=headers)
+    assert response.status_code == 400
@@ -22,11 +22,36 @@ export const login = async (credentials) => {
   return data;
 };
 
-export const getExpenses = async () => {
-  const { data } = await api.get('/expenses');
+export const getExpenses = async (params = {}) => {
+  const { data } = await api.get('/expenses', { params });
+  return data.items;
+};
+
+// Full-text search over description and category; the last word matches as a prefix
+export const searchExpenses = async (q, params = {}) => {
+  const { data } = await api.get('/expenses/search', { params: { q, ...params } });
+  return data.items;
+};
+
+export const getDashboard = async (params = {}) => {
+  const { data } = await api.get('/dashboard', { params });
   return data;
 };
 
+// Server-Sent Events feed of expense and approval changes; onChange(type, data) runs for
+// each event, and for "reset" when missed events can no longer be replayed (reload then).
+// EventSource reconnects by itself, sending the last event id. Returns a close function.
+const EVENT_TYPES = ['expense.created', 'approval.decided', 'expense.status_changed', 'reset'];
+
+export const subscribeEvents = (onChange) => {
+  const token = localStorage.getItem('token');
+  const source = new EventSource(`${API_BASE_URL}/events?token=${encodeURIComponent(token || '')}`);
+  EVENT_TYPES.forEach((type) =>
+    source.addEventListener(type, (e) => onChange(type, JSON.parse(e.data || '{}')))
+  );
+  return () => source.close();
+};
+
 export const createExpense = async (expense) => {
   const { data } = await api.post('/expenses', expense);
   return data;
@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import ApprovalCard from '../components/ApprovalCard';
-import { getApprovals, approveApproval, rejectApproval } from '../api';
+import { getApprovals, approveApproval, rejectApproval, subscribeEvents } from '../api';
 
 const Approvals = () => {
   const [approvals, setApprovals] = useState([]);
@@ -19,6 +19,8 @@ const Approvals = () => {
       }
     };
     fetchApprovals();
+    // Re-fetch the queue only when something in it changed
+    return subscribeEvents(fetchApprovals);
   }, []);
 
   const handleApprove = async (id) => {
@@ -1,8 +1,8 @@
 import React, { useEffect, useState } from 'react';
-import { getExpenses, getApprovals } from '../api';
+import { getDashboard, getApprovals, subscribeEvents } from '../api';
 
 const Dashboard = () => {
-  const [expenses, setExpenses] = useState([]);
+  const [summary, setSummary] = useState(null);
   const [approvals, setApprovals] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
@@ -10,9 +10,9 @@ const Dashboard = () => {
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const exp = await getExpenses();
+        const totals = await getDashboard();
         const app = await getApprovals();
-        setExpenses(exp);
+        setSummary(totals);
         setApprovals(app);
       } catch (err) {
         setError('Failed to load data');
@@ -21,6 +21,8 @@ const Dashboard = () => {
       }
     };
     fetchData();
+    // Refresh when an expense or approval changes rather than on a timer
+    return subscribeEvents(fetchData);
   }, []);
 
   if (loading) return <div className="text-center mt-10">Loading...</div>;
@@ -32,7 +34,10 @@ const Dashboard = () => {
       <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
         <div>
           <h2 className="text-xl">Expenses Summary</h2>
-          <p>Total Expenses: {expenses.length}</p>
+          <p>Total Expenses: {summary.total.count}</p>
+          {Object.entries(summary.by_status).map(([status, totals]) => (
+            <p key={status}>{status}: {totals.count}</p>
+          ))}
         </div>
         <div>
           <h2 className="text-xl">Pending Approvals</h2>
@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import ExpenseCard from '../components/ExpenseCard';
 import FormInput from '../components/FormInput';
-import { getExpenses, createExpense } from '../api';
+import { getExpenses, createExpense, searchExpenses } from '../api';
 
 const Expenses = () => {
   const [expenses, setExpenses] = useState([]);
@@ -11,11 +11,12 @@ const Expenses = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
+  const [query, setQuery] = useState('');
 
   useEffect(() => {
     const fetchExpenses = async () => {
       try {
-        const data = await getExpenses();
+        const data = query.trim() ? await searchExpenses(query) : await getExpenses();
         setExpenses(data);
       } catch (err) {
         setError('Failed to load expenses');
@@ -23,8 +24,10 @@ const Expenses = () => {
         setLoading(false);
       }
     };
-    fetchExpenses();
-  }, []);
+    // Debounce typing in the search box
+    const timer = setTimeout(fetchExpenses, query ? 250 : 0);
+    return () => clearTimeout(timer);
+  }, [query]);
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -55,6 +58,7 @@ const Expenses = () => {
           Add Expense
         </button>
       </form>
+      <FormInput label="Search" value={query} onChange={(e) => setQuery(e.target.value)} />
       <div>
         {expenses.map((exp) => (
           <ExpenseCard key={exp.id} expense={exp} />